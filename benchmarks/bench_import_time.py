@@ -0,0 +1,111 @@
+"""
+命令行各子命令导入耗时
+
+以`python -X importtime`分别在新进程中导入`cnswd.scripts.command`及子命令所用模块，
+统计累计导入时间及耗时最多的模块。子命令所用模块由`command.py`中命令函数内的
+`from . import ...`语句确定。
+
+用法
+$ python benchmarks/bench_import_time.py
+$ python benchmarks/bench_import_time.py --commands quote iquote --top 10
+"""
+import argparse
+import ast
+import os
+import subprocess
+import sys
+
+COMMAND_FILE = os.path.join(os.path.dirname(__file__), '..', 'cnswd',
+                            'scripts', 'command.py')
+
+
+def command_modules(path=COMMAND_FILE):
+    """子命令 -> 所用脚本模块列表"""
+    with open(path, encoding='utf-8') as f:
+        tree = ast.parse(f.read())
+    res = {}
+    for node in tree.body:
+        if not isinstance(node, ast.FunctionDef):
+            continue
+        is_command = any(
+            isinstance(d, ast.Call) and isinstance(d.func, ast.Attribute)
+            and d.func.attr == 'command' for d in node.decorator_list)
+        if not is_command:
+            continue
+        modules = []
+        for stmt in ast.walk(node):
+            if isinstance(stmt, ast.ImportFrom) and stmt.level == 1:
+                if stmt.module:
+                    modules.append(stmt.module)
+                else:
+                    modules.extend(a.name for a in stmt.names)
+        res[node.name] = modules
+    return res
+
+
+def parse_importtime(stderr):
+    """解析`-X importtime`输出
+
+    Returns:
+        list: [(模块, 嵌套层级, 自身耗时us, 累计耗时us)]
+    """
+    res = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        res.append((name.strip(), depth, int(self_us), int(cumulative)))
+    return res
+
+
+def measure(modules, timeout=120):
+    """新进程中导入模块
+
+    Returns:
+        tuple: (总耗时秒, [(模块, 嵌套层级, 自身耗时us, 累计耗时us)])
+    """
+    stmt = '; '.join(f'import {m}' for m in modules)
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(
+        p for p in (os.path.join(os.path.dirname(__file__), '..'),
+                    env.get('PYTHONPATH')) if p)
+    r = subprocess.run([sys.executable, '-X', 'importtime', '-c', stmt],
+                       capture_output=True,
+                       text=True,
+                       env=env,
+                       timeout=timeout)
+    if r.returncode != 0:
+        raise RuntimeError(r.stderr.strip().splitlines()[-1])
+    records = parse_importtime(r.stderr)
+    # 顶层导入的累计耗时之和即总导入耗时
+    total = sum(c for _, depth, _, c in records if depth == 0)
+    return total / 1e6, records
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--commands', nargs='*', help='子命令，默认全部')
+    parser.add_argument('--top', type=int, default=5, help='显示耗时最多的模块数')
+    args = parser.parse_args()
+
+    mapping = command_modules()
+    names = args.commands or sorted(mapping)
+    base = 'cnswd.scripts.command'
+    total, records = measure([base])
+    print(f"{'stock --help':<12} {total:8.3f}s")
+    for name in names:
+        modules = [base] + [f'cnswd.scripts.{m}' for m in mapping[name]]
+        try:
+            total, records = measure(modules)
+        except (RuntimeError, subprocess.TimeoutExpired) as e:
+            print(f'{name:<12} 失败 {e}')
+            continue
+        print(f'{name:<12} {total:8.3f}s')
+        for module, _, _, cumulative in sorted(
+                records, key=lambda x: -x[3])[:args.top]:
+            print(f'{"":<12} {cumulative / 1e6:8.3f}s  {module}')
+
+
+if __name__ == '__main__':
+    main()
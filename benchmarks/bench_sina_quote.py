@@ -0,0 +1,92 @@
+"""
+新浪实时报价解析性能比较
+
+用法
+$ python benchmarks/bench_sina_quote.py --stocks 5000
+"""
+import argparse
+import re
+import time
+
+import numpy as np
+import pandas as pd
+
+from cnswd.setting.constants import QUOTE_COLS
+from cnswd.websource.quote_parser import parse_quotes, quotes_to_frame
+
+QUOTE_PATTERN = re.compile('"(.*)"')
+CODE_PATTERN = re.compile(r'hq_str_s[zh](\d{6})')
+
+
+def _convert_to_numeric(s, exclude=()):
+    if pd.api.types.is_string_dtype(s):
+        if exclude:
+            if s.name not in exclude:
+                return pd.to_numeric(s, errors='coerce')
+    return s
+
+
+def legacy_parse(content):
+    """原实现：正则提取、逐列转换"""
+    res = [x.split(',') for x in re.findall(QUOTE_PATTERN, content)]
+    codes = [x for x in re.findall(CODE_PATTERN, content)]
+    df = pd.DataFrame(res).iloc[:, :32]
+    df.columns = QUOTE_COLS[1:]
+    df.insert(0, '股票代码', codes)
+    df.dropna(inplace=True)
+    df = df.apply(_convert_to_numeric,
+                  exclude=('股票代码', '股票简称', '日期', '时间'))
+    df['时间'] = pd.to_datetime(df.日期 + ' ' + df.时间)
+    del df['日期']
+    return df
+
+
+def new_parse(content):
+    return quotes_to_frame(parse_quotes(content), combine_time=True)
+
+
+def make_content(stocks, seed=0):
+    """模拟报价文本"""
+    rng = np.random.default_rng(seed)
+    lines = []
+    for i in range(stocks):
+        prefix = 'sh' if i % 2 else 'sz'
+        prices = rng.uniform(5, 50, 8).round(3)
+        book = []
+        for _ in range(10):
+            book.extend([str(rng.integers(100, 100000)),
+                         f'{rng.uniform(5, 50):.3f}'])
+        fields = ([f'股票{i}'] + [f'{x:.3f}' for x in prices[:7]] +
+                  [str(rng.integers(1e5, 1e8)), f'{rng.uniform(1e6, 1e9):.3f}'] +
+                  book + ['2020-07-24', '14:59:57', '00'])
+        lines.append(f'var hq_str_{prefix}{i:06d}="{",".join(fields)}";')
+    return '\n'.join(lines)
+
+
+def timeit(func, content, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        t = time.perf_counter()
+        func(content)
+        best = min(best, time.perf_counter() - t)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--stocks', type=int, default=5000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+    content = make_content(args.stocks)
+    expected = legacy_parse(content).reset_index(drop=True)
+    actual = new_parse(content)
+    pd.testing.assert_frame_equal(actual, expected, check_dtype=False)
+    t1 = timeit(legacy_parse, content, args.repeat)
+    t2 = timeit(new_parse, content, args.repeat)
+    print(f"股票数量 {args.stocks}")
+    print(f"原实现 {t1 * 1000:.2f}ms")
+    print(f"新实现 {t2 * 1000:.2f}ms 提速 {t1 / t2:.1f}倍")
+
+
+if __name__ == '__main__':
+    main()
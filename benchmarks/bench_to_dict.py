@@ -0,0 +1,65 @@
+"""
+DataFrame转换为mongo文档性能比较
+
+用法
+$ python benchmarks/bench_to_dict.py --rows 1000000
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from cnswd.utils.db_utils import ingnore_null_dict, to_dict
+
+
+def legacy_to_dict(df):
+    """原实现：逐行逐值判断空值"""
+    data = df.to_dict('records')
+    return list(map(ingnore_null_dict, data))
+
+
+def make_frame(rows, null_ratio=0.05, seed=0):
+    """模拟成交明细数据"""
+    rng = np.random.default_rng(seed)
+    start = pd.Timestamp('2020-06-01 09:30').value
+    df = pd.DataFrame({
+        '股票代码': rng.choice(['000001', '000002', '600000', '300033'], rows),
+        '成交时间': pd.to_datetime(start + rng.integers(0, 4 * 3600, rows) * 10**9),
+        '成交价': rng.uniform(5, 50, rows).round(2),
+        '价格变动': rng.uniform(-0.1, 0.1, rows).round(2),
+        '成交量': rng.integers(1, 10000, rows),
+        '成交额': rng.uniform(1e3, 1e6, rows).round(2),
+        '性质': rng.choice(['买盘', '卖盘', '中性盘'], rows),
+    })
+    for col in ('价格变动', '成交额'):
+        df.loc[rng.random(rows) < null_ratio, col] = np.nan
+    return df
+
+
+def timeit(func, df, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        t = time.perf_counter()
+        func(df)
+        best = min(best, time.perf_counter() - t)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+    df = make_frame(args.rows)
+    assert to_dict(df.head(1000)) == legacy_to_dict(df.head(1000))
+    t1 = timeit(legacy_to_dict, df, args.repeat)
+    t2 = timeit(to_dict, df, args.repeat)
+    print(f"行数 {args.rows}")
+    print(f"legacy_to_dict {t1:>8.3f}秒 {args.rows / t1:>12.0f}行/秒")
+    print(f"to_dict        {t2:>8.3f}秒 {args.rows / t2:>12.0f}行/秒")
+    print(f"加速 {t1 / t2:.1f}倍")
+
+
+if __name__ == '__main__':
+    main()
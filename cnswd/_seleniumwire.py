@@ -7,21 +7,29 @@
 
 性能
     1. 初始化一个浏览器大约需要3~4秒
+    2. 使用`lease_browser`从进程内浏览器池租用，连续任务不再重复启动浏览器
 
 说明
     1. windows 10 edge不支持headless，使用firefox
 
 """
+import atexit
 import logging
 import os
+import threading
+import time
+from contextlib import contextmanager
 from pathlib import Path
 
+import psutil
+
 from selenium.webdriver.common.proxy import Proxy
 from selenium.webdriver.firefox.firefox_profile import FirefoxProfile
 from selenium.webdriver.firefox.options import Options
 from seleniumwire import webdriver
 
-from .setting.config import DEFAULT_CONFIG
+from .setting.config import (BROWSER_MAX_MEMORY, BROWSER_MAX_USES,
+                             BROWSER_POOL_SIZE, DEFAULT_CONFIG)
 from .utils.path_utils import data_root
 
 # 压制seleniumwire警告
@@ -76,3 +84,249 @@ def make_headless_browser_with_auto_save_path(download_path, content_type):
         firefox_profile=fp,
         service_log_path=log_path,
         executable_path=DEFAULT_CONFIG['geckodriver_path'])
+
+
+def _options_key(options):
+    return tuple(sorted((options or {}).items()))
+
+
+def browser_memory(driver):
+    """浏览器（含子进程）占用内存，单位：MB"""
+    try:
+        proc = psutil.Process(driver.service.process.pid)
+        procs = [proc] + proc.children(recursive=True)
+    except (AttributeError, psutil.Error):
+        return 0.0
+    total = 0
+    for p in procs:
+        try:
+            total += p.memory_info().rss
+        except psutil.Error:
+            pass
+    return total / 1024 / 1024
+
+
+class PooledBrowser(object):
+    """池中的浏览器
+
+    Attributes:
+        driver: 浏览器
+        tag (str): 最近一次租用的标签，标签相同时保留网页状态
+        state (dict): 与当前网页状态相关的数据，由使用者维护（如已解析的元数据）
+        uses (int): 租用次数
+    """
+
+    def __init__(self, pool, driver, options):
+        self.pool = pool
+        self.driver = driver
+        self.options_key = _options_key(options)
+        self.tag = None
+        self.state = {}
+        self.uses = 0
+        self.created = time.time()
+
+    def release(self, failed=False):
+        """归还浏览器
+
+        Args:
+            failed (bool, optional): 使用过程中是否出现异常，出现异常时重置网页状态.
+                Defaults to False.
+        """
+        self.pool.release(self, failed)
+
+
+class BrowserPool(object):
+    """无头浏览器池
+
+    浏览器在租用之间保持运行。租用时检查浏览器是否可用，
+    归还时清除截获的请求；无标签或出现异常时同时清除cookies及网页状态。
+    租用次数达到`max_uses`或内存超过`max_memory`后重建。
+
+    Args:
+        size (int, optional): 最多同时保持的浏览器数量. Defaults to BROWSER_POOL_SIZE.
+        max_uses (int, optional): 最多租用次数. Defaults to BROWSER_MAX_USES.
+        max_memory (int, optional): 内存上限，单位：MB. Defaults to BROWSER_MAX_MEMORY.
+        factory (callable, optional): 以seleniumwire选项为参数创建浏览器的函数.
+            Defaults to make_headless_browser.
+
+    用法：
+        >>> pool = BrowserPool()
+        >>> with pool.lease() as browser:
+        ...     browser.driver.get(url)
+    """
+
+    def __init__(self,
+                 size=BROWSER_POOL_SIZE,
+                 max_uses=BROWSER_MAX_USES,
+                 max_memory=BROWSER_MAX_MEMORY,
+                 factory=make_headless_browser):
+        assert size >= 1, '浏览器数量至少为1'
+        self.size = size
+        self.max_uses = max_uses
+        self.max_memory = max_memory
+        self.factory = factory
+        self._cond = threading.Condition()
+        self._idle = []
+        self._count = 0
+        self._closed = False
+
+    def _create(self, options):
+        return PooledBrowser(self, self.factory(dict(options or {})), options)
+
+    def _quit(self, browser):
+        try:
+            browser.driver.quit()
+        except Exception:
+            pass
+
+    def _healthy(self, browser):
+        try:
+            return browser.driver.execute_script('return 1;') == 1
+        except Exception:
+            return False
+
+    def _reset(self, browser, full):
+        driver = browser.driver
+        try:
+            del driver.requests
+            driver.scopes = []
+            if full:
+                driver.delete_all_cookies()
+                driver.get('about:blank')
+        except Exception:
+            # 重置失败的浏览器在下次租用时由健康检查淘汰
+            pass
+        if full:
+            browser.tag = None
+            browser.state = {}
+
+    def _pick(self, key, tag):
+        """选择空闲浏览器
+
+        优先选择标签相同的浏览器；尚可新建浏览器时，不占用其他标签的浏览器。
+        """
+        candidates = [b for b in self._idle if b.options_key == key]
+        matched = [b for b in candidates if b.tag == tag]
+        if matched:
+            browser = matched[-1]
+        elif candidates and (tag is None or self._count >= self.size):
+            browser = candidates[-1]
+        else:
+            return None
+        self._idle.remove(browser)
+        return browser
+
+    def acquire(self, options=None, tag=None, timeout=None):
+        """租用浏览器
+
+        Args:
+            options (dict, optional): seleniumwire选项. Defaults to None.
+            tag (str, optional): 标签。同一标签再次租用时保留网页状态. Defaults to None.
+            timeout (float, optional): 等待空闲浏览器的最长时间，单位：秒. Defaults to None.
+
+        Returns:
+            PooledBrowser: 浏览器
+        """
+        key = _options_key(options)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        stale = None
+        with self._cond:
+            while True:
+                assert not self._closed, '浏览器池已关闭'
+                browser = self._pick(key, tag)
+                if browser is not None:
+                    break
+                if self._count < self.size:
+                    self._count += 1
+                    break
+                if self._idle:
+                    # 选项不同的空闲浏览器让位
+                    stale = self._idle.pop(0)
+                    break
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    raise TimeoutError('等待空闲浏览器超时')
+                self._cond.wait(remaining)
+        if stale is not None:
+            self._quit(stale)
+        if browser is not None and not self._healthy(browser):
+            self._quit(browser)
+            browser = None
+        if browser is None:
+            try:
+                browser = self._create(options)
+            except Exception:
+                with self._cond:
+                    self._count -= 1
+                    self._cond.notify()
+                raise
+        if browser.tag != tag:
+            if browser.tag is not None:
+                self._reset(browser, full=True)
+            browser.tag = tag
+        browser.uses += 1
+        return browser
+
+    def _expired(self, browser):
+        if browser.uses >= self.max_uses:
+            return True
+        return browser_memory(browser.driver) > self.max_memory
+
+    def release(self, browser, failed=False):
+        """归还浏览器"""
+        if self._closed or self._expired(browser):
+            self._quit(browser)
+            with self._cond:
+                self._count -= 1
+                self._cond.notify()
+            return
+        self._reset(browser, full=failed or browser.tag is None)
+        with self._cond:
+            self._idle.append(browser)
+            self._cond.notify()
+
+    @contextmanager
+    def lease(self, options=None, tag=None, timeout=None):
+        """以上下文方式租用浏览器"""
+        browser = self.acquire(options, tag, timeout)
+        failed = True
+        try:
+            yield browser
+            failed = False
+        finally:
+            self.release(browser, failed)
+
+    def close(self):
+        """关闭全部空闲浏览器，已租出的浏览器在归还时关闭"""
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._count -= len(idle)
+            self._cond.notify_all()
+        for browser in idle:
+            self._quit(browser)
+
+
+_POOL = None
+_POOL_PID = None
+
+
+def get_browser_pool():
+    """进程内共享的浏览器池（浏览器不能跨进程使用）"""
+    global _POOL, _POOL_PID
+    pid = os.getpid()
+    if _POOL is None or _POOL_PID != pid:
+        _POOL = BrowserPool()
+        _POOL_PID = pid
+    return _POOL
+
+
+def lease_browser(options=None, tag=None):
+    """从进程内浏览器池租用浏览器，使用完毕后调用`release`归还"""
+    return get_browser_pool().acquire(options, tag)
+
+
+@atexit.register
+def _close_pool():
+    if _POOL is not None and _POOL_PID == os.getpid():
+        _POOL.close()
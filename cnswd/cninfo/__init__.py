@@ -1,7 +1,15 @@
-from .ts import ThematicStatistics
-from .classify_tree import ClassifyTree
-from .databrowser import FastSearcher, AdvanceSearcher
-from .config import CN_INFO_CONFIG, ASR_KEYS
+import importlib
+
+# 按需导入子模块，避免`import cnswd.cninfo.config`时加载浏览器相关模块
+_LAZY = {
+    'ASR_KEYS': 'config',
+    'CN_INFO_CONFIG': 'config',
+    'FastSearcher': 'databrowser',
+    'AdvanceSearcher': 'databrowser',
+    'ThematicStatistics': 'ts',
+    'ClassifyTree': 'classify_tree',
+    'WebApi': 'webapi',
+}
 
 __all__ = [
     'ASR_KEYS',
@@ -10,4 +18,18 @@ __all__ = [
     'AdvanceSearcher',
     'ThematicStatistics',
     'ClassifyTree',
-]
\ No newline at end of file
+    'WebApi',
+]
+
+
+def __getattr__(name):
+    if name in _LAZY:
+        module = importlib.import_module(f'.{_LAZY[name]}', __name__)
+        value = getattr(module, name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -19,7 +19,7 @@ from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.support.ui import Select, WebDriverWait
 from toolz.dicttoolz import itemmap
 
-from .._seleniumwire import make_headless_browser
+from .._seleniumwire import lease_browser
 from ..setting.config import POLL_FREQUENCY, TIMEOUT
 from ..utils import make_logger
 from ..utils.loop_utils import batch_loop, loop_period_by
@@ -52,6 +52,7 @@ class SZXPage(object):
 
     def __init__(self):
         self.driver = None
+        self._browser = None
         self.logger = make_logger(self.api_name)
         self.logger.info("生成无头浏览器")
         self._meta_data = {}
@@ -61,9 +62,13 @@ class SZXPage(object):
         return self
 
     def __exit__(self, *args):
-        if self.driver:
-            # self.driver.delete_all_cookies()
-            self.driver.quit()
+        if self._browser is not None:
+            # 保留网页状态，同一项目再次使用时无需重新加载及解析元数据
+            self._browser.state['pos'] = self._pos
+            self._browser.release(failed=args[0] is not None)
+            self._browser = None
+            self.driver = None
+            self.inited = False
 
     def __str__(self):
         return f"{self.api_name}{str(os.getpid()).zfill(6)}"
@@ -74,26 +79,36 @@ class SZXPage(object):
         if inited:
             return
         start = time.time()
-        self.driver = make_headless_browser(custom_options)
+        home_url = HOME_URL_FMT.format(self.api_ename)
+        self._browser = lease_browser(custom_options, tag=home_url)
+        self.driver = self._browser.driver
         self.wait = WebDriverWait(self.driver, TIMEOUT, POLL_FREQUENCY)
         self.logger = make_logger(self.api_name)
-        self.driver.get(HOME_URL_FMT.format(self.api_ename))
         self.driver.implicitly_wait(INTERVAL + self.delay)
-        m = EC.visibility_of_element_located(
-            (By.CSS_SELECTOR, self.css.check_loaded))
-        title = self.wait.until(m, message="加载主页失败")
-        expected = self.api_name.split('-')[0]
-        assert title.text == expected, f"完成加载后，标题应为:{expected}，实际为'{title.text}'。"
-        self.logger.info(f'加载耗时：{(time.time() - start):>0.2f}秒')
         # 限定范围，提高性能
         # http://webapi.cninfo.com.cn/api/sysapi/p_sysapi1017?apiname=p_stock2215
         # http://webapi.cninfo.com.cn/api-cloud-platform/apiinfo/info?id=247
         self.driver.scopes = [
             'webapi.cninfo.com.cn',
         ]
-        # 首先需要解析启动项目的元数据。确保删除首项元数据请求，保证后续元数据能够正确解析
-        start_pos = get_current_menu(self).pos
-        self._meta_data[start_pos] = parse_meta_data(self)
+        state = self._browser.state
+        if 'meta_data' in state:
+            # 浏览器池中已加载该项目的浏览器
+            self._meta_data = state['meta_data']
+            self._pos = state.get('pos', '')
+            self.logger.info('使用已加载的浏览器')
+        else:
+            self.driver.get(home_url)
+            m = EC.visibility_of_element_located(
+                (By.CSS_SELECTOR, self.css.check_loaded))
+            title = self.wait.until(m, message="加载主页失败")
+            expected = self.api_name.split('-')[0]
+            assert title.text == expected, f"完成加载后，标题应为:{expected}，实际为'{title.text}'。"
+            self.logger.info(f'加载耗时：{(time.time() - start):>0.2f}秒')
+            # 首先需要解析启动项目的元数据。确保删除首项元数据请求，保证后续元数据能够正确解析
+            start_pos = get_current_menu(self).pos
+            self._meta_data[start_pos] = parse_meta_data(self)
+            state['meta_data'] = self._meta_data
         self.inited = True
 
     @property
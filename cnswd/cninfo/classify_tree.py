@@ -9,7 +9,7 @@ from selenium.webdriver.common.by import By
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.support.ui import WebDriverWait
 
-from .._seleniumwire import make_headless_browser
+from .._seleniumwire import lease_browser
 from ..setting.config import POLL_FREQUENCY, TIMEOUT
 from ..utils.log_utils import make_logger
 from .ops import simulated_click
@@ -109,7 +109,8 @@ class ClassifyTree(object):
         self.logger = make_logger(self.api_name)
         self.logger.info("生成无头浏览器......")
         start = time.time()
-        self.driver = make_headless_browser()
+        self._browser = lease_browser()
+        self.driver = self._browser.driver
         self.wait = WebDriverWait(self.driver, TIMEOUT, POLL_FREQUENCY)
         self.driver.get(url)
         # 尝试 driver.refresh()
@@ -122,8 +123,7 @@ class ClassifyTree(object):
         return self
 
     def __exit__(self, *args):
-        if self.driver is not None:
-            self.driver.quit()
+        self._browser.release(failed=args[0] is not None)
 
     def yield_classify_tree_bom(self):
         """分类树BOM表"""
@@ -1,7 +1,10 @@
-import pandas as pd
-from functools import partial
+import hashlib
+import json
 import re
 
+import numpy as np
+import pandas as pd
+
 NUM_PAT = re.compile(r"([(]\d{1,}(,\d{1,})?[)]?)")
 N_PAT = re.compile(r"F\d{3}N")
 
@@ -52,23 +55,113 @@ def _get_field_name_maps(tname, field_maps):
         return res
 
 
-def _convert_func(field_type, name=None, fieldName=None):
+def _field_kind(field_type, name=None, fieldName=None):
+    """字段转换类型：'datetime'、'int'或None（保持原值）"""
     # 将 `报告期` 统一为 `报告年度`
     if name == '财务指标行业排名' and fieldName == 'F003D':
-        return partial(pd.to_datetime, errors='coerce')
+        return 'datetime'
     type_ = NUM_PAT.sub('', field_type)
     type_ = type_.upper()
     if type_ in ('VARCHAR', 'CHAR'):
-        return lambda x: x
+        return None
     elif type_ in ('DATE', 'DATETIME'):
-        return partial(pd.to_datetime, errors='coerce')
+        return 'datetime'
     elif type_ in ('BIGINT', 'INT'):
-        return int
+        return 'int'
     elif type_ in ('DECIMAL', 'NUMERIC', 'NUMBER'):
-        return lambda x: x
+        return None
     raise ValueError(f"未定义类型'{type_}'")
 
 
+def _plan_key(field_maps, name):
+    body = json.dumps(field_maps, sort_keys=True, ensure_ascii=False,
+                      default=str)
+    return name, hashlib.blake2b(body.encode(), digest_size=16).hexdigest()
+
+
+_PLANS = {}
+# pandas 2.0 起整列解析时只推断一次格式，需指定格式参数
+_PANDAS_2 = int(pd.__version__.split('.')[0]) >= 2
+
+
+def compile_plan(field_maps, name=None):
+    """字段转换计划，按元数据摘要缓存
+
+    Returns:
+        dict: 字段编码 -> (字段名称, 转换类型)
+    """
+    key = _plan_key(field_maps, name)
+    plan = _PLANS.get(key)
+    if plan is None:
+        name_maps = _get_field_name_maps(name, field_maps)
+        plan = {
+            d['fieldName']: (name_maps[d['fieldName']],
+                             _field_kind(d['fieldType'], name, d['fieldName']))
+            for d in field_maps
+        }
+        _PLANS[key] = plan
+    return plan
+
+
+def _to_datetime(values):
+    if not _PANDAS_2:
+        return pd.to_datetime(values, errors='coerce')
+    # 绝大多数为ISO格式，整列快速解析；其余逐个推断格式
+    res = pd.to_datetime(values, errors='coerce', format='ISO8601')
+    bad = res.isna() & values.notna()
+    if bad.any():
+        res[bad] = pd.to_datetime(values[bad], errors='coerce', format='mixed')
+    return res
+
+
+def _convert(values, kind):
+    """转换列值（仅包含有效值）
+
+    Returns:
+        list: 转换后的Python对象
+    """
+    if kind == 'datetime':
+        return _to_datetime(values).tolist()
+    if kind == 'int':
+        return pd.to_numeric(values, errors='raise').astype('int64').tolist()
+    return values.tolist()
+
+
+def iter_cleaned(data, field_maps, name=None):
+    """逐行输出清理后的数据
+
+    整体构造DataFrame后按列转换、重命名，再逐行输出。
+    与逐行转换一致，值为空（None、''、0等）的字段不保留；
+    不在元数据中的字段保持原名及原值。
+
+    Args:
+        data (list): 字典列表
+        field_maps (list): 字段元数据列表
+        name (str, optional): 项目名称. Defaults to None.
+
+    Yields:
+        dict: 整理后的数据
+    """
+    if not data:
+        return
+    plan = compile_plan(field_maps, name)
+    df = pd.DataFrame(data, dtype=object)
+    columns = []
+    for col in df.columns:
+        values = df[col]
+        # 行中缺少的字段为NaN，与None等空值一并剔除
+        valid = (values.notna() & values.astype(bool)).to_numpy()
+        new_name, kind = plan.get(col, (col, None))
+        converted = np.empty(len(values), dtype=object)
+        converted[valid] = _convert(values[valid], kind)
+        columns.append((new_name, valid.tolist(), converted.tolist()))
+    for i in range(len(df)):
+        yield {
+            new_name: converted[i]
+            for new_name, valid, converted in columns if valid[i]
+        }
+
+
 def cleaned_data(data, field_maps, name=None):
     """清理后的数据
 
@@ -79,12 +172,4 @@ def cleaned_data(data, field_maps, name=None):
     Returns:
         list: 整理后的数据
     """
-    name_maps = _get_field_name_maps(name, field_maps)
-    convert_maps = {
-        d['fieldName']: _convert_func(d['fieldType'], name, d['fieldName'])
-        for d in field_maps
-    }
-    return [{
-        name_maps.get(k, k): convert_maps.get(k, lambda x: x)(v)
-        for k, v in row.items() if v
-    } for row in data]
+    return list(iter_cleaned(data, field_maps, name))
@@ -0,0 +1,207 @@
+"""
+深证信数据浏览器接口（不使用浏览器）
+
+数据浏览器网页中的数据均来自`webapi.cninfo.com.cn`的json接口。
+`cninfo_meta`脚本已将各项目的元数据（`api_path`、`field_maps`、期间类型）
+保存在`config`数据库，直接按元数据构造请求参数，以线程池并发请求。
+
+请求参数与网页查询时发出的请求一致：
+    scode         股票代码
+    sdate、edate  开始及结束日期（日期型项目为`YYYY-MM-DD`，季度项目为季末`YYYYMMDD`）
+    syear         年度
+
+用法：
+    >>> api = WebApi()
+    >>> api.get_data('个股报告期利润表', '000333', '2018-01-01', '2019-12-31')
+    >>> data, failed = api.fetch_all('个股报告期利润表', codes, '2018-01-01')
+"""
+import base64
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+from logbook import Logger
+
+from .._exceptions import ConnectFailed
+from ..mongodb import get_db
+from ..utils import sanitize_dates
+from ..utils.loop_utils import loop_period_by
+from ..websource.base import get_page_response
+from .utils import cleaned_data
+
+BASE_URL = 'http://webapi.cninfo.com.cn'
+META_COLLECTION = '数据浏览器元数据'
+MAX_WORKERS = 8
+
+logger = Logger('深证信接口')
+
+
+def enc_key():
+    """请求头`Accept-EncKey`：当前时间戳的base64编码"""
+    return base64.b64encode(str(int(time.time())).encode()).decode()
+
+
+def load_meta(name=META_COLLECTION):
+    """读取`cninfo_meta`保存的项目元数据
+
+    Returns:
+        list: 元数据字典列表
+    """
+    collection = get_db('config')[name]
+    return list(collection.find({}, {'_id': 0}))
+
+
+def guess_period_type(meta):
+    """元数据未记录期间类型时，按输入参数推断"""
+    params = str(meta.get('inputParameter', ''))
+    if 'syear' in params:
+        return 'YY'
+    if 'sdate' in params:
+        return 'QD'
+    return None
+
+
+def period_params(period_type, start, end, single_code=True):
+    """期间请求参数
+
+    与`SZXPage._internal_ps`及`DataBrowser._set_date_filter`的划分方式一致。
+
+    Args:
+        period_type (str): 期间类型，如'QD'、'YQ'、'YY'，None或空白表示无期间
+        start (Timestamp): 开始日期
+        end (Timestamp): 结束日期
+        single_code (bool, optional): 是否为单个股票查询. Defaults to True.
+
+    Returns:
+        list: 参数字典列表
+    """
+    if not period_type:
+        return [{}]
+    freq, fmt = period_type[0], period_type[1]
+    if single_code and fmt in ('B', 'D', 'W', 'M'):
+        ps = [(start, end)]
+    else:
+        ps = loop_period_by(start, end, freq, period_type == 'YQ')
+    res = []
+    for s, e in ps:
+        if fmt in ('B', 'D', 'W', 'M'):
+            res.append({
+                'sdate': s.strftime(r'%Y-%m-%d'),
+                'edate': e.strftime(r'%Y-%m-%d')
+            })
+        elif fmt == 'Q':
+            t = pd.Period(year=s.year, quarter=e.quarter,
+                          freq='Q').asfreq('D').strftime(r'%Y%m%d')
+            res.append({'sdate': t, 'edate': t})
+        elif fmt == 'Y':
+            res.append({'syear': str(s.year)})
+        else:
+            raise ValueError(f'目前不支持FREQ"{period_type}"格式。')
+    return res
+
+
+def parse_records(json_data):
+    """接口返回的记录，非200结果代码（如402不合法的参数）视为无数据"""
+    if json_data.get('resultcode') == 200:
+        return json_data.get('records') or []
+    return []
+
+
+def post_json(url, params):
+    """发送请求，返回json数据"""
+    headers = {'Accept-EncKey': enc_key(), 'Referer': f'{BASE_URL}/'}
+    r = get_page_response(url, 'post', data=params, headers=headers)
+    return r.json()
+
+
+class WebApi(object):
+    """深证信数据浏览器接口
+
+    Args:
+        meta (list, optional): 项目元数据列表. Defaults to None，读取`config`数据库.
+        max_workers (int, optional): 并发请求数. Defaults to 8.
+        fetch (callable, optional): 以(网址, 参数)调用，返回json数据的函数.
+            Defaults to post_json.
+    """
+
+    def __init__(self, meta=None, max_workers=MAX_WORKERS, fetch=post_json):
+        if meta is None:
+            meta = load_meta()
+        self._by_level = {d['api_level']: d for d in meta}
+        self._by_name = {d['api_name']: d for d in meta}
+        self.max_workers = max_workers
+        self.fetch = fetch
+
+    @property
+    def levels(self):
+        return sorted(self._by_level.keys())
+
+    def get_meta(self, level_or_name):
+        """项目元数据"""
+        meta = self._by_name.get(level_or_name) or self._by_level.get(
+            level_or_name)
+        if meta is None:
+            raise ValueError(f'元数据中不存在项目"{level_or_name}"')
+        return meta
+
+    def make_requests(self, level_or_name, codes, start=None, end=None):
+        """生成请求列表
+
+        Returns:
+            list: [(网址, 参数)]
+        """
+        meta = self.get_meta(level_or_name)
+        period_type = meta.get('period_type', guess_period_type(meta))
+        start, end = sanitize_dates(start, end)
+        url = BASE_URL + meta['api_path']
+        ps = period_params(period_type, pd.Timestamp(start), pd.Timestamp(end))
+        return [(url, dict(p, scode=code)) for code in codes for p in ps]
+
+    def _fetch(self, request):
+        url, params = request
+        return parse_records(self.fetch(url, params))
+
+    def fetch_all(self, level_or_name, codes, start=None, end=None):
+        """并发获取多个股票项目数据
+
+        Args:
+            level_or_name (str): 项目层级或名称
+            codes (list): 股票代码列表
+            start (str, optional): 开始日期. Defaults to None，使用市场开始日期.
+            end (str, optional): 结束日期. Defaults to None，使用当前日期.
+
+        Returns:
+            tuple: (清理后的数据字典列表, 失败的(代码, 参数)列表)
+        """
+        meta = self.get_meta(level_or_name)
+        requests = self.make_requests(level_or_name, codes, start, end)
+        data, failed = [], []
+
+        def run(request):
+            try:
+                return self._fetch(request), None
+            except (ConnectFailed, ValueError, KeyError) as e:
+                # 非json或错误结构的响应只记为该请求失败
+                return None, e
+
+        with ThreadPoolExecutor(self.max_workers) as executor:
+            for request, (records, e) in zip(requests,
+                                             executor.map(run, requests)):
+                if e is None:
+                    data.extend(records)
+                else:
+                    params = request[1]
+                    logger.warning(f"{meta['api_name']} {params} {e}")
+                    failed.append((params['scode'], params))
+        return cleaned_data(data, meta['field_maps'], meta['api_name']), failed
+
+    def get_data(self, level_or_name, code, start=None, end=None):
+        """获取单个股票项目数据（与`FastSearcher.get_data`一致）
+
+        Returns:
+            list: 数据字典列表
+        """
+        data, failed = self.fetch_all(level_or_name, [code], start, end)
+        if failed:
+            raise ConnectFailed(f'{code} {len(failed)}个请求失败')
+        return data
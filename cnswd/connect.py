@@ -1,9 +1,70 @@
+import os
+from importlib.util import find_spec
+
 from pymongo import MongoClient
+
+from .setting.config import DB_PORT, MONGO_CLIENT_OPTIONS
 from .setting.constants import DB_HOST
 
+# 压缩算法所依赖的模块
+_COMPRESSOR_MODULES = {'zstd': 'zstandard', 'snappy': 'snappy', 'zlib': 'zlib'}
+
+
+def _has_compressor(name):
+    try:
+        from pymongo import compression_support
+        return getattr(compression_support, f'_have_{name}')()
+    except (ImportError, AttributeError):
+        return find_spec(_COMPRESSOR_MODULES.get(name, name)) is not None
+
+
+def _available_compressors(compressors):
+    """过滤未安装的压缩算法"""
+    names = [x.strip() for x in compressors.split(',') if x.strip()]
+    return ','.join(x for x in names if _has_compressor(x))
+
+
+def client_options():
+    """客户端参数"""
+    options = dict(MONGO_CLIENT_OPTIONS)
+    compressors = _available_compressors(options.pop('compressors', ''))
+    if compressors:
+        options['compressors'] = compressors
+    return options
+
 
 class Connect(object):
-    @staticmethod
-    def get_connection():
-        # 使用默认值
-        return MongoClient(DB_HOST, 27017)
+    """进程内共享的mongodb客户端
+
+    MongoClient自带连接池及监控线程，应在进程内复用。
+    客户端不能跨进程使用，以进程号区分，子进程中首次调用时重新创建。
+    """
+    _client = None
+    _pid = None
+
+    @classmethod
+    def get_connection(cls):
+        pid = os.getpid()
+        if cls._client is None or cls._pid != pid:
+            # 不关闭父进程创建的客户端，仅丢弃引用
+            cls._client = MongoClient(DB_HOST, DB_PORT, **client_options())
+            cls._pid = pid
+        return cls._client
+
+    @classmethod
+    def close(cls):
+        """关闭当前进程客户端"""
+        if cls._client is not None and cls._pid == os.getpid():
+            cls._client.close()
+        cls._client = None
+        cls._pid = None
+
+
+def _reset_after_fork():
+    # 子进程不得使用父进程客户端
+    Connect._client = None
+    Connect._pid = None
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
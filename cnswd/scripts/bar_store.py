@@ -0,0 +1,50 @@
+"""
+
+日线数据导入本地列式存储
+
+将网易股票、指数日线数据（mongodb按代码分集合存储）导入`cnswd.store`，
+日常刷新时由`wy_stock`、`wy_index`同步写入。
+
+"""
+import time
+
+import pandas as pd
+
+from ..mongodb import get_db
+from ..store import compact_bars, write_bars
+from ..utils import make_logger
+
+logger = make_logger('日线列式存储')
+SOURCES = {'stock': 'wy_stock_daily', 'index': 'wy_index_daily'}
+# 每批写入的代码数量
+BATCH = 200
+
+
+def _read_collection(db, code):
+    docs = list(db[code].find(projection={'_id': 0}))
+    df = pd.DataFrame.from_records(docs)
+    if not df.empty:
+        df['股票代码'] = code
+    return df
+
+
+def migrate(kind='stock'):
+    """全部导入并合并分区文件"""
+    t = time.time()
+    db = get_db(SOURCES[kind])
+    codes = sorted(db.list_collection_names())
+    total = 0
+    for i in range(0, len(codes), BATCH):
+        dfs = [_read_collection(db, code) for code in codes[i:i + BATCH]]
+        dfs = [df for df in dfs if not df.empty]
+        if dfs:
+            total += write_bars(pd.concat(dfs), kind)
+        logger.info(f"{kind} 已导入 {min(i + BATCH, len(codes))}/{len(codes)}")
+    compact(kind)
+    logger.info(f"{kind} 导入 {total} 行, 用时 {time.time() - t:.2f}秒")
+
+
+def compact(kind='stock'):
+    """合并分区文件"""
+    n = compact_bars(kind)
+    logger.info(f"{kind} 合并分区 {n} 个")
@@ -1,8 +1,14 @@
 from cnswd.websource.tencent import get_recent_trading_stocks
-import akshare as ak
 import pandas as pd
 from toolz.dicttoolz import merge
 
+from ..mongodb import get_db
+from ..setting.config import HISTORY_CHUNK_SIZE
+from ..utils.db_utils import create_watermark_index
+
+# 按代码分集合存储数据的水位集合
+WATERMARK_COLLECTION = '数据水位'
+
 
 def get_delist_stock_dates():
     """退市日期字典
@@ -10,6 +16,7 @@ def get_delist_stock_dates():
     键：股票代码
     值：退市日期
     """
+    import akshare as ak
     sz_delist_df = ak.stock_info_sz_delist(indicator="终止上市公司")
     sh_delist_df = ak.stock_info_sh_delist(indicator="终止上市公司")
     res = {}
@@ -28,6 +35,7 @@ def get_stock_status():
     键：股票代码
     值：退市日期。在市交易的股票代码其值为空
     """
+    import akshare as ak
     df = ak.stock_info_a_code_name()
     p1 = set(df['code'].to_list())
     p2 = set(get_recent_trading_stocks())
@@ -37,3 +45,55 @@ def get_stock_status():
     # 注意，退市字典要放在次位置
     # 如有交叉键，则以次位置的值替代
     return merge(d1, d2)
+
+
+def get_watermark_collection():
+    """数据水位集合（stockdb）"""
+    collection = get_db()[WATERMARK_COLLECTION]
+    create_watermark_index(collection)
+    return collection
+
+
+class ChunkSaver(object):
+    """分批保存逐个代码下载的数据
+
+    下载结果放入缓存，达到`chunk_size`个代码时以`{代码: 数据}`调用`save`并清空缓存。
+    内存中最多保留一批数据；中断时只损失未保存的一批（水位未更新，下次重新下载）。
+    保存失败的一批代码记录在`failed`（代码 -> 异常），由调用者重试。
+
+    Args:
+        save (callable): 保存函数，以`{代码: 数据}`调用
+        chunk_size (int, optional): 每批代码数量. Defaults to HISTORY_CHUNK_SIZE.
+    """
+
+    def __init__(self, save, chunk_size=HISTORY_CHUNK_SIZE):
+        self.save = save
+        self.chunk_size = chunk_size
+        self._data = {}
+        self.saved = 0
+        self.failed = {}
+
+    def add(self, code, df):
+        """放入一个代码的数据，用作`fetch_histories`的`on_result`"""
+        self._data[code] = df
+        if len(self._data) >= self.chunk_size:
+            self.flush()
+        return len(df)
+
+    def flush(self):
+        """保存缓存数据"""
+        if not self._data:
+            return
+        try:
+            self.save(self._data)
+        except Exception as e:
+            self.failed.update(dict.fromkeys(self._data, e))
+        else:
+            self.saved += len(self._data)
+        self._data = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.flush()
@@ -5,12 +5,11 @@ import pandas as pd
 from ..cninfo.classify_tree import ClassifyTree
 from ..mongodb import get_db
 
-db = get_db()
-
 
 def refresh():
     # 覆盖式更新
     s = time.time()
+    db = get_db()
     with ClassifyTree() as api:
         collection_name = '股票分类'
         collection = db[collection_name]
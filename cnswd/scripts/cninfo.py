@@ -4,18 +4,23 @@
 
 """
 import sys
+from multiprocessing import Pool
 
 import pandas as pd
-from pymongo.errors import DuplicateKeyError
 
 from .._exceptions import FutureDate
-from ..cninfo import AdvanceSearcher, FastSearcher, ThematicStatistics, CN_INFO_CONFIG
+from ..cninfo import ASR_KEYS, AdvanceSearcher, FastSearcher, ThematicStatistics, CN_INFO_CONFIG
 from ..mongodb import get_db
-from ..utils import loop_period_by, sanitize_dates
+from ..utils import loop_period_by, make_logger, sanitize_dates
+from ..utils.db_utils import bulk_insert
+from ..utils.ledger import FAILED, TaskLedger, default_owner
 
 DT_FMT = r"%Y-%m-%d"
 MIN_DIFF_DAYS = 30
 MAX_DIFF_DAYS = 91
+ASR_JOB = 'cninfo_asr'
+
+logger = make_logger('深证信高级搜索')
 
 
 def get_coll(name):
@@ -104,13 +109,7 @@ def refresh_margin():
         ps = loop_period_by(start, end, freq='B')
         for s, e in ps:
             docs = api.get_data(level, s, e)
-            count = 0
-            for doc in docs:
-                try:
-                    coll.insert_one(doc)
-                    count += 1
-                except DuplicateKeyError:
-                    pass
+            count = bulk_insert(coll, docs).inserted
             t1_str = s.strftime(DT_FMT)
             t2_str = e.strftime(DT_FMT)
             api.logger.info(
@@ -118,12 +117,21 @@ def refresh_margin():
             )
 
 
-def _refresh(coll, api, t1, t2):
-    """数据搜索"""
+def _refresh(coll, api, t1, t2, replace=False):
+    """数据搜索
+
+    Args:
+        replace (bool, optional): 是否先删除期间内已有数据（重试中断的期间）. Defaults to False.
+
+    Returns:
+        int: 插入行数
+    """
     name = coll.name
     docs = api.get_data(name, t1, t2)
     dt_field = CN_INFO_CONFIG[coll.name][1]
     to_add = list(filter(lambda x: t1 <= x[dt_field] <= t2, docs))
+    if replace:
+        coll.delete_many({dt_field: {'$gte': t1, '$lte': t2}})
     if len(to_add):
         coll.insert_many(to_add)
         t1_str = t1.strftime(DT_FMT)
@@ -131,30 +139,93 @@ def _refresh(coll, api, t1, t2):
         api.logger.info(
             f"插入集合'{name}'{len(to_add):>5}行({t1_str} ~ {t2_str} 保留 {len(to_add)}/{len(docs)})"
         )
+    return len(to_add)
+
 
+def asr_tasks(items):
+    """按项目及年度划分任务
 
-def refresh_asr(items):
-    """刷新数据浏览器项目数据"""
+    Returns:
+        list: [(任务键, 参数)]
+    """
+    end = pd.Timestamp('now').normalize()
+    tasks = []
+    for name in items:
+        coll = get_coll(name)
+        if not coll.estimated_document_count() > 0:
+            # 创建索引
+            create_index_for(coll)
+        # 正确处理财报开始日
+        start = get_start(coll)
+        try:
+            # 按年循环，含当年
+            ps = loop_period_by(start, end, 'Y', False)
+        except FutureDate:
+            continue
+        for s, e in ps:
+            t1, t2 = s.strftime(DT_FMT), e.strftime(DT_FMT)
+            tasks.append((f"{name}|{t1}|{t2}", {
+                'name': name,
+                'start': t1,
+                'end': t2
+            }))
+    return tasks
+
+
+def _asr_worker(_=None):
+    """领取任务直至全部完成"""
+    ledger = TaskLedger(ASR_JOB)
+    owner = default_owner()
+    done = 0
     with AdvanceSearcher() as api:
-        pos_list = api.pos_list
-        for pos in pos_list:
-            name = api.level_to_name(pos)
-            if name not in items:
-                continue
-            api.to_level(pos)
-            coll = get_coll(name)
-            if not coll.estimated_document_count() > 0:
-                api.logger.info(f"为集合'{name}'创建索引")
-                # 创建索引
-                create_index_for(coll)
-            # start = get_max_dt(coll, None, None) + pd.Timedelta(days=1)
-            # 正确处理财报开始日
-            start = get_start(coll)
-            end = pd.Timestamp('now').normalize()
+        while True:
+            task = ledger.claim(owner)
+            if task is None:
+                if ledger.wait_retry():
+                    continue
+                break
+            p = task['payload']
+            t1, t2 = pd.Timestamp(p['start']), pd.Timestamp(p['end'])
             try:
-                # 按年循环，含当年
-                ps = loop_period_by(start, end, 'Y', False)
-            except FutureDate:
+                # 一个年度可能下载很久，期间续约；再次领取的任务可能已部分写入
+                with ledger.keep_alive(task):
+                    count = _refresh(get_coll(p['name']), api, t1, t2,
+                                     task['attempts'] > 1)
+            except Exception as e:
+                api.logger.error(
+                    f"{task['key']} 第{task['attempts']}次尝试失败：{e!r}")
+                ledger.fail(task, e)
+                api.reset()
                 continue
-            for s, e in ps:
-                _refresh(coll, api, s, e)
+            ledger.complete(task, inserted=count)
+            done += 1
+    return done
+
+
+def refresh_asr(items=ASR_KEYS, workers=1):
+    """刷新数据浏览器项目数据
+
+    工作清单（项目、年度）登记在任务账本，多个浏览器进程并行领取。
+    中断后再次运行时，收回上次遗留的执行中任务，继续执行未完成的任务。
+
+    Args:
+        items (list, optional): 项目名称列表. Defaults to ASR_KEYS.
+        workers (int, optional): 浏览器进程数. Defaults to 1.
+    """
+    ledger = TaskLedger(ASR_JOB)
+    if ledger.unfinished():
+        ledger.requeue_running()
+        logger.info(f"继续未完成的任务：{ledger.progress()}")
+    else:
+        ledger.clear()
+        num = ledger.add(asr_tasks(items))
+        logger.info(f"登记任务{num}个")
+    if workers <= 1:
+        _asr_worker()
+    else:
+        with Pool(workers) as pool:
+            pool.map(_asr_worker, range(workers))
+    progress = ledger.progress()
+    logger.info(f"完成：{progress}")
+    if progress[FAILED]:
+        logger.warning(f"{progress[FAILED]}个任务失败")
@@ -14,15 +14,17 @@ def _refresh(db, name, api):
     for info in levels:
         level = info.pos
         meta = api.get_level_meta_data(level)
+        # 期间类型决定请求参数，供`cninfo.webapi`直接请求接口
+        meta['period_type'] = api.get_current_period_type(level)
         meta['更新时间'] = pd.Timestamp('now')
         collection.insert_one(meta)
         api.logger.info(f"写入项目 {info.name} 元数据")
-    api.driver.quit()
 
 
 def refresh():
     # 数据浏览器元数据
     db = get_db('config')
-    for name, api in zip(['数据浏览器元数据', '专题统计元数据'],
-                         [FastSearcher(), ThematicStatistics()]):
-        _refresh(db, name, api)
+    for name, cls in zip(['数据浏览器元数据', '专题统计元数据'],
+                         [FastSearcher, ThematicStatistics]):
+        with cls() as api:
+            _refresh(db, name, api)
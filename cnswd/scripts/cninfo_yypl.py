@@ -6,7 +6,6 @@
 import random
 import time
 from requests.exceptions import ConnectionError
-import akshare as ak
 import pandas as pd
 from pandas.tseries.offsets import QuarterEnd
 from pymongo.errors import DuplicateKeyError
@@ -97,6 +96,7 @@ def _refresh(df, collection, tdate, dt):
 
 
 def refresh():
+    import akshare as ak
     start_t = time.time()
     db = get_db(DB_NAME)
     collection = db[COLLECTION_NAME]
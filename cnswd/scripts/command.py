@@ -13,16 +13,10 @@ $ stock wyi
 import asyncio
 
 import click
-import pandas as pd
 
-from ..cninfo import ASR_KEYS
-from ..utils import kill_firefox, remove_temp_files
-from . import (classify, cninfo, cninfo_meta, cninfo_yypl, disclosure,
-               index_codes, sina_margin, sina_news, sina_quote,
-               sina_quote_index, sina_tzpj, sw_class, tct_gn, tct_minutely,
-               ths_gn, ths_news, trading_calendar, trading_codes, treasury,
-               wy_cjmx, wy_cwbg, wy_fhpg, wy_gszl, wy_index, wy_quote,
-               wy_quote_index, wy_stock, wy_yjyg, wy_zycwzb, yahoo)
+from ..cninfo.config import ASR_KEYS
+
+# 子命令所用脚本模块在命令函数内导入，`stock --help`及各命令只加载所需模块
 
 
 @click.group()
@@ -41,6 +35,7 @@ def stock():
 @stock.command()
 def yypl():
     """【巨潮】财报预约披露日期"""
+    from . import cninfo_yypl
     cninfo_yypl.refresh()
 
 
@@ -51,42 +46,57 @@ def yypl():
 @stock.command()
 def trs():
     """刷新国库券利率数据"""
+    from . import treasury
     treasury.refresh()
 
 
 @stock.command()
 def cld():
     """交易日历【网易】"""
+    from . import trading_calendar
     trading_calendar.refresh()
 
 
+@stock.command()
+@click.option('--start', default=None, help='开始日期，默认全部')
+def xsection(start):
+    """由日线数据重建交易截面索引"""
+    from . import cross_section
+    cross_section.rebuild(start)
+
+
 @stock.command()
 def codes():
     """股票代码列表"""
+    from . import trading_codes
     trading_codes.refresh()
 
 
 @stock.command()
 def icodes():
     """指数代码列表"""
+    from . import index_codes
     index_codes.refresh()
 
 
 @stock.command()
 def clsf():
     """【深证信】股票分类及BOM表"""
+    from . import classify
     classify.refresh()
 
 
 @stock.command()
 def tctgn():
     """刷新【腾讯】概念股票列表"""
+    from . import tct_gn
     tct_gn.refresh()
 
 
 @stock.command()
 def thsgn():
     """刷新【同花顺】概念股票列表"""
+    from . import ths_gn
     ths_gn.refresh()
 
 
@@ -99,18 +109,21 @@ def thsgn():
 @click.option('--pages', default=3, help='刷新总页数')
 def snnews(pages):
     """【新浪】财经消息"""
+    from . import sina_news
     sina_news.refresh(pages)
 
 
 @stock.command()
 def sntzpj():
     """【新浪】最新股票评级"""
+    from . import sina_tzpj
     sina_tzpj.refresh()
 
 
 @stock.command()
 def snrzrq():
     """【新浪】融资融券"""
+    from . import sina_margin
     sina_margin.refresh()
 
 
@@ -119,6 +132,7 @@ def snrzrq():
 @click.option('--init', is_flag=True, help='是否初始化')
 def thsnews(pages, init):
     """【同花顺】财经消息"""
+    from . import ths_news
     # before_refresh()
     if init:
         asyncio.run(ths_news.refresh(pages, True))
@@ -130,6 +144,7 @@ def thsnews(pages, init):
 @click.option('--init', is_flag=True, help='是否初始化')
 def dscl(init):
     """【巨潮】刷新公司公告"""
+    from . import disclosure
     # before_refresh()
     asyncio.run(disclosure.refresh(init))
 
@@ -142,24 +157,28 @@ def dscl(init):
 @stock.command()
 def wyquote():
     """【网易】股票实时报价"""
+    from . import wy_quote
     wy_quote.refresh()
 
 
 @stock.command()
 def wyiquote():
     """【网易】股票指数实时报价"""
+    from . import wy_quote_index
     wy_quote_index.refresh()
 
 
 @stock.command()
 def quote():
     """【新浪】股票实时报价"""
+    from . import sina_quote
     asyncio.run(sina_quote.refresh())
 
 
 @stock.command()
 def iquote():
     """【新浪】指数实时报价"""
+    from . import sina_quote_index
     asyncio.run(sina_quote_index.refresh())
 
 
@@ -173,6 +192,7 @@ def iquote():
 @stock.command()
 def wys():
     """刷新【网易】股票日线数据"""
+    from . import wy_stock
     # before_refresh()
     wy_stock.refresh()
 
@@ -180,43 +200,76 @@ def wys():
 @stock.command()
 def wyi():
     """刷新【网易】股票指数日线数据"""
+    from . import wy_index
     # before_refresh()
     wy_index.refresh()
 
 
+@stock.command()
+@click.option('--kind',
+              default='stock',
+              type=click.Choice(['stock', 'index']),
+              help='股票或指数')
+@click.option('--init', is_flag=True, help='从数据库全部导入')
+def bars(kind, init):
+    """日线数据本地列式存储（导入或合并分区文件）"""
+    from . import bar_store
+    if init:
+        bar_store.migrate(kind)
+    else:
+        bar_store.compact(kind)
+
+
+@stock.command()
+@click.option('--init', is_flag=True, help='从数据库全部导入')
+def statements(init):
+    """财务报表本地列式存储（导入或合并分区文件）"""
+    from . import statement_store
+    if init:
+        statement_store.migrate()
+    else:
+        statement_store.compact()
+
+
 @stock.command()
 def wyfhpg():
     """刷新【网易】股票分红配股数据"""
+    from . import wy_fhpg
     wy_fhpg.refresh()
 
 
 @stock.command()
 def wycwbg():
     """刷新【网易】股票财务报告三表"""
+    from . import wy_cwbg
     wy_cwbg.refresh()
 
 
 @stock.command()
 def wyzycwzb():
     """刷新【网易】股票财务主要财务指标"""
+    from . import wy_zycwzb
     wy_zycwzb.refresh()
 
 
 @stock.command()
 def wyyjyg():
     """刷新【网易】股票业绩预告"""
+    from . import wy_yjyg
     wy_yjyg.refresh()
 
 
 @stock.command()
 def wygszl():
     """刷新【网易】公司简介"""
+    from . import wy_gszl
     wy_gszl.refresh()
 
 
 @stock.command()
 def cjmx():
     """刷新【网易】近期成交明细"""
+    from . import wy_cjmx
     # before_refresh()
     wy_cjmx.refresh_last_5()
 
@@ -224,6 +277,7 @@ def cjmx():
 @stock.command()
 def tctm():
     """刷新【腾讯】分钟级别交易数据"""
+    from . import tct_minutely
     # before_refresh()
     tct_minutely.refresh()
 
@@ -232,31 +286,36 @@ def tctm():
 
 
 # region 财报及指标
-# @stock.command()
-# @click.option(
-#     '--items',
-#     required=False,
-#     multiple=True,
-#     default=ASR_KEYS,
-#     type=click.Choice(ASR_KEYS, case_sensitive=False),
-#     help='深证信高级搜索项目数据。指定多项目 stock asr --items=基本资料 --items=个股报告期利润表 \n 全部项目 stock asr',
-# )
-# def asr(items):
-#     """刷新【深证信】数据浏览项目数据"""
-#     # before_refresh()
-#     # click.echo(items)
-#     cninfo.refresh_asr(items)
+@stock.command()
+@click.option(
+    '--items',
+    required=False,
+    multiple=True,
+    default=ASR_KEYS,
+    type=click.Choice(ASR_KEYS, case_sensitive=False),
+    help='深证信高级搜索项目数据。指定多项目 stock asr --items=基本资料 --items=个股报告期利润表 \n 全部项目 stock asr',
+)
+@click.option('--workers',
+              default=2,
+              type=int,
+              help='并行浏览器进程数。中断后再次运行时继续未完成的任务')
+def asr(items, workers):
+    """刷新【深证信】数据浏览项目数据"""
+    from . import cninfo
+    cninfo.refresh_asr(items, workers)
 
 
 @stock.command()
 def yh():
     """刷新【雅虎】财经数据"""
+    from . import yahoo
     yahoo.refresh()
 
 
 @stock.command()
 def swclass():
     """刷新【申万】行业分类"""
+    from . import sw_class
     sw_class.refresh()
 
 
@@ -265,9 +324,27 @@ def swclass():
 # region 其他辅助命令
 
 
+@stock.command()
+@click.option('--list', 'show', is_flag=True, help='列出任务表及下次运行时间')
+@click.option('--jobs',
+              multiple=True,
+              help='只调度指定任务。如 stock daemon --jobs=quote --jobs=iquote')
+def daemon(show, jobs):
+    """后台调度（替代操作系统计划任务）"""
+    import pandas as pd
+    from .daemon import Scheduler, run as run_scheduler
+    if show:
+        with pd.option_context('display.max_rows', None, 'display.width',
+                               200):
+            click.echo(Scheduler().schedule())
+    else:
+        run_scheduler(jobs)
+
+
 @stock.command()
 def clean():
     """清理临时数据"""
+    from ..utils import kill_firefox, remove_temp_files
     remove_temp_files()
     kill_firefox()
 
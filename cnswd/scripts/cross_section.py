@@ -0,0 +1,101 @@
+"""
+
+每日交易截面索引
+
+集合`stockdb['交易截面']`每行对应一个交易日的一只股票：
+    {'日期': 交易日, '股票代码': 代码, '成交量': 成交量}
+
+由`wy_stock`（日线）及`wy_quote`（实时报价）写入数据时同步更新，
+"某日哪些股票有成交"只需一次查询。
+
+"""
+import pandas as pd
+from pymongo import UpdateOne
+
+from ..mongodb import get_db
+
+COLLECTION_NAME = '交易截面'
+# 本进程是否已确认索引
+_indexed = False
+
+
+def get_collection():
+    """交易截面集合（每个进程只创建一次索引，`create_index`对已存在的索引无影响）"""
+    global _indexed
+    collection = get_db()[COLLECTION_NAME]
+    if not _indexed:
+        collection.create_index([('日期', 1), ('股票代码', 1)],
+                                unique=True,
+                                name='date_code_index')
+        _indexed = True
+    return collection
+
+
+def record(df, date_col='日期', code_col='股票代码', volume_col='成交量'):
+    """登记交易截面
+
+    同一日期重复登记时，成交量取最大值（盘中报价成交量递增）。
+
+    Args:
+        df (DataFrame): 包含日期、代码、成交量列的数据
+        date_col (str, optional): 日期列. Defaults to '日期'.
+        code_col (str, optional): 代码列. Defaults to '股票代码'.
+        volume_col (str, optional): 成交量列. Defaults to '成交量'.
+
+    Returns:
+        int: 登记行数
+    """
+    if df.empty:
+        return 0
+    dates = pd.to_datetime(df[date_col]).dt.normalize()
+    volumes = pd.to_numeric(df[volume_col], errors='coerce').fillna(0)
+    ops = [
+        UpdateOne({'日期': d.to_pydatetime(), '股票代码': code},
+                  {'$max': {'成交量': int(v)}},
+                  upsert=True)
+        for d, code, v in zip(dates, df[code_col].values, volumes.values)
+    ]
+    get_collection().bulk_write(ops, ordered=False)
+    return len(ops)
+
+
+def traded_codes(date):
+    """指定日期有成交的股票代码
+
+    Args:
+        date (date like): 日期
+
+    Returns:
+        list: 股票代码列表，索引中无该日期数据时为空
+    """
+    date = pd.Timestamp(date).normalize().to_pydatetime()
+    cursor = get_collection().find({
+        '日期': date,
+        '成交量': {'$gt': 0}
+    }, {'_id': 0, '股票代码': 1})
+    return [doc['股票代码'] for doc in cursor]
+
+
+def traded_dates(start=None, end=None):
+    """有成交的日期（升序）"""
+    flt = {'成交量': {'$gt': 0}}
+    cond = {}
+    if start is not None:
+        cond['$gte'] = pd.Timestamp(start).normalize().to_pydatetime()
+    if end is not None:
+        cond['$lte'] = pd.Timestamp(end).normalize().to_pydatetime()
+    if cond:
+        flt['日期'] = cond
+    return sorted(pd.Timestamp(d) for d in get_collection().distinct('日期', flt))
+
+
+def rebuild(start=None):
+    """由日线数据重建索引（初始化时使用）"""
+    db = get_db('wy_stock_daily')
+    flt = {}
+    if start is not None:
+        flt['日期'] = {'$gte': pd.Timestamp(start).to_pydatetime()}
+    for code in db.list_collection_names():
+        docs = list(db[code].find(flt, {'_id': 0, '日期': 1, '成交量': 1}))
+        if docs:
+            record(pd.DataFrame(docs).assign(股票代码=code))
@@ -0,0 +1,339 @@
+"""
+后台调度
+
+以常驻进程替代操作系统计划任务。任务在进程内线程中运行，共享已初始化的资源：
+mongodb客户端、按主机共享的网络会话、浏览器池及交易日历，
+分钟级任务（quote、iquote、tctm）不再重复启动进程及导入模块。
+
+任务表`JOBS`声明各任务的cron表达式、数据来源及日历条件：
+    calendar=None       按cron运行
+    calendar='trading'  仅交易日运行
+    calendar='session'  仅交易日的交易时段运行
+
+cron最小单位为分钟。需要更高频率的任务（实时报价）以`interval`指定秒数，
+在每次调度的分钟内按该间隔重复运行，至下一分钟调度前结束。
+
+同一任务不重复运行；同一数据来源同时运行的任务数量受`DAEMON_SOURCE_LIMITS`限制；
+任务开始前随机等待`jitter`秒，避免同时请求。
+
+内部使用`multiprocessing`的任务（进程池下载、任务账本多进程执行）以`process=True`
+在spawn方式启动的子进程中运行：调度进程为多线程进程，持有数据库、日志队列等锁，
+直接以fork创建子进程可能死锁。
+
+用法：
+    $ stock daemon
+    $ stock daemon --list
+"""
+import asyncio
+import importlib
+import multiprocessing
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+from logbook import Logger
+
+from ..setting.config import (DAEMON_MAX_WORKERS, DAEMON_QUOTE_INTERVAL,
+                              DAEMON_SOURCE_LIMITS)
+from ..utils.cron_utils import Cron
+
+logger = Logger('任务调度')
+
+# 进程暂停（如休眠）后最多补运行的分钟数
+MAX_CATCHUP = 5
+SESSIONS = (('09:30', '11:30'), ('13:00', '15:00'))
+
+
+def in_session(dt):
+    """是否处于交易时段（不判断是否为交易日）"""
+    t = pd.Timestamp(dt).strftime('%H:%M')
+    return any(s <= t <= e for s, e in SESSIONS)
+
+
+class Job(object):
+    """调度任务
+
+    Args:
+        name (str): 任务名称，与`stock`子命令一致
+        target (str or callable): 函数或`模块:函数`（模块相对于`cnswd.scripts`），
+            协程函数以`asyncio.run`运行
+        cron (str): cron表达式
+        source (str): 数据来源，用于限制同时运行数量
+        calendar (str, optional): 日历条件，None、'trading'或'session'. Defaults to None.
+        jitter (int, optional): 开始前随机等待的最长秒数. Defaults to 0.
+        args (tuple, optional): 位置参数. Defaults to ().
+        kwargs (dict, optional): 关键字参数. Defaults to None.
+        process (bool, optional): 是否在spawn子进程中运行，`target`须为字符串.
+            Defaults to False.
+        interval (int, optional): 分钟内重复运行的间隔秒数. Defaults to None（每次调度运行一次）.
+    """
+
+    def __init__(self,
+                 name,
+                 target,
+                 cron,
+                 source,
+                 calendar=None,
+                 jitter=0,
+                 args=(),
+                 kwargs=None,
+                 process=False,
+                 interval=None):
+        assert calendar in (None, 'trading', 'session')
+        assert not process or isinstance(target, str), '子进程任务须以字符串指定函数'
+        self.name = name
+        self.target = target
+        self.cron = Cron(cron)
+        self.source = source
+        self.calendar = calendar
+        self.jitter = jitter
+        self.args = args
+        self.kwargs = kwargs or {}
+        self.process = process
+        self.interval = interval
+
+    def __repr__(self):
+        return f"Job('{self.name}', '{self.cron.expr}')"
+
+    def resolve(self):
+        """任务函数（首次调用时导入模块）"""
+        return _resolve(self.target)
+
+
+def _resolve(target):
+    if callable(target):
+        return target
+    module, func = target.split(':')
+    if not module.startswith('cnswd.'):
+        module = f'cnswd.scripts.{module}'
+    return getattr(importlib.import_module(module), func)
+
+
+def _call(target, args, kwargs):
+    """运行任务函数，协程函数以`asyncio.run`运行"""
+    result = _resolve(target)(*args, **kwargs)
+    if asyncio.iscoroutine(result):
+        asyncio.run(result)
+
+
+def clean():
+    """清理临时数据
+
+    与`stock clean`不同，不杀死firefox进程：调度进程的浏览器池及同时运行的任务
+    正在使用浏览器，浏览器由浏览器池按使用次数及内存重建。
+    """
+    from ..utils import remove_temp_files
+    remove_temp_files()
+
+
+# 原后台计划任务表（见README）
+JOBS = [
+    # 市场数据
+    Job('cld', 'trading_calendar:refresh', '35 9 * * 1-5', 'wy', jitter=30),
+    Job('codes', 'trading_codes:refresh', '40 9 * * 1-5', 'cninfo', jitter=30),
+    Job('clsf', 'classify:refresh', '0 2 * * 6', 'cninfo'),
+    Job('thsgn', 'ths_gn:refresh', '0 4 * * 6', 'ths'),
+    Job('tctgn', 'tct_gn:refresh', '0 20 * * *', 'tencent', 'trading', 60),
+    Job('trs', 'treasury:refresh', '0 17 * * *', 'treasury', 'trading', 60),
+    Job('yh', 'yahoo:refresh', '0 1 * * 2-6', 'yahoo', jitter=60),
+    Job('snrzrq', 'sina_margin:refresh', '0 9 * * *', 'sina', 'trading', 60),
+    Job('clean', clean, '0 3 * * 6', 'local'),
+    # 财经消息及公告
+    Job('dscl', 'disclosure:refresh', '0 8,16,18 * * *', 'cninfo', jitter=60),
+    Job('snnews', 'sina_news:refresh', '*/30 8-20 * * *', 'sina', jitter=30,
+        args=(3, )),
+    Job('thsnews', 'ths_news:refresh', '15,45 8-20 * * *', 'ths', jitter=30),
+    # 交易数据
+    Job('quote', 'sina_quote:refresh', '* 9-15 * * 1-5', 'sina', 'session', 5,
+        interval=DAEMON_QUOTE_INTERVAL),
+    Job('iquote', 'sina_quote_index:refresh', '* 9-15 * * 1-5', 'sina',
+        'session', 5, interval=DAEMON_QUOTE_INTERVAL),
+    Job('tctm', 'tct_minutely:refresh', '* 9-15 * * 1-5', 'tencent',
+        'session', 5),
+    # 以下任务使用进程池，在子进程中运行
+    Job('wys', 'wy_stock:refresh', '0 18 * * *', 'wy', 'trading', 60,
+        process=True),
+    Job('wyi', 'wy_index:refresh', '10 18 * * *', 'wy', 'trading', 60,
+        process=True),
+    Job('cjmx', 'wy_cjmx:refresh_last_5', '30 18 * * *', 'wy', 'trading', 60,
+        process=True),
+    # 财报及指标
+    Job('asr', 'cninfo:refresh_asr', '0 18 * * *', 'cninfo', jitter=60,
+        process=True),
+]
+
+
+class Scheduler(object):
+    """任务调度
+
+    Args:
+        jobs (list, optional): 任务列表. Defaults to JOBS.
+        max_workers (int, optional): 同时运行的任务数量. Defaults to DAEMON_MAX_WORKERS.
+        source_limits (dict, optional): 各数据来源同时运行的任务数量. Defaults to DAEMON_SOURCE_LIMITS.
+        calendar (TradingCalendar, optional): 交易日历. Defaults to None，使用mongodb交易日历.
+    """
+
+    def __init__(self,
+                 jobs=JOBS,
+                 max_workers=DAEMON_MAX_WORKERS,
+                 source_limits=DAEMON_SOURCE_LIMITS,
+                 calendar=None):
+        self.jobs = list(jobs)
+        self.source_limits = source_limits
+        self._calendar = calendar
+        self._executor = ThreadPoolExecutor(max_workers,
+                                            thread_name_prefix='job')
+        self._semaphores = {}
+        self._running = set()
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._last = None
+
+    @property
+    def calendar(self):
+        if self._calendar is None:
+            from .trading_calendar import get_calendar
+            self._calendar = get_calendar()
+        return self._calendar
+
+    def _semaphore(self, source):
+        with self._lock:
+            sem = self._semaphores.get(source)
+            if sem is None:
+                sem = threading.BoundedSemaphore(
+                    self.source_limits.get(source, 1))
+                self._semaphores[source] = sem
+            return sem
+
+    def is_due(self, job, minute):
+        """任务在指定分钟是否应当运行"""
+        if not job.cron.matches(minute):
+            return False
+        if job.calendar is None:
+            return True
+        try:
+            if not self.calendar.is_session(minute):
+                return False
+        except Exception as e:
+            logger.error(f'读取交易日历失败：{e!r}')
+            return False
+        return job.calendar == 'trading' or in_session(minute)
+
+    def tick(self, now=None):
+        """提交到期任务（含暂停期间错过的分钟）
+
+        Returns:
+            list: 已提交的任务名称
+        """
+        if now is None:
+            now = pd.Timestamp.now()
+        minute = pd.Timestamp(now).floor('min')
+        if self._last is not None and minute <= self._last:
+            return []
+        n = 1
+        if self._last is not None:
+            n = min(int((minute - self._last) / pd.Timedelta(minutes=1)),
+                    MAX_CATCHUP)
+        minutes = [minute - pd.Timedelta(minutes=i) for i in range(n - 1, -1, -1)]
+        self._last = minute
+        submitted = []
+        for m in minutes:
+            for job in self.jobs:
+                if self.is_due(job, m) and self.submit(job) is not None:
+                    submitted.append(job.name)
+        return submitted
+
+    def submit(self, job):
+        """提交任务。任务仍在运行时忽略"""
+        with self._lock:
+            if job.name in self._running:
+                logger.info(f'{job.name} 仍在运行，忽略本次调度')
+                return None
+            self._running.add(job.name)
+        return self._executor.submit(self._run, job)
+
+    def _run(self, job):
+        try:
+            now = time.time()
+            # 重复运行的任务在下一分钟调度前结束
+            deadline = now - now % 60 + 60 - 1
+            if job.jitter and self._stopped.wait(random.uniform(0, job.jitter)):
+                return
+            while True:
+                # 每次运行后释放数据来源限额，避免重复运行期间阻塞同来源的其他任务
+                with self._semaphore(job.source):
+                    start = time.time()
+                    logger.info(f'开始 {job.name}')
+                    if job.process:
+                        self._run_process(job)
+                    else:
+                        _call(job.target, job.args, job.kwargs)
+                    logger.info(
+                        f'完成 {job.name} 用时{time.time() - start:.2f}秒')
+                if not job.interval or start + job.interval >= deadline:
+                    break
+                if self._stopped.wait(max(start + job.interval - time.time(),
+                                          0)):
+                    break
+        except (Exception, SystemExit) as e:
+            logger.error(f'{job.name} 失败：{e!r}')
+        finally:
+            with self._lock:
+                self._running.discard(job.name)
+
+    def _run_process(self, job):
+        """在spawn子进程中运行，等待结束"""
+        ctx = multiprocessing.get_context('spawn')
+        p = ctx.Process(target=_call,
+                        args=(job.target, job.args, job.kwargs),
+                        name=f'job-{job.name}')
+        p.start()
+        p.join()
+        if p.exitcode != 0:
+            raise RuntimeError(f'子进程退出代码 {p.exitcode}')
+
+    def run_forever(self):
+        """每分钟调度一次，直至中断"""
+        logger.info(f'启动调度，共{len(self.jobs)}个任务')
+        try:
+            while not self._stopped.is_set():
+                self.tick()
+                now = time.time()
+                # 等待至下一分钟开始
+                self._stopped.wait(60 - now % 60 + 0.01)
+        except KeyboardInterrupt:
+            logger.info('中断调度')
+        finally:
+            self.stop()
+
+    def stop(self, wait=True):
+        """停止调度，等待运行中的任务完成"""
+        self._stopped.set()
+        self._executor.shutdown(wait=wait)
+
+    def schedule(self, now=None):
+        """各任务下次运行时间（不含日历条件）
+
+        Returns:
+            DataFrame: 任务、cron表达式、数据来源、日历条件及下次运行时间
+        """
+        now = pd.Timestamp.now() if now is None else pd.Timestamp(now)
+        return pd.DataFrame([{
+            '任务': job.name,
+            'cron': job.cron.expr,
+            '来源': job.source,
+            '日历': job.calendar or '',
+            '下次运行': job.cron.next_after(now),
+        } for job in self.jobs])
+
+
+def run(names=None):
+    """运行后台调度
+
+    Args:
+        names (list, optional): 只调度指定任务. Defaults to None（全部）.
+    """
+    jobs = [job for job in JOBS if not names or job.name in names]
+    Scheduler(jobs).run_forever()
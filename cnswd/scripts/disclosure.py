@@ -6,11 +6,11 @@ from datetime import datetime
 
 import aiohttp
 import pandas as pd
-from pymongo.errors import DuplicateKeyError
 from retry.api import retry_call
 
 from ..mongodb import get_db
 from ..utils import make_logger
+from ..utils.db_utils import bulk_insert
 from ..websource.disclosures import fetch_disclosure
 
 aiohttp_logger = logging.getLogger('aiohttp')
@@ -61,18 +61,13 @@ def get_dates():
 def _append(docs):
     db = get_db()
     collection = db[collection_name]
-    count = 0
     t = time.time()
-    for doc in docs:
-        try:
-            collection.insert_one(doc)
-            count += 1
-        except DuplicateKeyError:
-            pass
+    r = bulk_insert(collection, docs, raise_on_failure=False)
+    count = r.inserted
     duration = time.time() - t + 1e-6
     ratio = count / duration
     logger.info(
-        f"Insert {count:>5} docs. write {ratio:.0f} docs/s keep {count}/{len(docs)}"
+        f"Insert {count:>5} docs. write {ratio:.0f} docs/s keep {count}/{len(docs)} duplicated {r.duplicated} failed {r.failed}"
     )
 
 
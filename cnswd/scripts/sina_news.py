@@ -1,8 +1,8 @@
 import pymongo
-from pymongo.errors import DuplicateKeyError
 from retry.api import retry_call
 
 from ..mongodb import get_db
+from ..utils.db_utils import bulk_insert
 from ..websource.sina_news import Sina247News, logger
 
 collection_name = "新浪财经"
@@ -41,14 +41,8 @@ def refresh(pages):
         logger.info(f"初始设置页数：{pages}")
     with Sina247News() as api:
         for docs in api.yield_history_news(pages):
-            count = 0
-            for doc in docs:
-                try:
-                    collection.insert_one(doc)
-                    count += 1
-                except DuplicateKeyError:
-                    pass
-            logger.info(f"新增 {count} 行")
+            r = bulk_insert(collection, docs, raise_on_failure=False)
+            logger.info(f"新增 {r.inserted} 行 重复 {r.duplicated} 行 失败 {r.failed} 行")
 
 
 def create_index(collection):
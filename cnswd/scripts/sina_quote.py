@@ -1,5 +1,4 @@
 import asyncio
-import re
 import time
 import warnings
 from multiprocessing import Pool
@@ -11,34 +10,16 @@ import pandas as pd
 
 from ..mongodb import get_db
 from ..scripts.trading_calendar import is_trading_day
-from ..setting.constants import MARKET_START, MAX_WORKER, QUOTE_COLS
+from ..setting.config import SNAPSHOT_STORAGE
+from ..setting.constants import MARKET_START, MAX_WORKER
+from ..store import write_snapshot
 from ..utils import batch_loop, data_root, make_logger
 from ..utils.db_utils import to_dict
+from ..websource.quote_parser import parse_quotes, quotes_to_frame
 
 db_name = 'quotes'
 logger = make_logger('实时报价')
 warnings.filterwarnings('ignore')
-QUOTE_PATTERN = re.compile('"(.*)"')
-CODE_PATTERN = re.compile(r'hq_str_s[zh](\d{6})')
-
-
-def _convert_to_numeric(s, exclude=()):
-    if pd.api.types.is_string_dtype(s):
-        if exclude:
-            if s.name not in exclude:
-                return pd.to_numeric(s, errors='coerce')
-    return s
-
-
-def _to_dataframe(content):
-    """解析网页数据，返回DataFrame对象"""
-    res = [x.split(',') for x in re.findall(QUOTE_PATTERN, content)]
-    codes = [x for x in re.findall(CODE_PATTERN, content)]
-    df = pd.DataFrame(res).iloc[:, :32]
-    df.columns = QUOTE_COLS[1:]
-    df.insert(0, '股票代码', codes)
-    df.dropna(inplace=True)
-    return df
 
 
 def _add_prefix(stock_code):
@@ -60,12 +41,9 @@ async def fetch(codes):
 async def to_dataframe(codes):
     """解析网页数据，返回DataFrame对象"""
     content = await fetch(codes)
-    df = _to_dataframe(content)
-    df = df.apply(_convert_to_numeric, exclude=('股票代码', '股票简称', '日期', '时间'))
+    df = quotes_to_frame(parse_quotes(content), combine_time=True)
     df = df[df.成交额 > 0]
     if len(df) > 0:
-        df['时间'] = pd.to_datetime(df.日期 + ' ' + df.时间)
-        del df['日期']
         return df
     return pd.DataFrame()
 
@@ -104,7 +82,10 @@ async def refresh():
         df = df.loc[df['时间'] >= today.normalize(), :]
         # 增加 `批次`字段，以便于分析 批与批之间变化趋势
         df['批次'] = today.ceil('s')
-        if len(df):
+        if len(df) and SNAPSHOT_STORAGE:
+            n = write_snapshot(db_name, df, today.ceil('s'))
+            logger.info(f'Snapshot {n} changed rows')
+        elif len(df):
             collection.insert_many(to_dict(df))
             logger.info(f'Inserted {df.shape[0]} rows')
 
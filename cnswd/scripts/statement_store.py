@@ -0,0 +1,52 @@
+"""
+
+财务报表导入本地列式存储
+
+将网易财务报表（mongodb`wy`数据库资产负债表、利润表、现金流量表）导入`cnswd.store`，
+日常刷新时由`wy_cwbg`同步写入。
+
+"""
+import time
+
+import pandas as pd
+
+from ..mongodb import get_db
+from ..store.statements import REPORTS, compact_statements, write_statement
+from ..utils import make_logger
+
+logger = make_logger('财务报表列式存储')
+# 每批读取的代码数量
+BATCH = 200
+
+
+def migrate(report=None):
+    """全部导入并合并分区文件
+
+    Args:
+        report (str, optional): 报表代码. Defaults to None（全部报表）.
+    """
+    t = time.time()
+    db = get_db('wy')
+    reports = list(REPORTS) if report is None else [report]
+    for key in reports:
+        name = REPORTS[key]
+        collection = db[name]
+        codes = sorted(collection.distinct('股票代码'))
+        total = 0
+        for i in range(0, len(codes), BATCH):
+            flt = {'股票代码': {'$in': codes[i:i + BATCH]}}
+            cursor = collection.find(flt, projection={'_id': 0})
+            df = pd.DataFrame.from_records(list(cursor))
+            if not df.empty:
+                total += write_statement(df, key)
+            logger.info(
+                f"{name} 已导入 {min(i + BATCH, len(codes))}/{len(codes)}")
+        logger.info(f"{name} 导入 {total} 项")
+    compact(report)
+    logger.info(f"用时 {time.time() - t:.2f}秒")
+
+
+def compact(report=None):
+    """合并分区文件"""
+    n = compact_statements(report)
+    logger.info(f"合并分区 {n} 个")
@@ -5,7 +5,9 @@ import pandas as pd
 
 from ..mongodb import get_db
 from ..scripts.trading_calendar import is_trading_day
+from ..setting.config import SNAPSHOT_STORAGE
 from ..setting.constants import MAX_WORKER
+from ..store import write_snapshot
 from ..utils import make_logger
 from ..utils.db_utils import to_dict
 from ..websource.tencent import fetch_minutely_prices
@@ -31,6 +33,11 @@ def refresh():
         df['时间'] = dt
         df.rename(columns={'代码': '股票代码'}, inplace=True)
         df['股票代码'] = df['股票代码'].map(lambda x: x[2:])
+        if SNAPSHOT_STORAGE:
+            # `时间`为批次时间，各行相同，不作为变化判断依据
+            n = write_snapshot(db_name, df, dt, ignore_cols=('时间', ))
+            logger.info('快照{}行'.format(n))
+            return
         db = get_db(db_name)
         name = dt.strftime(r"%Y-%m-%d")
         collection = db[name]
@@ -20,15 +20,13 @@ FREQ = '7 days'  # 更新频率
 coll_name = '同花顺概念'
 logger = make_logger(coll_name)
 GN_CODE_PAT = re.compile(r"(\d{6})")
-db = get_db()
-collection = db[coll_name]
 
 
 def create_index(collection):
     collection.create_index([("日期", -1)], name='dt_index')
 
 
-def update(old, new):
+def update(collection, old, new):
     if old:
         new['_id'] = old['_id']
         collection.find_one_and_replace({'_id': old['_id']}, new)
@@ -52,7 +50,7 @@ def _refresh(collection, api, infoes):
             d['股票列表'] = add_info['股票列表']
             d['概念定义'] = add_info['概念定义']
             d['更新时间'] = pd.Timestamp('now')
-            update(old, d)
+            update(collection, old, d)
             api.logger.info(f"更新'{d['概念名称']}'")
             time.sleep(random.uniform(0.2, 0.5))
 
@@ -61,6 +59,7 @@ def refresh():
     if is_trading_time():
         logger.warning('在交易时段内获取股票概念分类数据会导致数据失真')
         return
+    collection = get_db()[coll_name]
     if collection.estimated_document_count() == 0:
         create_index(collection)
     with THS() as api:
@@ -20,8 +20,10 @@ from numpy.random import shuffle
 from ..mongodb import get_db
 from ..setting.constants import MARKET_START
 from ..utils import data_root, ensure_dt_localize, make_logger
+from ..utils.calendar_utils import TradingCalendar
 from ..websource.tencent import get_recent_trading_stocks
 from ..websource.wy import fetch_history, fetch_quote
+from . import cross_section
 from .trading_codes import read_all_stock_codes
 
 DATE_PATTERN = re.compile(r'(\d{4}-\d{2}-\d{2})')
@@ -39,6 +41,8 @@ def _add_prefix(stock_code):
 def _is_today_trading(codes):
     """只有实际成交后才会体现当天为交易日"""
     today = pd.Timestamp.today()
+    if cross_section.traded_codes(today):
+        return True
     quotes = fetch_quote(codes)
     dts = [doc['time'][:10] for doc in quotes]
     return today.strftime(r"%Y/%m/%d") in dts
@@ -80,6 +84,7 @@ def hist_tdates():
         tdates.append(today.normalize())
     # 添加本地数据
     tdates.extend([pd.Timestamp(d) for d in local_hist()])
+    tdates.extend(cross_section.traded_dates(today - pd.Timedelta(days=40)))
     return sorted(set(tdates))[-25:]
 
 
@@ -110,6 +115,32 @@ def get_tdates():
     return collection.find_one()['tdates']
 
 
+def _calendar_version():
+    """交易日历文档更新时间"""
+    doc = get_db('stockdb')['交易日历'].find_one({}, {'update_time': 1})
+    return doc['update_time'] if doc else None
+
+
+def _load_calendar():
+    tdates = get_tdates()
+    return _calendar_version(), tdates
+
+
+_CALENDAR = None
+
+
+def get_calendar():
+    """进程内共享的交易日历
+
+    首次使用时加载，此后只在交易日历文档更新后重新加载。
+    """
+    global _CALENDAR
+    if _CALENDAR is None:
+        _CALENDAR = TradingCalendar(loader=_load_calendar,
+                                    version=_calendar_version)
+    return _CALENDAR
+
+
 def is_trading_day(dt):
     """是否为交易日
 
@@ -121,5 +152,4 @@ def is_trading_day(dt):
     """
     assert isinstance(dt, pd.Timestamp)
     dt = ensure_dt_localize(dt).tz_localize(None).normalize()
-    tdates = get_tdates()
-    return dt.to_pydatetime() in tdates
+    return get_calendar().is_session(dt)
@@ -11,9 +11,10 @@ from retry.api import retry_call
 from ..mongodb import get_db
 from ..scripts.trading_calendar import is_trading_day
 from ..setting.constants import MAX_WORKER
-from ..utils import batch_loop, data_root, ensure_dtypes, make_logger
-from ..utils.db_utils import to_dict
-from ..websource.wy import fetch_cjmx
+from ..store import TickWriter, completed_codes
+from ..utils import batch_loop, data_root, make_logger
+from ..websource.wy import fetch_ticks
+from . import cross_section
 
 logger = make_logger('成交明细')
 DATE_FMT = r'%Y-%m-%d'
@@ -30,44 +31,26 @@ def _last_5():
         return [d.to_pydatetime() for d in dates]
 
 
-def _wy_fix_data(df):
-    dts = df.日期.dt.strftime(DATE_FMT) + ' ' + df.时间
-    df['成交时间'] = pd.to_datetime(dts)
-    del df['时间']
-    del df['日期']
-    df = df.rename(columns={'价格': '成交价', '涨跌额': '价格变动', '方向': '性质'})
-    df = ensure_dtypes(df,
-                       d_cols=['成交时间'],
-                       s_cols=['股票代码', '性质'],
-                       i_cols=['成交量'],
-                       f_cols=['成交价', '成交额'])
-    # 保留2位小数
-    df = df.round({'价格变动': 2, '成交额': 2, '成交价': 2})
-    df.fillna(0.0, inplace=True)
-    return df
-
-
 def bacth_refresh(codes, timestamp):
-    db = get_db('cjmx')
+    """下载并写入列式存储
+
+    逐只股票解析后交由`TickWriter`分批写入，已写入的股票登记为完成。
+    """
     date_str = timestamp.strftime(DATE_FMT)
-    collection = db[date_str]
-    if collection.estimated_document_count() == 0:
-        create_index(collection)
     status = {}
-    for code in codes:
-        try:
-            df = retry_call(fetch_cjmx, [code, date_str],
-                            delay=0.3,
-                            tries=3,
-                            logger=logger)
-            if not df.empty:
-                df = _wy_fix_data(df)
-                collection.insert_many(to_dict(df))
-            logger.info(f'股票 {code} {date_str} 共 {len(df):>5} 行')
-            status[code] = True
-        except Exception as e:
-            logger.info(f'股票 {code} 日期 {date_str} {e!r}')
-            status[code] = False
+    with TickWriter(timestamp) as writer:
+        for code in codes:
+            try:
+                df = retry_call(fetch_ticks, [code, date_str],
+                                delay=0.3,
+                                tries=3,
+                                logger=logger)
+                writer.add(code, df)
+                logger.info(f'股票 {code} {date_str} 共 {len(df):>5} 行')
+                status[code] = True
+            except Exception as e:
+                logger.info(f'股票 {code} 日期 {date_str} {e!r}')
+                status[code] = False
 
     failed = [k for k, v in status.items() if not v]
     if len(failed):
@@ -88,18 +71,15 @@ def was_traded(db, code, timestamp):
 @lru_cache(None)
 def get_traded_codes(timestamp):
     """当天交易的股票代码列表"""
+    codes = cross_section.traded_codes(timestamp)
+    if codes:
+        return codes
+    # 交易截面尚无该日数据时，逐个检查日线数据
     db = get_db('wy_stock_daily')
     codes = db.list_collection_names()
     return [code for code in codes if was_traded(db, code, timestamp)]
 
 
-def completed_codes(timestamp):
-    """已经下载的股票代码"""
-    db = get_db('cjmx')
-    collection = db[timestamp.strftime(DATE_FMT)]
-    return collection.distinct('股票代码')
-
-
 def _refresh(timestamp):
     """刷新指定日期成交明细数据(只能为近5天)"""
     t_codes = get_traded_codes(timestamp)
@@ -122,11 +102,6 @@ def refresh(timestamp):
             break
 
 
-def create_index(collection):
-    collection.create_index([("成交时间", -1)], name='dt_index')
-    collection.create_index([("股票代码", 1)], name='code_index')
-
-
 def refresh_last_5():
     """刷新最近5天成交明细"""
     tdates = [pd.Timestamp(d) for d in _last_5()]
@@ -1,23 +1,25 @@
-import re
 import time
 from functools import partial
 from itertools import product
-from multiprocessing import Manager, Pool
 
 import pandas as pd
 from numpy.random import shuffle
-from toolz import partition_all
-from toolz.dicttoolz import valfilter
 
 from cnswd.mongodb import get_db
+from cnswd.setting.config import STATEMENT_STORE_ENABLED
 from cnswd.setting.constants import MARKET_START, MAX_WORKER
+from cnswd.store import write_statement
 from cnswd.utils import make_logger
+from cnswd.utils.db_utils import bulk_insert, max_by_code, stale_codes
+from cnswd.utils.ledger import run_tasks
 from cnswd.websource.wy import fetch_financial_report
 
 from .base import get_stock_status
 
 logger = make_logger('网易财务分析')
 
+JOB = 'wy_cwbg'
+
 NAMES = {'zcfzb': '资产负债表', 'lrb': '利润表', 'xjllb': '现金流量表'}
 # NAMES = {'xjllb': '现金流量表'}  # 删除
 START = MARKET_START.tz_localize(None)
@@ -30,46 +32,13 @@ def create_index_for(collection):
         collection.create_index([(DATE_KEY, 1), ("股票代码", 1)], unique=True)
 
 
-def need_refresh(collection, code):
-    """是否需要刷新
+def get_max_dts(collection):
+    """各股票最后日期
 
-    简单规则：
-        如果已经存在数据，且24小时内已经刷新 ❌ 否则 ✔
+    单次聚合计算全部股票最后日期，避免逐个股票查询。
     """
-    now = pd.Timestamp('now')
-    doc = collection.find_one({'股票代码': code})
-    if doc and now - doc['更新时间'] < pd.Timedelta(days=1):
-        return False
-    return True
-
-
-def get_max_dt(collection, code):
-    """最后日期"""
-    pipe = [
-        {
-            '$match': {'股票代码': code}
-        },
-        {
-            '$sort': {
-                DATE_KEY: -1
-            }
-        },
-        {
-            '$project': {
-                '_id': 0,
-                DATE_KEY: 1
-            }
-        },
-        {
-            '$limit': 1
-        },
-    ]
-    try:
-        res = list(collection.aggregate(pipe))[0]
-        dt = pd.Timestamp(res[DATE_KEY])
-        return dt
-    except (IndexError, ):
-        return START
+    res = max_by_code(collection, DATE_KEY)
+    return {code: pd.Timestamp(dt) for code, dt in res.items()}
 
 
 def _droped_null(doc):
@@ -80,66 +49,61 @@ def _droped_null(doc):
     return res
 
 
-def _refresh(batch, d):
-    db = get_db('wy')
-    for key, name in NAMES.items():
-        collection = db[name]
-        create_index_for(collection)
-        for code in batch:
-            # 首先检查状态，减少数据库查询
-            if d.get((code, key), False):
-                continue
-            if not need_refresh(collection, code):
-                d[(code, key)] = True
-                logger.info(f"股票 {code} {name:>7} 已经刷新")
-                continue
-            try:
-                # 此处下载股票全部历史数据
-                df = fetch_financial_report(code, key)
-            except (ValueError, KeyError, IndexError) as e:
-                logger.error(f"股票 {code} {name:>7} 可忽略异常 {e}")
-                # 网页不存在时发生，忽略
-                # 标注为完成状态
-                d[(code, key)] = True
-                continue
-            except Exception as e:
-                logger.error(f"股票 {code} {name:>7} 失败 {e}")
-                continue
-            # 正常情形下运行以下代码
-            df['股票代码'] = code
-            df[DATE_KEY] = pd.to_datetime(df[DATE_KEY], errors='ignore')
-            last_dt = get_max_dt(collection, code)
-            # 只有新增数据才需要添加
-            df = df[df[DATE_KEY] > last_dt]
-            if not df.empty:
-                for doc in df.to_dict('records'):
-                    doc['更新时间'] = pd.Timestamp('now')
-                    collection.insert_one(_droped_null(doc))
-            logger.info(f"完成股票 {code} {name:>7} 刷新")
-            d[(code, key)] = True
+def _refresh(code, key, max_dts):
+    name = NAMES[key]
+    collection = get_db('wy')[name]
+    try:
+        # 此处下载股票全部历史数据
+        df = fetch_financial_report(code, key)
+    except (ValueError, KeyError, IndexError) as e:
+        # 网页不存在时发生，忽略
+        # 视为完成
+        logger.error(f"股票 {code} {name:>7} 可忽略异常 {e}")
+        return
+    except Exception as e:
+        logger.error(f"股票 {code} {name:>7} 失败 {e}")
+        raise
+    # 正常情形下运行以下代码
+    df['股票代码'] = code
+    df[DATE_KEY] = pd.to_datetime(df[DATE_KEY], errors='ignore')
+    last_dt = max_dts[key].get(code, START)
+    # 只有新增数据才需要添加
+    df = df[df[DATE_KEY] > last_dt]
+    if not df.empty:
+        df = df.assign(更新时间=pd.Timestamp('now'))
+        if STATEMENT_STORE_ENABLED:
+            write_statement(df, key)
+        docs = [_droped_null(doc) for doc in df.to_dict('records')]
+        bulk_insert(collection, docs)
+    logger.info(f"完成股票 {code} {name:>7} 刷新")
 
 
 def refresh():
+    """刷新财务报告
+
+    需要刷新的（股票, 报表）任务登记在任务账本，多进程成批领取，中断后再次运行时继续未完成的任务。
+    """
     t = time.time()
     codes = list(get_stock_status().keys())
     shuffle(codes)
-    # 约4000只股票，每批300只
-    batches = partition_all(300, codes)
     logger.info(f"股票数量 {len(codes)}")
-    # 多进程
-    with Manager() as manager:
-        d = manager.dict()
-        for k in product(codes, NAMES.keys()):
-            d[k] = False
-        func = partial(_refresh, d=d)
-        for i in range(10):
-            if all(d.values()):
-                break
-            logger.info(f"第{i+1}次尝试")
-            # 异步导致失败
-            with Pool(MAX_WORKER) as pool:
-                pool.map(func, batches)
-            time.sleep(30)
-        failed = valfilter(lambda x: x == False, d)
-        logger.warning(f"失败数量：{len(failed)}")
+    db = get_db('wy')
+    for name in NAMES.values():
+        create_index_for(db[name])
+    max_dts = {key: get_max_dts(db[name]) for key, name in NAMES.items()}
+    # 24小时内已经刷新的股票登记为已完成
+    stale = {key: stale_codes(db[name], codes) for key, name in NAMES.items()}
+    tasks, done = [], []
+    for code, key in product(codes, NAMES.keys()):
+        task = (f'{code}|{key}', {'code': code, 'key': key})
+        if code in stale[key]:
+            tasks.append(task)
+        else:
+            done.append(task)
+    run_tasks(JOB,
+              tasks,
+              partial(_refresh, max_dts=max_dts),
+              MAX_WORKER,
+              logger=logger,
+              done=done)
     logger.info(f"股票数量 {len(codes)}, 用时 {time.time() - t:.2f}秒")
@@ -1,5 +1,6 @@
 import re
 import time
+from functools import partial
 from multiprocessing import Pool
 
 import pandas as pd
@@ -7,8 +8,11 @@ import pandas as pd
 from cnswd.mongodb import get_db
 from cnswd.websource.wy import fetch_fhpg
 
+from ..setting.config import ADJUST_STORE_ENABLED
 from ..setting.constants import MARKET_START, MAX_WORKER
+from ..store.adjust import load_dividends, update_factors
 from ..utils import make_logger
+from ..utils.db_utils import bulk_insert, max_by_code
 from .base import get_stock_status
 
 logger = make_logger('网易分红配股')
@@ -25,33 +29,13 @@ def create_index_for(collection):
         collection.create_index([("公告日期", 1), ("股票代码", 1)])
 
 
-def get_max_dt(collection, code):
-    """最后日期"""
-    pipe = [
-        {
-            '$match': {'股票代码': code}
-        },
-        {
-            '$sort': {
-                '公告日期': -1
-            }
-        },
-        {
-            '$project': {
-                '_id': 0,
-                '公告日期': 1
-            }
-        },
-        {
-            '$limit': 1
-        },
-    ]
-    try:
-        res = list(collection.aggregate(pipe))[0]
-        dt = pd.Timestamp(res['公告日期'])
-        return dt
-    except (IndexError, ):
-        return START
+def get_max_dts(collection):
+    """各股票最后日期
+
+    单次聚合计算全部股票最后日期，避免逐个股票查询。
+    """
+    res = max_by_code(collection, '公告日期')
+    return {code: pd.Timestamp(dt) for code, dt in res.items()}
 
 
 def _fix_data(df):
@@ -71,7 +55,7 @@ def _droped_null(doc):
     return res
 
 
-def _refresh(code):
+def _refresh(code, max_dts):
     db = get_db('wy')
     try:
         dfs = fetch_fhpg(code)
@@ -84,16 +68,22 @@ def _refresh(code):
         df = _fix_data(df)
         collection = db[name]
         create_index_for(collection)
-        last_dt = get_max_dt(collection, code)
+        last_dt = max_dts[name].get(code, START)
         df = df[df['公告日期'] > last_dt]
         if not df.empty:
-            for doc in df.to_dict('records'):
-                collection.insert_one(_droped_null(doc))
+            docs = [_droped_null(doc) for doc in df.to_dict('records')]
+            bulk_insert(collection, docs)
 
 
 def refresh():
     t = time.time()
     codes = get_stock_status().keys()
+    db = get_db('wy')
+    max_dts = {name: get_max_dts(db[name]) for name in NAMES}
+    func = partial(_refresh, max_dts=max_dts)
     with Pool(MAX_WORKER) as pool:
-        list(pool.imap_unordered(_refresh, codes))
+        list(pool.imap_unordered(func, codes))
+    if ADJUST_STORE_ENABLED:
+        n = update_factors(load_dividends())
+        logger.info(f"新增复权因子 {n} 个")
     logger.info(f"股票数量 {len(codes)}, 用时 {time.time() - t:.2f}秒")
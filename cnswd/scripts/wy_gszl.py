@@ -1,23 +1,21 @@
-import re
 import time
-from functools import partial
-from itertools import product
-from multiprocessing import Manager, Pool
 
 import pandas as pd
 from numpy.random import shuffle
-from toolz import partition_all
-from toolz.dicttoolz import valfilter
 
 from cnswd.mongodb import get_db
 from cnswd.setting.constants import MARKET_START, MAX_WORKER
 from cnswd.utils import make_logger
+from cnswd.utils.db_utils import max_by_code, stale_codes
+from cnswd.utils.ledger import run_tasks
 from cnswd.websource.wy import fetch_company_info
 
 from .base import get_stock_status
 
 logger = make_logger('网易公司资料')
 
+JOB = 'wy_gszl'
+
 NAMES = ['公司简介', 'IPO资料']
 START = MARKET_START.tz_localize(None)
 
@@ -28,21 +26,20 @@ def create_index_for(collection):
         collection.create_index([("股票代码", 1)])
 
 
-def need_refresh(collection2, code):
-    """是否需要刷新
+def need_refresh(collection2, codes):
+    """需要刷新的股票
 
     简单规则：
-        如果已经存在IPO日期，且24小时内已经刷新 ❌ 否则 ✔
+        如果已经存在IPO日期，或24小时内已经刷新 ❌ 否则 ✔
+
+    以单次聚合取得各股票最后更新时间及上市日期，不逐个股票查询。
     """
-    now = pd.Timestamp('now')
-    doc = collection2.find_one({'股票代码': code})
-    if doc:
-        # 当更新间隔时间超过一天，且上市日期为空时才需要更新
-        cond1 = now - doc['更新时间'] >= pd.Timedelta(days=1)
-        cond2 = pd.isnull(doc.get('上市日期', None))
-        return cond1 and cond2
-    else:
-        return True
+    # 已有上市日期的股票不再刷新
+    listed = max_by_code(collection2, '上市日期')
+    return {
+        code
+        for code in stale_codes(collection2, codes) if code not in listed
+    }
 
 
 def _droped_null(doc):
@@ -53,54 +50,39 @@ def _droped_null(doc):
     return res
 
 
-def _refresh(batch, d):
+def _refresh(code):
     db = get_db('wy')
     collection1 = db[NAMES[0]]
     collection2 = db[NAMES[1]]
-    for code in batch:
-        # 首先检查状态，减少数据库查询
-        if d.get(code, False):
-            continue
-        if not need_refresh(collection2, code):
-            d[code] = True
-            logger.info(f"股票 {code} 已经刷新")
-            continue
-        try:
-            doc1, doc2 = fetch_company_info(code)
-            doc1['股票代码'] = code
-            doc1['更新时间'] = pd.Timestamp('now')
-            doc2['股票代码'] = code
-            doc2['更新时间'] = pd.Timestamp('now')
-            collection1.insert_one(doc1)
-            collection2.insert_one(doc2)
-            d[code] = True
-        except Exception as e:
-            logger.error(f"{e}")
-            continue
-        logger.info(f"完成股票 {code} 刷新")
+    try:
+        doc1, doc2 = fetch_company_info(code)
+        doc1['股票代码'] = code
+        doc1['更新时间'] = pd.Timestamp('now')
+        doc2['股票代码'] = code
+        doc2['更新时间'] = pd.Timestamp('now')
+        collection1.insert_one(doc1)
+        collection2.insert_one(doc2)
+    except Exception as e:
+        logger.error(f"{e}")
+        raise
+    logger.info(f"完成股票 {code} 刷新")
 
 
 def refresh():
+    """刷新公司资料
+
+    需要刷新的股票任务登记在任务账本，多进程成批领取，中断后再次运行时继续未完成的任务。
+    """
     t = time.time()
     codes = list(get_stock_status().keys())
     shuffle(codes)
-    # 约4000只股票，每批300只
-    batches = partition_all(300, codes)
-
-    # 多进程
-    with Manager() as manager:
-        d = manager.dict()
-        for k in codes:
-            d[k] = False
-        func = partial(_refresh, d=d)
-        for _ in range(100):
-            try:
-                with Pool(MAX_WORKER) as pool:
-                    list(pool.imap_unordered(func, batches))
-            except Exception as e:
-                logger.error(f"{e}")
-                time.sleep(30)
-        failed = valfilter(lambda x: x == False, d)
-        logger.warning(f"失败数量：{len(failed)}")
-        # print(f"失败项目 {failed} ")
+
+    db = get_db('wy')
+    for name in NAMES:
+        create_index_for(db[name])
+    stale = need_refresh(db[NAMES[1]], codes)
+    # 无需刷新的股票登记为已完成
+    tasks = [(code, {'code': code}) for code in codes if code in stale]
+    done = [(code, {'code': code}) for code in codes if code not in stale]
+    run_tasks(JOB, tasks, _refresh, MAX_WORKER, logger=logger, done=done)
     logger.info(f"股票数量 {len(codes)}, 用时 {time.time() - t:.2f}秒")
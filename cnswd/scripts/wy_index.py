@@ -4,17 +4,20 @@
 
 """
 import time
-from multiprocessing import Pool
+from functools import partial
 
 import pandas as pd
-from retry.api import retry_call
 
 from ..mongodb import get_db
-from ..setting.constants import MAIN_INDEX, MARKET_START, MAX_WORKER
+from ..setting.config import BAR_STORE_ENABLED
+from ..setting.constants import MAIN_INDEX, MARKET_START
+from ..store import write_bars
 from ..utils import ensure_dtypes
-from ..utils.db_utils import to_dict
+from ..utils.db_utils import get_watermarks, to_dict, update_watermark
 from ..utils.log_utils import make_logger
-from ..websource.wy import fetch_history, get_index_base
+from ..websource.aio import fetch_states
+from ..websource.wy import fetch_histories, get_index_base
+from .base import WATERMARK_COLLECTION, ChunkSaver, get_watermark_collection
 
 logger = make_logger('网易指数日线')
 db_name = "wy_index_daily"
@@ -41,43 +44,71 @@ def _fix_data(df):
     return df
 
 
-def _one(code):
-    db = get_db(db_name)
-    collection = db[code]
-    if collection.estimated_document_count() == 0:
-        create_index(collection)
-    start = find_last_date(collection) + pd.Timedelta(days=1)
-    start = pd.Timestamp(start)
+def _start_date(code, marks):
+    """开始日期（水位次日）"""
+    last_date = marks.get(code)
+    if last_date is None:
+        # 尚无水位记录时查询集合
+        collection = get_db(db_name)[code]
+        if collection.estimated_document_count() == 0:
+            create_index(collection)
+        last_date = find_last_date(collection)
+        update_watermark(get_db()[WATERMARK_COLLECTION], db_name, code,
+                         last_date)
+    return pd.Timestamp(last_date) + pd.Timedelta(days=1)
+
+
+def _prepare(df):
+    """整理下载数据"""
+    df.reset_index(inplace=True)
+    df = ensure_dtypes(df, **col_dtypes)
+    return _fix_data(df)
+
+
+def _save(code, fixed, start):
     start_str = start.strftime(r"%Y-%m-%d")
-    df = retry_call(fetch_history,
-                    fkwargs={
-                        'code': code,
-                        'start': start,
-                        'is_index': True
-                    },
-                    exceptions=(ConnectionError, ValueError),
-                    delay=0.3,
-                    logger=logger,
-                    tries=3)
-    if df.empty:
+    if fixed.empty:
         logger.info(f"指数代码 {code} 开始日期 {start_str} 数据为空")
         return
-    df.reset_index(inplace=True)
-    df = ensure_dtypes(df, **col_dtypes)
-    fixed = _fix_data(df)
-    fixed.drop(['股票代码'], axis=1, inplace=True)
-    docs = to_dict(fixed)
-    collection.insert_many(docs)
+    docs = to_dict(fixed.drop(['股票代码'], axis=1))
+    get_db(db_name)[code].insert_many(docs)
+    update_watermark(get_db()[WATERMARK_COLLECTION], db_name, code,
+                     fixed['日期'].max())
     logger.info(f"指数代码 {code} 开始日期 {start_str} 插入 {len(docs)} 行")
 
 
+def _save_chunk(data, starts):
+    """保存一批代码的数据"""
+    data = {code: _prepare(df) for code, df in data.items()}
+    if BAR_STORE_ENABLED:
+        # 先整批写入本地存储（重复数据读取时自动去重），再写入数据库
+        write_bars(pd.concat(data.values()), 'index')
+    for code, fixed in data.items():
+        try:
+            _save(code, fixed, starts[code])
+        except Exception as e:
+            logger.error(f"指数代码 {code} 保存失败 {e!r}")
+
+
 def refresh():
     t = time.time()
     # codes = MAIN_INDEX.keys()
     codes = get_index_base().to_dict()['name'].keys()
-    for code in codes:
-        try:
-            _one(code)
-        except Exception as e:
-            print(f"{e!r}")
+    # 一次读取全部水位，避免逐个代码查询最后日期
+    marks = get_watermarks(get_watermark_collection(), db_name)
+    starts = {code: _start_date(code, marks) for code in codes}
+    for i in range(3):
+        # 异步下载，只重试失败代码；边下载边分批保存，不在内存中保留全部数据
+        with ChunkSaver(partial(_save_chunk, starts=starts)) as saver:
+            _, failed = fetch_histories(starts,
+                                        is_index=True,
+                                        on_result=saver.add)
+        # 保存失败的代码与下载失败的代码一并重试
+        failed.update(fetch_states(saver.failed))
+        if not failed:
+            break
+        logger.info(f"第{i+1}轮 失败数量 {len(failed)}")
+        starts = {code: starts[code] for code in failed}
+    for code, state in failed.items():
+        logger.warning(f"指数代码 {code} 失败 {state.error!r}")
     logger.info(f"指数数量 {len(codes)}, 用时 {time.time() - t:.4f}秒")
@@ -7,6 +7,7 @@ from ..mongodb import get_db
 from ..scripts.trading_calendar import is_trading_day
 from ..utils import make_logger
 from ..websource.wy import fetch_quote
+from . import cross_section
 
 DB_NAME = 'wy_quotes'
 DATE_KEY = 'update'
@@ -40,9 +41,12 @@ def refresh():
         logger.warning(f"{today} 非交易日")
         return
     docs = [_to_timestamp(doc) for doc in fetch_quote(codes)]
-    docs = filter(lambda d: d[DATE_KEY].floor('D') == today, docs)
-    r = collection.insert_many(list(docs))
+    docs = list(filter(lambda d: d[DATE_KEY].floor('D') == today, docs))
+    r = collection.insert_many(docs)
     logger.info(f'Inserted {len(r.inserted_ids)} rows')
+    # 同步登记交易截面
+    df = pd.DataFrame(docs, columns=['code', 'volume']).assign(日期=today)
+    cross_section.record(df, code_col='code', volume_col='volume')
 
 
 QUOTE_COL_MAPS = {
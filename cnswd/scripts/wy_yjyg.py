@@ -1,24 +1,23 @@
 """网易 财务分析 业绩预告"""
-import re
 import time
 from functools import partial
-from itertools import product
-from multiprocessing import Manager, Pool
 
 import pandas as pd
 from numpy.random import shuffle
-from toolz import partition_all
-from toolz.dicttoolz import valfilter
 
 from cnswd.mongodb import get_db
 from cnswd.setting.constants import MARKET_START, MAX_WORKER
 from cnswd.utils import make_logger
+from cnswd.utils.db_utils import bulk_insert, max_by_code, stale_codes
+from cnswd.utils.ledger import run_tasks
 from cnswd.websource.wy import fetch_yjyg
 
 from .base import get_stock_status
 
 logger = make_logger('网易业绩预告')
 
+JOB = 'wy_yjyg'
+
 
 START = MARKET_START.tz_localize(None)
 DATE_KEY_1 = '公告日期'
@@ -32,46 +31,13 @@ def create_index_for(collection):
             [(DATE_KEY_1, 1), (DATE_KEY_2, 1), ("股票代码", 1)], unique=True)
 
 
-def need_refresh(collection, code):
-    """是否需要刷新
+def get_max_dts(collection):
+    """各股票最后日期
 
-    简单规则：
-        如果已经存在数据，且24小时内已经刷新 ❌ 否则 ✔
+    单次聚合计算全部股票最后日期，避免逐个股票查询。
     """
-    now = pd.Timestamp('now')
-    doc = collection.find_one({'股票代码': code})
-    if doc and now - doc['更新时间'] < pd.Timedelta(days=1):
-        return False
-    return True
-
-
-def get_max_dt(collection, code):
-    """最后日期"""
-    pipe = [
-        {
-            '$match': {'股票代码': code}
-        },
-        {
-            '$sort': {
-                DATE_KEY_1: -1
-            }
-        },
-        {
-            '$project': {
-                '_id': 0,
-                DATE_KEY_1: 1
-            }
-        },
-        {
-            '$limit': 1
-        },
-    ]
-    try:
-        res = list(collection.aggregate(pipe))[0]
-        dt = pd.Timestamp(res[DATE_KEY_1])
-        return dt
-    except (IndexError, ):
-        return START
+    res = max_by_code(collection, DATE_KEY_1)
+    return {code: pd.Timestamp(dt) for code, dt in res.items()}
 
 
 def _droped_null(doc):
@@ -82,62 +48,51 @@ def _droped_null(doc):
     return res
 
 
-def _refresh(batch, d):
-    db = get_db('wy')
-    collection = db['业绩预告']
-    create_index_for(collection)
-    for code in batch:
-        # 首先检查状态，减少数据库查询
-        if d.get(code, False):
-            continue
-        if not need_refresh(collection, code):
-            d[code] = True
-            logger.info(f"股票 {code} 业绩预告 已经刷新")
-            continue
-        try:
-            docs = fetch_yjyg(code)
-        except (ValueError, KeyError):
-            # 网页不存在时发生，忽略
-            # 标注为完成状态
-            d[code] = True
-            continue
-        except Exception as e:
-            logger.error(f"股票 {code} 业绩预告 失败 {e}")
-            continue
-        # 正常情形下运行以下代码
-        last_dt = get_max_dt(collection, code)
-        for doc in docs:
-            doc['股票代码'] = code
-            doc[DATE_KEY_1] = pd.to_datetime(doc[DATE_KEY_1], errors='ignore')
-            doc['报告日期'] = pd.to_datetime(doc['报告日期'], errors='ignore')
-            if doc[DATE_KEY_1] > last_dt:
-                doc['更新时间'] = pd.Timestamp('now')
-                collection.insert_one(_droped_null(doc))
-        logger.info(f"完成股票 {code} 业绩预告 刷新")
-        d[code] = True
+def _refresh(code, max_dts):
+    collection = get_db('wy')['业绩预告']
+    try:
+        docs = fetch_yjyg(code)
+    except (ValueError, KeyError):
+        # 网页不存在时发生，忽略
+        # 视为完成
+        return
+    except Exception as e:
+        logger.error(f"股票 {code} 业绩预告 失败 {e}")
+        raise
+    # 正常情形下运行以下代码
+    last_dt = max_dts.get(code, START)
+    to_add = []
+    for doc in docs:
+        doc['股票代码'] = code
+        doc[DATE_KEY_1] = pd.to_datetime(doc[DATE_KEY_1], errors='ignore')
+        doc['报告日期'] = pd.to_datetime(doc['报告日期'], errors='ignore')
+        if doc[DATE_KEY_1] > last_dt:
+            doc['更新时间'] = pd.Timestamp('now')
+            to_add.append(_droped_null(doc))
+    bulk_insert(collection, to_add)
+    logger.info(f"完成股票 {code} 业绩预告 刷新")
 
 
 def refresh():
+    """刷新业绩预告
+
+    需要刷新的股票任务登记在任务账本，多进程成批领取，中断后再次运行时继续未完成的任务。
+    """
     t = time.time()
     codes = list(get_stock_status().keys())
     shuffle(codes)
-    # 约4000只股票，每批300只
-    batches = partition_all(300, codes)
-
-    # 多进程
-    with Manager() as manager:
-        d = manager.dict()
-        for code in codes:
-            d[code] = False
-        func = partial(_refresh, d=d)
-        for _ in range(10):
-            try:
-                with Pool(MAX_WORKER) as pool:
-                    list(pool.imap_unordered(func, batches))
-            except Exception as e:
-                logger.error(f"{e}")
-                time.sleep(30)
-        failed = valfilter(lambda x: x == False, d)
-        logger.warning(f"失败数量：{len(failed)}")
-        # print(f"失败项目 {failed} ")
+
+    collection = get_db('wy')['业绩预告']
+    create_index_for(collection)
+    max_dts = get_max_dts(collection)
+    # 24小时内已经刷新的股票登记为已完成
+    stale = stale_codes(collection, codes)
+    tasks = [(code, {'code': code}) for code in codes if code in stale]
+    done = [(code, {'code': code}) for code in codes if code not in stale]
+    run_tasks(JOB,
+              tasks,
+              partial(_refresh, max_dts=max_dts),
+              MAX_WORKER,
+              logger=logger,
+              done=done)
     logger.info(f"股票数量 {len(codes)}, 用时 {time.time() - t:.2f}秒")
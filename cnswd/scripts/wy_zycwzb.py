@@ -1,24 +1,24 @@
 """网易财务分析 主要财务指标"""
-import re
 import time
 from functools import partial
 from itertools import product
-from multiprocessing import Manager, Pool
 
 import pandas as pd
 from numpy.random import shuffle
-from toolz import partition_all
-from toolz.dicttoolz import valfilter
 
 from cnswd.mongodb import get_db
 from cnswd.setting.constants import MARKET_START, MAX_WORKER
 from cnswd.utils import make_logger
+from cnswd.utils.db_utils import bulk_insert, max_by_code, stale_codes
+from cnswd.utils.ledger import run_tasks
 from cnswd.websource.wy import fetch_financial_indicator
 
 from .base import get_stock_status
 
 logger = make_logger('网易主要财务指标')
 
+JOB = 'wy_zycwzb'
+
 TYPES = {'report': '按报告期', 'year': '按年度', 'season': '按单季度'}
 NAMES = {'zycwzb': '主要财务指标', 'ylnl': '盈利能力',
          'chnl': '偿还能力', 'cznl': '成长能力', 'yynl': '营运能力'}
@@ -32,46 +32,13 @@ def create_index_for(collection):
         collection.create_index([(DATE_KEY, 1), ("股票代码", 1)], unique=True)
 
 
-def need_refresh(collection, code):
-    """是否需要刷新
+def get_max_dts(collection):
+    """各股票最后日期
 
-    简单规则：
-        如果已经存在数据，且24小时内已经刷新 ❌ 否则 ✔
+    单次聚合计算全部股票最后日期，避免逐个股票查询。
     """
-    now = pd.Timestamp('now')
-    doc = collection.find_one({'股票代码': code})
-    if doc and now - doc['更新时间'] < pd.Timedelta(days=1):
-        return False
-    return True
-
-
-def get_max_dt(collection, code):
-    """最后日期"""
-    pipe = [
-        {
-            '$match': {'股票代码': code}
-        },
-        {
-            '$sort': {
-                DATE_KEY: -1
-            }
-        },
-        {
-            '$project': {
-                '_id': 0,
-                DATE_KEY: 1
-            }
-        },
-        {
-            '$limit': 1
-        },
-    ]
-    try:
-        res = list(collection.aggregate(pipe))[0]
-        dt = pd.Timestamp(res[DATE_KEY])
-        return dt
-    except (IndexError, ):
-        return START
+    res = max_by_code(collection, DATE_KEY)
+    return {code: pd.Timestamp(dt) for code, dt in res.items()}
 
 
 def _droped_null(doc):
@@ -82,67 +49,61 @@ def _droped_null(doc):
     return res
 
 
-def _refresh(batch, d):
-    db = get_db('wy')
-    for p, p_name in TYPES.items():
-        for key, name in NAMES.items():
-            collection_name = f'{p_name}_{name}'
-            collection = db[collection_name]
-            for code in batch:
-                # 首先检查状态，减少数据库查询
-                if d.get((code, p, key), False):
-                    continue
-                if not need_refresh(collection, code):
-                    d[(code, p, key)] = True
-                    logger.info(f"股票 {code} {p_name} {name:>7} 已经刷新")
-                    continue
-                try:
-                    df = fetch_financial_indicator(code, p, key)
-                    # 按报告日期降序排列
-                    df.sort_values(DATE_KEY, ascending=False, inplace=True)
-                except (ValueError, KeyError):
-                    # 网页不存在时发生，忽略
-                    # 标注为完成状态
-                    d[(code, p, key)] = True
-                    continue
-                except Exception as e:
-                    logger.error(f"股票 {code} {p_name} {name:>7} 失败 {e}")
-                    continue
-                # 正常情形下运行以下代码
-                df['股票代码'] = code
-                df[DATE_KEY] = pd.to_datetime(df[DATE_KEY], errors='ignore')
-                create_index_for(collection)
-                last_dt = get_max_dt(collection, code)
-                df = df[df[DATE_KEY] > last_dt]
-                if not df.empty:
-                    for doc in df.to_dict('records'):
-                        doc['更新时间'] = pd.Timestamp('now')
-                        collection.insert_one(_droped_null(doc))
-                logger.info(f"完成股票 {code} {p_name} {name:>7} 刷新")
-                d[(code, p, key)] = True
+def _refresh(code, p, key, max_dts):
+    p_name, name = TYPES[p], NAMES[key]
+    collection_name = f'{p_name}_{name}'
+    collection = get_db('wy')[collection_name]
+    try:
+        df = fetch_financial_indicator(code, p, key)
+        # 按报告日期降序排列
+        df.sort_values(DATE_KEY, ascending=False, inplace=True)
+    except (ValueError, KeyError):
+        # 网页不存在时发生，忽略
+        # 视为完成
+        return
+    except Exception as e:
+        logger.error(f"股票 {code} {p_name} {name:>7} 失败 {e}")
+        raise
+    # 正常情形下运行以下代码
+    df['股票代码'] = code
+    df[DATE_KEY] = pd.to_datetime(df[DATE_KEY], errors='ignore')
+    last_dt = max_dts[collection_name].get(code, START)
+    df = df[df[DATE_KEY] > last_dt]
+    if not df.empty:
+        df = df.assign(更新时间=pd.Timestamp('now'))
+        docs = [_droped_null(doc) for doc in df.to_dict('records')]
+        bulk_insert(collection, docs)
+    logger.info(f"完成股票 {code} {p_name} {name:>7} 刷新")
 
 
 def refresh():
+    """刷新主要财务指标
+
+    需要刷新的（股票, 期间, 指标）任务登记在任务账本，多进程成批领取，中断后再次运行时继续未完成的任务。
+    """
     t = time.time()
     codes = list(get_stock_status().keys())
     shuffle(codes)
-    # 约4000只股票，每批300只
-    batches = partition_all(300, codes)
-
-    # 多进程
-    with Manager() as manager:
-        d = manager.dict()
-        for k in product(codes, TYPES.keys(), NAMES.keys()):
-            d[k] = False
-        func = partial(_refresh, d=d)
-        for _ in range(10):
-            try:
-                with Pool(MAX_WORKER) as pool:
-                    list(pool.imap_unordered(func, batches))
-            except Exception as e:
-                logger.error(f"{e}")
-                time.sleep(30)
-        failed = valfilter(lambda x: x == False, d)
-        logger.warning(f"失败数量：{len(failed)}")
-        # print(f"失败项目 {failed} ")
+
+    db = get_db('wy')
+    max_dts, stale = {}, {}
+    for p_name, name in product(TYPES.values(), NAMES.values()):
+        collection_name = f'{p_name}_{name}'
+        create_index_for(db[collection_name])
+        max_dts[collection_name] = get_max_dts(db[collection_name])
+        # 24小时内已经刷新的股票登记为已完成
+        stale[collection_name] = stale_codes(db[collection_name], codes)
+    tasks, done = [], []
+    for code, p, key in product(codes, TYPES.keys(), NAMES.keys()):
+        task = (f'{code}|{p}|{key}', {'code': code, 'p': p, 'key': key})
+        if code in stale[f'{TYPES[p]}_{NAMES[key]}']:
+            tasks.append(task)
+        else:
+            done.append(task)
+    run_tasks(JOB,
+              tasks,
+              partial(_refresh, max_dts=max_dts),
+              MAX_WORKER,
+              logger=logger,
+              done=done)
     logger.info(f"股票数量 {len(codes)}, 用时 {time.time() - t:.2f}秒")
@@ -6,7 +6,6 @@ import time
 from random import shuffle
 
 import pandas as pd
-from pymongo.errors import DuplicateKeyError
 from retry import retry
 from tqdm import tqdm
 from yahooquery import Ticker
@@ -15,7 +14,7 @@ from ..mongodb import get_db
 from ..scripts.trading_codes import read_all_stock_codes
 from ..setting.constants import MAX_WORKER
 from ..utils import batch_loop, make_logger
-from ..utils.db_utils import to_dict
+from ..utils.db_utils import bulk_insert, to_dict
 from .yahoo_utils import get_cname_maps
 
 logger = make_logger('雅虎财经')
@@ -58,12 +57,9 @@ def _handle_df(stock, pbar):
         collection = db[item]
         create_index(item, maps['symbol'],
                      maps['asOfDate'], maps['periodType'], True)
-        for doc in df.to_dict('records'):
-            to_add = {maps.get(k, k): v for k, v in doc.items()}
-            try:
-                collection.insert_one(to_add)
-            except DuplicateKeyError:
-                pass
+        docs = [{maps.get(k, k): v for k, v in doc.items()}
+                for doc in df.to_dict('records')]
+        bulk_insert(collection, docs)
 
 
 @retry(ConnectionError, tries=3, delay=1, logger=logger)
@@ -20,4 +20,74 @@ TIMEOUT = 90               # 最长等待时间，单位：秒。>20秒
 # 轮询时间缩短
 POLL_FREQUENCY = 0.2
 
+# 网络会话（按主机共享连接池）
+HTTP_POOL_SIZE = 32        # 每个主机保持的最大连接数
+HTTP_MAX_TRIES = 3         # 最多尝试次数
+HTTP_BACKOFF = 0.5         # 指数退避基数，单位：秒
+HTTP_MAX_BACKOFF = 10      # 单次退避最长时间，单位：秒
+# 默认超时（连接, 读取），单位：秒
+HTTP_TIMEOUT = (6, 3)
+# 按主机设置超时。下载整段历史数据时读取耗时较长
+HTTP_HOST_TIMEOUTS = {
+    'quotes.money.163.com': (6, 30),
+    'api.money.126.net': (6, 10),
+    'hq.sinajs.cn': (3, 5),
+    'stock.gtimg.cn': (6, 10),
+}
+# 异步下载：每个主机并发连接数及每秒请求数（令牌桶）
+ASYNC_CONCURRENCY = 8
+ASYNC_RATE = 10
+ASYNC_HOST_LIMITS = {
+    'quotes.money.163.com': (16, 20),
+}
+# 异步下载时解析数据的进程数
+ASYNC_PARSE_WORKERS = 2
+# 日线数据边下载边保存，每批保存的代码数量
+HISTORY_CHUNK_SIZE = 200
+
+# 无头浏览器池（进程内复用，避免重复启动浏览器）
+BROWSER_POOL_SIZE = 2      # 最多同时保持的浏览器数量
+BROWSER_MAX_USES = 50      # 租用次数达到后重建浏览器
+BROWSER_MAX_MEMORY = 1024  # 浏览器进程占用内存超过该值后重建，单位：MB
+
+# 后台调度（stock daemon）
+DAEMON_MAX_WORKERS = 8     # 同时运行的任务数量
+# 按数据来源限制同时运行的任务数量，未列出的来源为1
+DAEMON_SOURCE_LIMITS = {
+    'sina': 2,
+    'wy': 2,
+}
+# 实时报价（quote、iquote）在交易时段每分钟内重复运行的间隔秒数（cron最小单位为分钟）
+DAEMON_QUOTE_INTERVAL = 10
+
+# 日线数据同时写入本地列式存储（cnswd.store）
+BAR_STORE_ENABLED = True
+# 网易财务报表同时写入本地列式存储（长表，科目以编号存储）
+STATEMENT_STORE_ENABLED = True
+# 分红配股刷新后更新本地复权因子（cnswd.store.adjust）
+ADJUST_STORE_ENABLED = True
+# 实时报价、分时交易改为写入本地快照存储（只保存变化行）
+SNAPSHOT_STORAGE = False
+
+# 日志批量写入mongodb（eventlog）
+LOG_BATCH_SIZE = 100       # 缓存记录达到该数量时写入
+LOG_FLUSH_INTERVAL = 2     # 最长写入间隔，单位：秒
+# 重复消息（仅数字不同）每LOG_RATE_PERIOD秒最多写入LOG_RATE_LIMIT条
+LOG_RATE_LIMIT = 10
+LOG_RATE_PERIOD = 60
+
+# mongodb客户端设置（每个进程共享一个客户端）
+DB_PORT = 27017
+MONGO_CLIENT_OPTIONS = {
+    'maxPoolSize': 50,                  # 连接池最大连接数
+    'minPoolSize': 0,
+    'maxIdleTimeMS': 300000,            # 空闲连接最长保留时间
+    'connectTimeoutMS': 5000,
+    'serverSelectionTimeoutMS': 15000,
+    'socketTimeoutMS': 600000,
+    # 按顺序协商压缩算法，未安装的算法自动忽略
+    'compressors': 'zstd,snappy,zlib',
+    'w': 1,                             # 写关注
+}
+
 default_start_date = MARKET_START.strftime(r'%Y-%m-%d')
@@ -0,0 +1,12 @@
+"""
+本地列式存储（Parquet/Arrow）
+
+适用于大范围读取（如全市场回测）的数据，以hive分区目录存储，
+读取时裁剪分区、下推过滤条件并以内存映射方式读取文件。
+"""
+from .adjust import adjust, read_factors, update_factors
+from .asof import AsofEngine
+from .bars import compact_bars, read_bars, write_bars
+from .snapshots import list_batches, read_snapshot, write_snapshot
+from .statements import compact_statements, get_statement, write_statement
+from .ticks import TickWriter, compact_ticks, completed_codes, read_ticks
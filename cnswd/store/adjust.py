@@ -0,0 +1,274 @@
+"""
+复权因子
+
+以网易分红配股（`wy`数据库`分红配股`集合）的送股、转增、派息及除权除息日计算
+各除权除息日的复权因子：
+    因子 = (前收盘 - 每股派息) / ((1 + 每股送转) × 前收盘)
+前收盘为除权除息日前一交易日收盘价。缺少收盘价时只计送转（因子 = 1 / (1 + 每股送转)）。
+
+各股票按除权除息日顺序保存因子及累计因子（截至该日全部因子之积）：
+    <数据目录>/store/adjust/factors.parquet
+
+复权以(代码, 日期)编码为整数后`searchsorted`一次完成，不逐个股票循环：
+    后复权价 = 价格 / 累计因子(截至当日)
+    前复权价 = 价格 × 累计因子(最后) / 累计因子(截至当日)
+
+新增分红只计算晚于已保存最后除权除息日的记录，累计因子接续已保存的最后值，
+不重新计算历史因子。
+
+用法：
+    >>> update_factors(load_dividends())
+    >>> adjust(read_bars(['000001'], '2020-01-01'), 'forward')
+"""
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from ..utils.cache import FileLock
+from .asof import _asof_positions, _days, asof_index
+from .base import store_path
+from .bars import read_bars
+
+CODE_COL = '股票代码'
+BAR_DATE_COL = '日期'
+EX_DATE_COL = '除权除息日'
+FACTOR_COL = '因子'
+CUM_COL = '累计因子'
+# 每10股
+SHARE_COLS = ('送股(每10股)', '转增(每10股)')
+CASH_COL = '派息(每10股)'
+PRICE_COLS = ('开盘价', '最高价', '最低价', '收盘价', '前收盘')
+DIVIDEND_DB = 'wy'
+DIVIDEND_COLLECTION = '分红配股'
+FACTORS_FILE = 'factors.parquet'
+KINDS = ('forward', 'backward')
+
+# 复权因子缓存：文件路径 -> (文件修改时间, DataFrame)
+_factors_cache = {}
+
+
+def _factors_path(root=None):
+    return store_path('adjust', root) / FACTORS_FILE
+
+
+def _empty():
+    return pd.DataFrame({
+        CODE_COL: pd.Series([], dtype=object),
+        EX_DATE_COL: pd.Series([], dtype='datetime64[ns]'),
+        FACTOR_COL: pd.Series([], dtype=float),
+        CUM_COL: pd.Series([], dtype=float),
+    })
+
+
+def read_factors(codes=None, root=None):
+    """复权因子（文件修改后重新读取）
+
+    Args:
+        codes (list, optional): 股票代码列表. Defaults to None（全部）.
+        root (Path, optional): 存储根目录. Defaults to None.
+
+    Returns:
+        DataFrame: 股票代码、除权除息日、因子、累计因子，按代码、日期排序
+    """
+    path = _factors_path(root)
+    if not path.exists():
+        df = _empty()
+    else:
+        mtime = path.stat().st_mtime_ns
+        cached = _factors_cache.get(str(path))
+        if cached is None or cached[0] != mtime:
+            df = pq.read_table(str(path)).to_pandas()
+            df[CODE_COL] = df[CODE_COL].astype(object)
+            df[EX_DATE_COL] = df[EX_DATE_COL].astype('datetime64[ns]')
+            cached = (mtime, df)
+            _factors_cache[str(path)] = cached
+        df = cached[1]
+    if codes is not None:
+        if isinstance(codes, str):
+            codes = [codes]
+        df = df[df[CODE_COL].isin(list(codes))].reset_index(drop=True)
+    return df
+
+
+def _write_factors(df, root=None):
+    path = _factors_path(root)
+    table = pa.Table.from_arrays([
+        pa.array(df[CODE_COL].to_numpy(dtype=object), type=pa.string()),
+        pa.array(df[EX_DATE_COL].to_numpy().astype('datetime64[ms]')),
+        pa.array(df[FACTOR_COL].to_numpy(dtype=float)),
+        pa.array(df[CUM_COL].to_numpy(dtype=float)),
+    ], names=[CODE_COL, EX_DATE_COL, FACTOR_COL, CUM_COL])
+    tmp = path.with_suffix('.tmp')
+    pq.write_table(table, str(tmp), compression='zstd')
+    tmp.replace(path)
+
+
+def load_dividends(codes=None):
+    """分红配股记录（`wy_fhpg`刷新）
+
+    Returns:
+        DataFrame: 股票代码、除权除息日、送股、转增、派息（每10股）
+    """
+    from ..mongodb import get_db
+    collection = get_db(DIVIDEND_DB)[DIVIDEND_COLLECTION]
+    columns = [CODE_COL, EX_DATE_COL, *SHARE_COLS, CASH_COL]
+    flt = {EX_DATE_COL: {'$ne': None}}
+    if codes is not None:
+        flt[CODE_COL] = {'$in': list(codes)}
+    projection = {'_id': 0, **{c: 1 for c in columns}}
+    return pd.DataFrame.from_records(list(collection.find(flt, projection)),
+                                     columns=columns)
+
+
+def _events(dividends, today=None):
+    """同一股票同日除权除息的记录合并，不含未到除权除息日的记录
+
+    Returns:
+        DataFrame: 股票代码、除权除息日、每股送转、每股派息
+    """
+    today = pd.Timestamp('today') if today is None else pd.Timestamp(today)
+    df = pd.DataFrame({
+        CODE_COL: dividends[CODE_COL].to_numpy(dtype=object),
+        EX_DATE_COL: pd.to_datetime(dividends[EX_DATE_COL],
+                                    errors='coerce').to_numpy(),
+    })
+    df['shares'] = sum(
+        pd.to_numeric(dividends[c], errors='coerce').fillna(0).to_numpy()
+        for c in SHARE_COLS if c in dividends) / 10
+    df['cash'] = pd.to_numeric(
+        dividends[CASH_COL], errors='coerce').fillna(0).to_numpy() / 10
+    df = df[df[EX_DATE_COL].notna()
+            & (df[EX_DATE_COL] <= today.normalize())
+            & ((df['shares'] > 0) | (df['cash'] > 0))]
+    # 同一事件可能重复登记（如更正公告），只计一次
+    df = df.drop_duplicates()
+    return df.groupby([CODE_COL, EX_DATE_COL], as_index=False,
+                      sort=True)[['shares', 'cash']].sum()
+
+
+def _prev_close(events, prices):
+    """除权除息日前一交易日收盘价，不存在时为nan"""
+    if events.empty:
+        return np.array([], dtype=float)
+    codes = list(events[CODE_COL].unique())
+    start = events[EX_DATE_COL].min() - pd.Timedelta(days=30)
+    end = events[EX_DATE_COL].max()
+    bars = prices(codes, start, end, ['收盘价'])
+    idx = asof_index(events[CODE_COL], events[EX_DATE_COL],
+                     bars[CODE_COL], bars[BAR_DATE_COL])
+    close = bars['收盘价'].to_numpy(dtype=float)
+    return np.where(idx >= 0, close[np.maximum(idx, 0)] if len(close) else
+                    np.nan, np.nan)
+
+
+def event_factors(events, prev_close):
+    """除权除息日复权因子
+
+    Args:
+        events (DataFrame): 每股送转`shares`及每股派息`cash`
+        prev_close (array-like): 前收盘
+
+    Returns:
+        ndarray: 复权因子
+    """
+    shares = events['shares'].to_numpy(dtype=float)
+    cash = events['cash'].to_numpy(dtype=float)
+    prev_close = np.asarray(prev_close, dtype=float)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        factor = (prev_close - cash) / ((1 + shares) * prev_close)
+    # 缺少收盘价或派息不低于收盘价（数据有误）时只计送转
+    bad = ~(factor > 0) | ~np.isfinite(factor)
+    factor[bad] = 1 / (1 + shares[bad])
+    return factor
+
+
+def update_factors(dividends, prices=read_bars, rebuild=False, root=None,
+                   today=None):
+    """以分红配股记录更新复权因子
+
+    只计算晚于各股票已保存最后除权除息日的记录，累计因子接续已保存的最后值。
+
+    Args:
+        dividends (DataFrame): 分红配股记录，见`load_dividends`
+        prices (callable, optional): 以(代码, 开始, 结束, 字段)调用，返回日线数据.
+            Defaults to read_bars.
+        rebuild (bool, optional): 是否重新计算全部因子（分红记录更正时使用）.
+            Defaults to False.
+        root (Path, optional): 存储根目录. Defaults to None.
+        today (date like, optional): 当前日期. Defaults to None.
+
+    Returns:
+        int: 新增除权除息日数量
+    """
+    events = _events(dividends, today)
+    path = _factors_path(root)
+    lock = FileLock(path.with_suffix('.lock'))
+    while not lock.acquire():
+        lock.wait()
+    try:
+        stored = _empty() if rebuild else read_factors(root=root)
+        last = stored.groupby(CODE_COL).last()
+        last_dt = last[EX_DATE_COL].reindex(events[CODE_COL]).to_numpy()
+        events = events[~(events[EX_DATE_COL].to_numpy() <= last_dt)]
+        events = events.reset_index(drop=True)
+        if events.empty:
+            return 0
+        factor = event_factors(events, _prev_close(events, prices))
+        # 按股票累乘，再乘以已保存的最后累计因子
+        cum = pd.Series(factor).groupby(
+            events[CODE_COL].to_numpy()).cumprod().to_numpy()
+        base = last[CUM_COL].reindex(events[CODE_COL]).fillna(1.0).to_numpy()
+        added = pd.DataFrame({
+            CODE_COL: events[CODE_COL],
+            EX_DATE_COL: events[EX_DATE_COL],
+            FACTOR_COL: factor,
+            CUM_COL: base * cum,
+        })
+        df = pd.concat([stored, added], ignore_index=True)
+        df = df.sort_values([CODE_COL, EX_DATE_COL],
+                            kind='stable').reset_index(drop=True)
+        _write_factors(df, root)
+    finally:
+        lock.release()
+    return len(added)
+
+
+def adjust(bars, kind='forward', columns=PRICE_COLS, factors=None, root=None):
+    """复权
+
+    Args:
+        bars (DataFrame): 日线数据，须包含`日期`、`股票代码`列
+        kind (str, optional): 'forward'（前复权）或'backward'（后复权）.
+            Defaults to 'forward'.
+        columns (tuple, optional): 价格列，不存在的列忽略. Defaults to PRICE_COLS.
+        factors (DataFrame, optional): 复权因子. Defaults to None（读取已保存因子）.
+        root (Path, optional): 存储根目录. Defaults to None.
+
+    Returns:
+        DataFrame: 复权后的日线数据，行与`bars`一致
+    """
+    assert kind in KINDS, f'复权类型只能为{KINDS}'
+    if factors is None:
+        factors = read_factors(root=root)
+    res = bars.copy()
+    columns = [c for c in columns if c in res.columns]
+    if res.empty or not columns:
+        return res
+    n = len(factors)
+    codes, _ = pd.factorize(
+        np.concatenate([factors[CODE_COL].to_numpy(dtype=object),
+                        res[CODE_COL].to_numpy(dtype=object)]))
+    # 日线数据所在日期已除权除息，包含当日因子
+    idx = _asof_positions(codes[n:], _days(res[BAR_DATE_COL]), codes[:n],
+                          _days(factors[EX_DATE_COL]), allow_exact=True)
+    cum = factors[CUM_COL].to_numpy(dtype=float)
+    current = np.where(idx >= 0, cum[np.maximum(idx, 0)] if n else 1.0, 1.0)
+    if kind == 'backward':
+        ratio = 1 / current
+    else:
+        total = factors.groupby(CODE_COL)[CUM_COL].last()
+        ratio = res[CODE_COL].map(total).fillna(1.0).to_numpy() / current
+    for col in columns:
+        res[col] = pd.to_numeric(res[col], errors='coerce').to_numpy() * ratio
+    return res
@@ -0,0 +1,265 @@
+"""
+财务数据与日线数据时点对齐（as-of join）
+
+财务数据在披露日之后（不含当日）才可使用。披露日期取自巨潮预约披露（`wy`数据库
+`预约披露`集合的实际披露日期），缺失时使用法定披露期限：
+    一季报 4月30日、半年报 8月31日、三季报 10月31日、年报 次年4月30日
+
+对齐以(代码, 日期)编码为整数后`searchsorted`一次完成，不逐个股票循环。
+每个科目单独对齐，取各交易日已披露的最新非空值；晚于新报告披露的旧报告（如更正）
+不覆盖新报告的数值。
+
+对齐结果按(报表, 科目, 股票, 期间)缓存在进程内，重复回测直接复用。
+
+用法：
+    >>> engine = AsofEngine()
+    >>> engine.get_panel(['000001'], '2019-01-01', '2019-12-31', ['货币资金(万元)'])
+"""
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from .bars import read_bars
+from .statements import get_statement, report_key
+
+CODE_COL = '股票代码'
+BAR_DATE_COL = '日期'
+REPORT_DATE_COL = '报告日期'
+DISCLOSURE_COL = '披露日期'
+DISCLOSURE_DB = 'wy'
+DISCLOSURE_COLLECTION = '预约披露'
+# 进程内缓存的对齐结果数量
+MAXSIZE = 256
+
+
+def statutory_deadline(report_dates):
+    """法定披露期限
+
+    Args:
+        report_dates (array-like): 报告日期（季末）
+
+    Returns:
+        DatetimeIndex: 披露期限
+    """
+    dates = pd.DatetimeIndex(pd.to_datetime(report_dates))
+    q = dates.quarter
+    year = dates.year + (q == 4)
+    month = np.select([q == 1, q == 2, q == 3], [4, 8, 10], 4)
+    day = np.where(month == 4, 30, 31)
+    return pd.DatetimeIndex(
+        pd.to_datetime(pd.DataFrame({
+            'year': year,
+            'month': month,
+            'day': day
+        })))
+
+
+def load_disclosures(codes=None):
+    """实际披露日期（`cninfo_yypl`刷新）
+
+    Returns:
+        DataFrame: 股票代码、报告日期、披露日期
+    """
+    from ..mongodb import get_db
+    collection = get_db(DISCLOSURE_DB)[DISCLOSURE_COLLECTION]
+    flt = {} if codes is None else {CODE_COL: {'$in': list(codes)}}
+    projection = {'_id': 0, CODE_COL: 1, '报告年度': 1, '实际披露': 1}
+    df = pd.DataFrame.from_records(list(collection.find(flt, projection)),
+                                   columns=[CODE_COL, '报告年度', '实际披露'])
+    return df.rename(columns={
+        '报告年度': REPORT_DATE_COL,
+        '实际披露': DISCLOSURE_COL
+    })
+
+
+def _to_ns(s):
+    return pd.to_datetime(s).astype('datetime64[ns]')
+
+
+def available_dates(periods, disclosures):
+    """各报告的披露日期，缺失时为法定披露期限
+
+    Args:
+        periods (DataFrame): 股票代码、报告日期
+        disclosures (DataFrame): 股票代码、报告日期、披露日期
+
+    Returns:
+        ndarray: datetime64[ns]数组，与`periods`各行对应
+    """
+    left = pd.DataFrame({
+        CODE_COL: periods[CODE_COL].to_numpy(),
+        REPORT_DATE_COL: _to_ns(periods[REPORT_DATE_COL]).to_numpy()
+    })
+    right = disclosures[[CODE_COL, REPORT_DATE_COL, DISCLOSURE_COL]].copy()
+    right[REPORT_DATE_COL] = _to_ns(right[REPORT_DATE_COL])
+    right[DISCLOSURE_COL] = _to_ns(right[DISCLOSURE_COL])
+    right = right.drop_duplicates([CODE_COL, REPORT_DATE_COL], keep='last')
+    df = left.merge(right, how='left', on=[CODE_COL, REPORT_DATE_COL])
+    fallback = pd.Series(statutory_deadline(df[REPORT_DATE_COL]),
+                         index=df.index)
+    return df[DISCLOSURE_COL].fillna(fallback).to_numpy()
+
+
+def _days(dates):
+    return np.asarray(dates, dtype='datetime64[D]').astype(np.int64)
+
+
+def _asof_positions(lc, ld, rc, rd, allow_exact=False):
+    """以整数代码及日期对齐，见`asof_index`"""
+    if len(rc) == 0 or len(lc) == 0:
+        return np.full(len(lc), -1, dtype=np.int64)
+    low = min(rd.min(), ld.min())
+    span = max(rd.max(), ld.max()) - low + 1
+    order = np.lexsort((rd, rc))
+    rc = rc[order]
+    rkeys = rc * span + (rd[order] - low)
+    lkeys = lc * span + (ld - low)
+    pos = np.searchsorted(rkeys, lkeys,
+                          side='right' if allow_exact else 'left') - 1
+    valid = pos >= 0
+    valid[valid] = rc[pos[valid]] == lc[valid]
+    return np.where(valid, order[np.maximum(pos, 0)], -1)
+
+
+def asof_index(left_codes, left_dates, right_codes, right_dates,
+               allow_exact=False):
+    """时点对齐位置
+
+    Args:
+        left_codes, left_dates (array-like): 待对齐的代码及日期（如交易日）
+        right_codes, right_dates (array-like): 事件的代码及可用日期，无须排序
+        allow_exact (bool, optional): 是否包含日期相同的事件. Defaults to False.
+
+    Returns:
+        ndarray: 左侧各行对应的右侧行位置（同代码、日期之前的最后一个事件），不存在时为-1
+    """
+    n = len(right_codes)
+    codes, _ = pd.factorize(
+        np.concatenate([np.asarray(right_codes, dtype=object),
+                        np.asarray(left_codes, dtype=object)]))
+    return _asof_positions(codes[n:], _days(left_dates), codes[:n],
+                           _days(right_dates), allow_exact)
+
+
+class _Grid(object):
+    """日线数据的(股票代码, 日期)及其整数编码"""
+
+    def __init__(self, df):
+        self.df = df[[BAR_DATE_COL, CODE_COL]].reset_index(drop=True)
+        self.code_ids, uniques = pd.factorize(self.df[CODE_COL])
+        self.codes = pd.Index(uniques)
+        self.days = _days(self.df[BAR_DATE_COL])
+
+
+class AsofEngine(object):
+    """财务数据时点对齐
+
+    Args:
+        bars (callable, optional): 以(代码, 开始, 结束, 字段)调用，返回日线数据.
+            Defaults to read_bars.
+        statements (callable, optional): 以(代码, 科目, report=报表)调用，返回财务报表宽表.
+            Defaults to get_statement.
+        disclosures (callable, optional): 以(代码)调用，返回实际披露日期.
+            Defaults to load_disclosures.
+        maxsize (int, optional): 缓存的对齐结果数量. Defaults to 256.
+    """
+
+    def __init__(self,
+                 bars=read_bars,
+                 statements=get_statement,
+                 disclosures=load_disclosures,
+                 maxsize=MAXSIZE):
+        self._bars = bars
+        self._statements = statements
+        self._disclosures = disclosures
+        self.maxsize = maxsize
+        self._grids = OrderedDict()
+        self._fields = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def _put(self, cache, key, value):
+        cache[key] = value
+        cache.move_to_end(key)
+        while len(cache) > self.maxsize:
+            cache.popitem(last=False)
+
+    def grid(self, codes, start, end):
+        """日线数据的(股票代码, 日期)，按代码、日期排序"""
+        key = (tuple(sorted(codes)), pd.Timestamp(start), pd.Timestamp(end))
+        grid = self._grids.get(key)
+        if grid is None:
+            grid = _Grid(self._bars(list(key[0]), key[1], key[2], []))
+            self._put(self._grids, key, grid)
+        else:
+            self._grids.move_to_end(key)
+        return key, grid
+
+    def _align(self, grid, df, avail, item):
+        """单个科目对齐，返回与`grid`各行对应的数值"""
+        mask = df[item].notna().to_numpy()
+        events = pd.DataFrame({
+            'code': grid.codes.get_indexer(df[CODE_COL])[mask],
+            'period': _to_ns(df[REPORT_DATE_COL]).to_numpy()[mask],
+            'avail': avail[mask],
+            'value': df[item].to_numpy(dtype=float)[mask],
+        })
+        # 不在日线数据中的股票
+        events = events[events['code'] >= 0]
+        # 披露晚于新报告的旧报告不予采用
+        events = events.sort_values(['code', 'avail', 'period'],
+                                    kind='stable')
+        latest = events.groupby('code')['period'].cummax()
+        events = events[events['period'] >= latest]
+        idx = _asof_positions(grid.code_ids, grid.days,
+                              events['code'].to_numpy(),
+                              _days(events['avail']))
+        values = events['value'].to_numpy()
+        res = np.full(len(idx), np.nan)
+        res[idx >= 0] = values[idx[idx >= 0]]
+        return res
+
+    def get_panel(self, codes, start, end, items, report='zcfzb'):
+        """与日线数据对齐的财务数据
+
+        Args:
+            codes (list): 股票代码列表
+            start (date like): 开始日期
+            end (date like): 结束日期
+            items (list): 科目名称列表
+            report (str, optional): 报表. Defaults to 'zcfzb'.
+
+        Returns:
+            DataFrame: 日期、股票代码及各科目，行与`read_bars`结果一致
+        """
+        if isinstance(codes, str):
+            codes = [codes]
+        if isinstance(items, str):
+            items = [items]
+        report = report_key(report)
+        key, grid = self.grid(codes, start, end)
+        missing = [
+            item for item in items if (report, item, key) not in self._fields
+        ]
+        self.hits += len(items) - len(missing)
+        self.misses += len(missing)
+        aligned = {}
+        if missing:
+            df = self._statements(list(key[0]), missing, report=report)
+            avail = available_dates(df, self._disclosures(list(key[0])))
+            for item in missing:
+                aligned[item] = self._align(grid, df, avail, item)
+                self._put(self._fields, (report, item, key), aligned[item])
+        panel = grid.df.copy()
+        for item in items:
+            if item not in aligned:
+                self._fields.move_to_end((report, item, key))
+                aligned[item] = self._fields[(report, item, key)]
+            panel[item] = aligned[item]
+        return panel
+
+    def clear(self):
+        """清除缓存"""
+        self._grids.clear()
+        self._fields.clear()
@@ -0,0 +1,158 @@
+"""
+日线数据列式存储
+
+目录结构：
+    <数据目录>/store/bars/<类别>/year=2020/bucket=7/part-*.parquet
+
+按年度及代码分桶分区。读取时依据日期及代码裁剪分区，只读取所需字段。
+
+用法：
+    >>> write_bars(df, 'stock')
+    >>> read_bars(['000001', '600000'], '2020-01-01', '2020-12-31', ['收盘价'])
+"""
+import zlib
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+
+from .base import (compact_partition, hive_partitioning, open_dataset,
+                   store_path, write_part)
+
+BUCKETS = 16
+DATE_COL = '日期'
+CODE_COL = '股票代码'
+STR_COLS = (CODE_COL, '名称')
+# 类别：股票、指数
+KINDS = ('stock', 'index')
+PARTITIONING = hive_partitioning(
+    pa.schema([('year', pa.int16()), ('bucket', pa.int8())]))
+
+
+def code_bucket(code):
+    """代码分桶"""
+    return zlib.crc32(code.encode()) % BUCKETS
+
+
+def _bar_path(kind, root=None):
+    assert kind in KINDS, f'类别只能为{KINDS}'
+    return store_path(f'bars/{kind}', root)
+
+
+def _to_table(df):
+    """统一字段类型，添加分区列"""
+    arrays, names = [], []
+    for col in df.columns:
+        s = df[col]
+        if col == DATE_COL:
+            arr = pa.array(pd.to_datetime(s).values.astype('datetime64[ms]'))
+        elif col in STR_COLS:
+            arr = pa.array(s.astype(object).where(s.notna(), None),
+                           type=pa.string())
+        else:
+            # 数值统一为浮点，避免各文件类型不一致
+            arr = pa.array(pd.to_numeric(s, errors='coerce').astype(float))
+        arrays.append(arr)
+        names.append(col)
+    dates = pd.to_datetime(df[DATE_COL])
+    arrays.append(pa.array(dates.dt.year.values, type=pa.int16()))
+    names.append('year')
+    buckets = [code_bucket(c) for c in df[CODE_COL].values]
+    arrays.append(pa.array(buckets, type=pa.int8()))
+    names.append('bucket')
+    return pa.Table.from_arrays(arrays, names=names)
+
+
+def write_bars(df, kind='stock', root=None):
+    """追加写入日线数据
+
+    Args:
+        df (DataFrame): 日线数据，须包含`日期`、`股票代码`列
+        kind (str, optional): 类别. Defaults to 'stock'.
+        root (Path, optional): 存储根目录. Defaults to None.
+
+    Returns:
+        int: 写入行数
+    """
+    if df.empty:
+        return 0
+    write_part(_to_table(df), _bar_path(kind, root), PARTITIONING)
+    return len(df)
+
+
+def _filter(codes, start, end):
+    exprs = []
+    if codes is not None:
+        buckets = sorted({code_bucket(c) for c in codes})
+        exprs.append(ds.field('bucket').isin(buckets))
+        exprs.append(ds.field(CODE_COL).isin(list(codes)))
+    if start is not None:
+        start = pd.Timestamp(start)
+        exprs.append(ds.field('year') >= start.year)
+        exprs.append(ds.field(DATE_COL) >= pa.scalar(start, pa.timestamp('ms')))
+    if end is not None:
+        end = pd.Timestamp(end)
+        exprs.append(ds.field('year') <= end.year)
+        exprs.append(ds.field(DATE_COL) <= pa.scalar(end, pa.timestamp('ms')))
+    if not exprs:
+        return None
+    expr = exprs[0]
+    for e in exprs[1:]:
+        expr = expr & e
+    return expr
+
+
+def read_bars(codes=None, start=None, end=None, fields=None, kind='stock',
+              root=None):
+    """读取日线数据
+
+    Args:
+        codes (list, optional): 代码列表. Defaults to None（全部）.
+        start (date like, optional): 开始日期. Defaults to None.
+        end (date like, optional): 结束日期. Defaults to None.
+        fields (list, optional): 字段列表. Defaults to None（全部）.
+        kind (str, optional): 类别. Defaults to 'stock'.
+        root (Path, optional): 存储根目录. Defaults to None.
+
+    Returns:
+        DataFrame: 按代码、日期排序的日线数据
+    """
+    if isinstance(codes, str):
+        codes = [codes]
+    dataset = open_dataset(_bar_path(kind, root), PARTITIONING)
+    if dataset is None:
+        return pd.DataFrame(columns=[DATE_COL, CODE_COL] + list(fields or []))
+    if fields is None:
+        columns = [n for n in dataset.schema.names
+                   if n not in ('year', 'bucket')]
+    else:
+        columns = [DATE_COL, CODE_COL
+                   ] + [f for f in fields if f not in (DATE_COL, CODE_COL)]
+    table = dataset.to_table(columns=columns, filter=_filter(codes, start, end))
+    # 未合并的文件可能存在重复，保留最后写入的记录
+    df = table.to_pandas()
+    df = df.drop_duplicates([CODE_COL, DATE_COL], keep='last')
+    df = df.sort_values([CODE_COL, DATE_COL], kind='stable')
+    return df.reset_index(drop=True)
+
+
+def compact_bars(kind='stock', year=None, root=None):
+    """合并分区文件
+
+    Args:
+        kind (str, optional): 类别. Defaults to 'stock'.
+        year (int, optional): 年度. Defaults to None（全部年度）.
+        root (Path, optional): 存储根目录. Defaults to None.
+
+    Returns:
+        int: 合并的分区数量
+    """
+    path = _bar_path(kind, root)
+    pattern = f'year={year}/bucket=*' if year else 'year=*/bucket=*'
+    n = 0
+    for part_dir in path.glob(pattern):
+        if len(list(part_dir.glob('part-*.parquet'))) > 1:
+            compact_partition(part_dir, [CODE_COL, DATE_COL],
+                              [CODE_COL, DATE_COL])
+            n += 1
+    return n
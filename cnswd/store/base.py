@@ -0,0 +1,112 @@
+"""
+列式存储基础函数
+
+数据以hive分区目录存储：
+    <根目录>/<名称>/<分区1>=<值>/<分区2>=<值>/part-<时间戳>-<序号>.parquet
+
+追加写入时每次生成新的文件，由`compact_partition`定期合并。
+"""
+import os
+import time
+from pathlib import Path
+
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from pyarrow.fs import LocalFileSystem
+
+from ..utils.path_utils import data_root
+
+STORE_DIR_NAME = 'store'
+COMPRESSION = 'zstd'
+# 以内存映射方式读取本地文件
+_FS = LocalFileSystem(use_mmap=True)
+
+
+def store_path(name, root=None):
+    """存储目录
+
+    Args:
+        name (str): 存储名称，可使用"a/b"表达二级目录
+        root (Path, optional): 根目录. Defaults to None（数据目录）.
+
+    Returns:
+        Path: 存储目录
+    """
+    if root is None:
+        return data_root(f'{STORE_DIR_NAME}/{name}')
+    path = Path(root) / name
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def hive_partitioning(schema):
+    """hive分区方案"""
+    return ds.partitioning(schema, flavor='hive')
+
+
+def write_part(table, path, partitioning):
+    """追加写入数据
+
+    Args:
+        table (Table): 数据表，须包含分区列
+        path (Path): 存储目录
+        partitioning (Partitioning): 分区方案
+    """
+    fmt = ds.ParquetFileFormat()
+    ds.write_dataset(
+        table,
+        str(path),
+        format=fmt,
+        partitioning=partitioning,
+        basename_template=f'part-{time.time_ns()}-{{i}}.parquet',
+        existing_data_behavior='overwrite_or_ignore',
+        file_options=fmt.make_write_options(compression=COMPRESSION),
+        filesystem=_FS,
+    )
+
+
+def open_dataset(path, partitioning):
+    """打开数据集，不存在数据文件时返回None"""
+    path = Path(path)
+    if not any(path.rglob('*.parquet')):
+        return None
+    return ds.dataset(str(path),
+                      format='parquet',
+                      partitioning=partitioning,
+                      filesystem=_FS)
+
+
+def compact_partition(part_dir, sort_keys, unique_keys=None):
+    """合并分区目录下的数据文件
+
+    按写入先后合并，重复数据保留最后写入的记录。
+
+    Args:
+        part_dir (Path): 分区目录（最底层）
+        sort_keys (list): 排序列
+        unique_keys (list, optional): 唯一键. Defaults to None.
+
+    Returns:
+        int: 合并后行数
+    """
+    # 文件名含写入时间戳，按名称排序即为写入顺序
+    files = sorted(Path(part_dir).glob('part-*.parquet'))
+    if not files:
+        return 0
+    # 分区目录下文件不含分区列
+    table = pa.concat_tables(
+        [pq.read_table(str(f), filesystem=_FS) for f in files],
+        promote_options='default')
+    df = table.to_pandas()
+    if unique_keys:
+        df = df.drop_duplicates(unique_keys, keep='last')
+    df = df.sort_values(sort_keys, kind='stable')
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    out = Path(part_dir) / f'part-{time.time_ns()}-0.parquet'
+    tmp = out.with_suffix('.tmp')
+    pq.write_table(table, str(tmp), compression=COMPRESSION)
+    os.replace(tmp, out)
+    for f in files:
+        f.unlink()
+    return table.num_rows
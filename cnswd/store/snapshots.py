@@ -0,0 +1,181 @@
+"""
+盘中快照存储
+
+每批次报价以一个Arrow IPC文件（zstd压缩）存储，按日分目录：
+    <数据目录>/store/snapshots/<名称>/2020-07-24/<批次纳秒>-k.arrow
+    <数据目录>/store/snapshots/<名称>/2020-07-24/<批次纳秒>-d.arrow
+
+    k：关键帧，全部行
+    d：增量帧，只包含与上一批次相比发生变化的行
+
+当日首个批次、每隔`KEYFRAME_EVERY`个批次及上一批次的行在本批次中消失时写入关键帧
+（增量帧无法表达删除）。读取时从时点前最近的关键帧开始，
+依次应用增量帧，重建该时点的完整截面。
+
+用法：
+    >>> write_snapshot('quotes', df, pd.Timestamp.now())
+    >>> read_snapshot('quotes', '2020-07-24 10:30')
+"""
+import os
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+
+from ..utils.cache import FileLock
+from .base import store_path
+
+KEY_COL = '股票代码'
+BATCH_COL = '批次'
+KEYFRAME_EVERY = 100
+COMPRESSION = 'zstd'
+STATE_NAME = '_state.arrow'
+
+
+def _day_dir(name, batch, root=None):
+    day = pd.Timestamp(batch).strftime(r'%Y-%m-%d')
+    return store_path(f'snapshots/{name}/{day}', root)
+
+
+def _write_ipc(table, path):
+    tmp = Path(path).with_suffix('.tmp')
+    options = pa.ipc.IpcWriteOptions(compression=COMPRESSION)
+    with pa.OSFile(str(tmp), 'wb') as sink:
+        with pa.ipc.new_file(sink, table.schema, options=options) as writer:
+            writer.write_table(table)
+    os.replace(tmp, path)
+
+
+def _read_ipc(path):
+    with pa.memory_map(str(path), 'r') as source:
+        return pa.ipc.open_file(source).read_all().to_pandas()
+
+
+def _frames(day_dir):
+    """当日批次文件，按批次排序
+
+    Returns:
+        list: [(批次纳秒, 是否关键帧, 路径)]
+    """
+    res = []
+    for path in Path(day_dir).glob('*.arrow'):
+        stem = path.stem
+        if stem.startswith('_'):
+            continue
+        ns, kind = stem.split('-')
+        res.append((int(ns), kind == 'k', path))
+    return sorted(res)
+
+
+def changed_rows(df, prev, key_col=KEY_COL, ignore_cols=()):
+    """与上一截面相比发生变化（含新增）的行
+
+    Args:
+        df (DataFrame): 本批次截面
+        prev (DataFrame): 上一截面
+        key_col (str, optional): 键列. Defaults to '股票代码'.
+        ignore_cols (tuple, optional): 不参与比较的列（如每批次相同的时间戳）.
+            Defaults to ().
+
+    Returns:
+        DataFrame: 发生变化的行
+    """
+    if prev is None or prev.empty:
+        return df
+    ignored = {BATCH_COL, *ignore_cols}
+    cols = [c for c in df.columns if c not in ignored]
+    new = df[cols].set_index(key_col)
+    old = prev.set_index(key_col).reindex(new.index)
+    old = old.reindex(columns=new.columns)
+    same = (new == old) | (new.isna() & old.isna())
+    return df[~same.all(axis=1).to_numpy()]
+
+
+def write_snapshot(name, df, batch, key_col=KEY_COL, ignore_cols=(),
+                   root=None):
+    """写入一个批次
+
+    Args:
+        name (str): 名称，如'quotes'
+        df (DataFrame): 截面数据，以`key_col`唯一标识行
+        batch (Timestamp): 批次时间
+        key_col (str, optional): 键列. Defaults to '股票代码'.
+        ignore_cols (tuple, optional): 判断行是否变化时忽略的列. Defaults to ().
+        root (Path, optional): 存储根目录. Defaults to None.
+
+    Returns:
+        int: 写入行数
+    """
+    batch = pd.Timestamp(batch)
+    day_dir = _day_dir(name, batch, root)
+    lock = FileLock(day_dir / '_write.lock')
+    while not lock.acquire():
+        lock.wait()
+    try:
+        state_path = day_dir / STATE_NAME
+        prev = _read_ipc(state_path) if state_path.exists() else None
+        frames = _frames(day_dir)
+        since_key = 0
+        for _, is_key, _ in reversed(frames):
+            if is_key:
+                break
+            since_key += 1
+        is_key = prev is None or not frames or since_key >= KEYFRAME_EVERY - 1
+        df = df.drop_duplicates(key_col, keep='last').assign(
+            **{BATCH_COL: batch})
+        # 上一批次的行消失时，以关键帧替换完整截面
+        if not is_key and not prev[key_col].isin(df[key_col]).all():
+            is_key = True
+        part = df if is_key else changed_rows(df, prev, key_col, ignore_cols)
+        if not is_key and part.empty:
+            return 0
+        suffix = 'k' if is_key else 'd'
+        path = day_dir / f'{batch.value}-{suffix}.arrow'
+        _write_ipc(pa.Table.from_pandas(part, preserve_index=False), path)
+        # 最新完整截面，供下一批次比较
+        state = df if is_key else _apply(prev, part, key_col)
+        _write_ipc(pa.Table.from_pandas(state, preserve_index=False),
+                   state_path)
+        return len(part)
+    finally:
+        lock.release()
+
+
+def _apply(base, deltas, key_col):
+    if isinstance(deltas, pd.DataFrame):
+        deltas = [deltas]
+    df = pd.concat([base] + list(deltas), ignore_index=True)
+    return df.drop_duplicates(key_col, keep='last').reset_index(drop=True)
+
+
+def read_snapshot(name, at, key_col=KEY_COL, root=None):
+    """重建指定时点的完整截面
+
+    Args:
+        name (str): 名称
+        at (datetime like): 时点，使用该时点之前（含）的批次
+        key_col (str, optional): 键列. Defaults to '股票代码'.
+        root (Path, optional): 存储根目录. Defaults to None.
+
+    Returns:
+        DataFrame: 截面数据，`批次`列为各行最后更新的批次
+    """
+    at = pd.Timestamp(at)
+    frames = [f for f in _frames(_day_dir(name, at, root)) if f[0] <= at.value]
+    start = None
+    for i in range(len(frames) - 1, -1, -1):
+        if frames[i][1]:
+            start = i
+            break
+    if start is None:
+        return pd.DataFrame()
+    base = _read_ipc(frames[start][2])
+    deltas = [_read_ipc(path) for _, _, path in frames[start + 1:]]
+    df = _apply(base, deltas, key_col)
+    return df.sort_values(key_col).reset_index(drop=True)
+
+
+def list_batches(name, date, root=None):
+    """当日全部批次时间"""
+    frames = _frames(_day_dir(name, date, root))
+    return [pd.Timestamp(ns) for ns, _, _ in frames]
@@ -0,0 +1,251 @@
+"""
+财务报表列式存储
+
+网易财务报表每期数百个科目，以宽表文档存储时科目名称重复出现在每个文档中。
+此处以长表存储：(股票代码, 报告日期, 科目编号, 值)，科目名称与编号的对应关系
+保存在科目字典文件中。
+
+目录结构：
+    <数据目录>/store/statements/accounts.parquet
+    <数据目录>/store/statements/<报表>/bucket=7/part-*.parquet
+
+按代码分桶分区。读取时依据代码裁剪分区，按科目编号及报告日期下推过滤，再转换为宽表。
+
+用法：
+    >>> write_statement(df, 'zcfzb')
+    >>> get_statement(['000001'], ['货币资金(万元)'], ['2019-12-31'], 'zcfzb')
+"""
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from ..utils.cache import FileLock
+from .base import (compact_partition, hive_partitioning, open_dataset,
+                   store_path, write_part)
+from .bars import code_bucket
+
+CODE_COL = '股票代码'
+DATE_COL = '报告日期'
+ACCOUNT_COL = '科目'
+VALUE_COL = '值'
+REPORT_COL = '报表'
+ID_COL = '编号'
+# 非科目列
+META_COLS = ('_id', '更新时间')
+# 报表：名称
+REPORTS = {'zcfzb': '资产负债表', 'lrb': '利润表', 'xjllb': '现金流量表'}
+ACCOUNTS_FILE = 'accounts.parquet'
+PARTITIONING = hive_partitioning(pa.schema([('bucket', pa.int8())]))
+
+# 科目字典缓存：文件路径 -> (文件修改时间, DataFrame)
+_accounts_cache = {}
+
+
+def report_key(report):
+    """报表代码，可使用报表名称"""
+    for key, name in REPORTS.items():
+        if report in (key, name):
+            return key
+    raise ValueError(f'报表只能为{list(REPORTS)}或{list(REPORTS.values())}')
+
+
+def _root(root=None):
+    return store_path('statements', root)
+
+
+def _accounts_path(root=None):
+    return _root(root) / ACCOUNTS_FILE
+
+
+def _read_accounts(root=None):
+    """科目字典（文件修改后重新读取）"""
+    path = _accounts_path(root)
+    if not path.exists():
+        return pd.DataFrame({
+            REPORT_COL: pd.Series([], dtype=object),
+            ACCOUNT_COL: pd.Series([], dtype=object),
+            ID_COL: pd.Series([], dtype='int32')
+        })
+    mtime = path.stat().st_mtime_ns
+    cached = _accounts_cache.get(str(path))
+    if cached is None or cached[0] != mtime:
+        cached = (mtime, pq.read_table(str(path)).to_pandas())
+        _accounts_cache[str(path)] = cached
+    return cached[1]
+
+
+def get_accounts(report, root=None):
+    """报表科目字典
+
+    Returns:
+        dict: 科目名称 -> 编号
+    """
+    df = _read_accounts(root)
+    df = df[df[REPORT_COL] == report_key(report)]
+    return dict(zip(df[ACCOUNT_COL], df[ID_COL]))
+
+
+def register_accounts(report, names, root=None):
+    """登记科目，新科目按顺序编号（编号在全部报表中唯一）
+
+    Returns:
+        dict: 科目名称 -> 编号
+    """
+    report = report_key(report)
+    mapping = get_accounts(report, root)
+    new = [n for n in dict.fromkeys(names) if n not in mapping]
+    if not new:
+        return mapping
+    path = _accounts_path(root)
+    lock = FileLock(path.with_suffix('.lock'))
+    while not lock.acquire():
+        lock.wait()
+    try:
+        # 加锁后重新读取，其他进程可能已登记
+        df = _read_accounts(root)
+        current = df[df[REPORT_COL] == report]
+        new = [n for n in new if n not in set(current[ACCOUNT_COL])]
+        if new:
+            start = int(df[ID_COL].max()) + 1 if len(df) else 0
+            added = pd.DataFrame({
+                REPORT_COL: report,
+                ACCOUNT_COL: new,
+                ID_COL: np.arange(start, start + len(new), dtype='int32')
+            })
+            df = pd.concat([df, added], ignore_index=True)
+            tmp = path.with_suffix('.tmp')
+            pq.write_table(pa.Table.from_pandas(df, preserve_index=False),
+                           str(tmp))
+            tmp.replace(path)
+    finally:
+        lock.release()
+    return get_accounts(report, root)
+
+
+def _to_table(df, report, root=None):
+    """宽表转换为长表，只保留有值的科目"""
+    accounts = [c for c in df.columns
+                if c not in (CODE_COL, DATE_COL) + META_COLS]
+    mapping = register_accounts(report, accounts, root)
+    ids = np.array([mapping[c] for c in accounts], dtype='int32')
+    values = df[accounts].apply(pd.to_numeric,
+                                errors='coerce').to_numpy(dtype=float)
+    rows, cols = np.nonzero(~np.isnan(values))
+    codes = df[CODE_COL].to_numpy(dtype=object)[rows]
+    dates = pd.to_datetime(df[DATE_COL]).to_numpy()[rows]
+    arrays = [
+        pa.array(codes, type=pa.string()),
+        pa.array(dates.astype('datetime64[ms]')),
+        pa.array(ids[cols]),
+        pa.array(values[rows, cols]),
+        pa.array([code_bucket(c) for c in codes], type=pa.int8()),
+    ]
+    names = [CODE_COL, DATE_COL, ACCOUNT_COL, VALUE_COL, 'bucket']
+    return pa.Table.from_arrays(arrays, names=names)
+
+
+def write_statement(df, report, root=None):
+    """追加写入财务报表
+
+    Args:
+        df (DataFrame): 宽表（科目为列），须包含`股票代码`、`报告日期`列
+        report (str): 报表，如'zcfzb'或'资产负债表'
+        root (Path, optional): 存储根目录. Defaults to None.
+
+    Returns:
+        int: 写入的(股票, 报告日期, 科目)数量
+    """
+    if df.empty:
+        return 0
+    table = _to_table(df, report, root)
+    if table.num_rows:
+        write_part(table, _root(root) / report_key(report), PARTITIONING)
+    return table.num_rows
+
+
+def _filter(codes, ids, periods):
+    exprs = []
+    if codes is not None:
+        buckets = sorted({code_bucket(c) for c in codes})
+        exprs.append(ds.field('bucket').isin(buckets))
+        exprs.append(ds.field(CODE_COL).isin(list(codes)))
+    if ids is not None:
+        exprs.append(ds.field(ACCOUNT_COL).isin(ids))
+    if periods is not None:
+        dates = pd.to_datetime(list(periods)).values.astype('datetime64[ms]')
+        exprs.append(ds.field(DATE_COL).isin(pa.array(dates)))
+    if not exprs:
+        return None
+    expr = exprs[0]
+    for e in exprs[1:]:
+        expr = expr & e
+    return expr
+
+
+def get_statement(codes=None,
+                  items=None,
+                  periods=None,
+                  report='zcfzb',
+                  root=None):
+    """读取财务报表
+
+    Args:
+        codes (list, optional): 股票代码列表. Defaults to None（全部）.
+        items (list, optional): 科目名称列表. Defaults to None（全部）.
+        periods (list, optional): 报告日期列表. Defaults to None（全部）.
+        report (str, optional): 报表. Defaults to 'zcfzb'.
+        root (Path, optional): 存储根目录. Defaults to None.
+
+    Returns:
+        DataFrame: 宽表，列为`股票代码`、`报告日期`及科目，按代码、报告日期排序
+    """
+    if isinstance(codes, str):
+        codes = [codes]
+    if isinstance(items, str):
+        items = [items]
+    if isinstance(periods, (str, pd.Timestamp)):
+        periods = [periods]
+    mapping = get_accounts(report, root)
+    ids = None
+    if items is not None:
+        ids = [int(mapping[n]) for n in items if n in mapping]
+    dataset = open_dataset(_root(root) / report_key(report), PARTITIONING)
+    columns = [CODE_COL, DATE_COL] + list(items or [])
+    if dataset is None or ids == []:
+        return pd.DataFrame(columns=columns)
+    table = dataset.to_table(columns=[CODE_COL, DATE_COL, ACCOUNT_COL,
+                                      VALUE_COL],
+                             filter=_filter(codes, ids, periods))
+    df = table.to_pandas()
+    # 未合并的文件可能存在重复，保留最后写入的记录
+    df = df.drop_duplicates([CODE_COL, DATE_COL, ACCOUNT_COL], keep='last')
+    wide = df.set_index([CODE_COL, DATE_COL, ACCOUNT_COL])[VALUE_COL].unstack()
+    names = {v: k for k, v in mapping.items()}
+    wide.columns = [names[i] for i in wide.columns]
+    if items is not None:
+        wide = wide.reindex(columns=list(items))
+    wide.columns.name = None
+    return wide.sort_index().reset_index()
+
+
+def compact_statements(report=None, root=None):
+    """合并分区文件
+
+    Args:
+        report (str, optional): 报表. Defaults to None（全部报表）.
+        root (Path, optional): 存储根目录. Defaults to None.
+
+    Returns:
+        int: 合并的分区数量
+    """
+    reports = list(REPORTS) if report is None else [report_key(report)]
+    keys = [CODE_COL, DATE_COL, ACCOUNT_COL]
+    n = 0
+    for key in reports:
+        for part_dir in (_root(root) / key).glob('bucket=*'):
+            if len(list(part_dir.glob('part-*.parquet'))) > 1:
+                compact_partition(part_dir, keys, keys)
+                n += 1
+    return n
@@ -0,0 +1,256 @@
+"""
+成交明细（逐笔）列式存储
+
+按日分目录，每个写入批次生成一个按（代码、时间）排序的Parquet文件：
+    <数据目录>/store/ticks/2020-07-24/part-<时间戳>-<进程号>.parquet
+    <数据目录>/store/ticks/2020-07-24/_completed/part-<时间戳>-<进程号>.txt
+
+字段编码：
+    股票代码  字典编码
+    成交时间  int64纳秒（timestamp[ns]）
+    成交价    乘以`PRICE_SCALE`后的int32
+    价格变动  乘以`PRICE_SCALE`后的int32
+    成交量    int64（手）
+    成交额    float64
+    性质      字典编码（买盘、卖盘、中性盘）
+
+`_completed`目录记录已完整写入的股票代码：每个数据文件写入完成后，以同名标记文件
+（先写临时文件再`os.replace`）登记其中的代码，多进程同时写入互不影响。
+中断后重新运行只需下载未完成的股票。
+
+数据文件写入后、登记前中断时，重新运行会再次写入这些股票。成交明细没有序号字段，
+同一时间可能有多笔相同的成交，无法按行去重；读取及合并时同一股票只采用最后写入的文件。
+
+用法：
+    >>> with TickWriter('2020-07-24') as writer:
+    ...     writer.add('000001', df)
+    >>> read_ticks('2020-07-24', ['000001'])
+"""
+import os
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from .base import COMPRESSION, store_path
+
+PRICE_SCALE = 1000
+# 每个文件包含的股票数量，限制内存占用
+FLUSH_CODES = 200
+COMPLETED_DIR = '_completed'
+# 旧版本以追加方式登记的文件
+LEGACY_COMPLETED_NAME = '_completed.txt'
+PRICE_COLS = ('成交价', '价格变动')
+SCHEMA = pa.schema([
+    ('股票代码', pa.dictionary(pa.int32(), pa.string())),
+    ('成交时间', pa.timestamp('ns')),
+    ('成交价', pa.int32()),
+    ('价格变动', pa.int32()),
+    ('成交量', pa.int64()),
+    ('成交额', pa.float64()),
+    ('性质', pa.dictionary(pa.int8(), pa.string())),
+], metadata={'price_scale': str(PRICE_SCALE)})
+
+
+def tick_dir(date, root=None):
+    day = pd.Timestamp(date).strftime(r'%Y-%m-%d')
+    return store_path(f'ticks/{day}', root)
+
+
+def _scaled(values):
+    values = np.nan_to_num(np.asarray(values, dtype=np.float64))
+    return np.round(values * PRICE_SCALE).astype(np.int32)
+
+
+def _to_table(df):
+    """编码为存储格式，按（代码、时间）排序"""
+    df = df.sort_values(['股票代码', '成交时间'], kind='stable')
+    arrays = [
+        pa.array(df['股票代码'].astype(str).to_numpy()).dictionary_encode(),
+        pa.array(df['成交时间'].to_numpy().astype('datetime64[ns]')),
+        pa.array(_scaled(df['成交价'])),
+        pa.array(_scaled(df['价格变动'])),
+        pa.array(df['成交量'].fillna(0).to_numpy(np.int64)),
+        pa.array(df['成交额'].to_numpy(np.float64)),
+        pa.array(df['性质'].fillna('').astype(str).to_numpy()).dictionary_encode(),
+    ]
+    table = pa.Table.from_arrays(arrays, schema=SCHEMA.remove_metadata())
+    return table.cast(SCHEMA)
+
+
+def completed_codes(date, root=None):
+    """已完整写入的股票代码"""
+    path = tick_dir(date, root)
+    files = list((path / COMPLETED_DIR).glob('*.txt'))
+    if (path / LEGACY_COMPLETED_NAME).exists():
+        files.append(path / LEGACY_COMPLETED_NAME)
+    res = set()
+    for p in files:
+        with open(p, encoding='utf-8') as f:
+            res.update(line.strip() for line in f if line.strip())
+    return res
+
+
+def _mark_completed(path, name, codes):
+    """以标记文件登记已完成的股票代码（写入临时文件后替换，不会出现不完整的标记）"""
+    marker_dir = path / COMPLETED_DIR
+    marker_dir.mkdir(exist_ok=True)
+    marker = marker_dir / f'{Path(name).stem}.txt'
+    tmp = marker.with_suffix('.tmp')
+    with open(tmp, 'w', encoding='utf-8') as f:
+        f.write(''.join(f'{code}\n' for code in codes))
+    os.replace(tmp, marker)
+
+
+class TickWriter(object):
+    """按日写入成交明细
+
+    累积`flush_codes`只股票后写入一个文件，再登记为已完成。
+
+    Args:
+        date (date like): 交易日期
+        flush_codes (int, optional): 每个文件的股票数量. Defaults to 200.
+        root (Path, optional): 存储根目录. Defaults to None.
+    """
+
+    def __init__(self, date, flush_codes=FLUSH_CODES, root=None):
+        self.path = tick_dir(date, root)
+        self.flush_codes = flush_codes
+        self._frames = {}
+
+    def add(self, code, df):
+        """添加单只股票数据（空数据也登记为完成）"""
+        self._frames[code] = df
+        if len(self._frames) >= self.flush_codes:
+            self.flush()
+
+    def flush(self):
+        if not self._frames:
+            return
+        frames = [df for df in self._frames.values() if not df.empty]
+        name = f'part-{time.time_ns()}-{os.getpid()}.parquet'
+        if frames:
+            table = _to_table(pd.concat(frames, ignore_index=True))
+            tmp = self.path / f'{name}.tmp'
+            pq.write_table(table,
+                           str(tmp),
+                           compression=COMPRESSION,
+                           use_dictionary=True)
+            os.replace(tmp, self.path / name)
+        # 数据文件完成后再登记
+        _mark_completed(self.path, name, self._frames)
+        self._frames = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.flush()
+
+
+def _decode_columns(df):
+    for col in PRICE_COLS:
+        if col in df.columns:
+            df[col] = df[col] / PRICE_SCALE
+    if '股票代码' in df.columns:
+        # 分类按代码顺序排列，以便排序
+        s = df['股票代码']
+        df['股票代码'] = s.cat.set_categories(sorted(s.cat.categories))
+    return df
+
+
+def _part_files(path):
+    """数据文件，按写入顺序排列"""
+    def order(p):
+        _, ns, pid = p.stem.split('-')
+        return int(ns), int(pid)
+    return sorted(Path(path).glob('part-*.parquet'), key=order)
+
+
+def _read_latest(files, columns=None, expr=None):
+    """读取数据文件，同一股票只保留最后写入的文件中的行
+
+    Returns:
+        Table: 各文件数据依次连接
+    """
+    read_cols = None
+    if columns is not None:
+        read_cols = list(dict.fromkeys(['股票代码'] + list(columns)))
+    tables, order = [], []
+    for i, f in enumerate(files):
+        t = ds.dataset(str(f), schema=SCHEMA,
+                       format='parquet').to_table(columns=read_cols, filter=expr)
+        tables.append(t)
+        order.append(np.full(t.num_rows, i))
+    table = pa.concat_tables(tables).unify_dictionaries()
+    if len(files) > 1 and table.num_rows:
+        order = np.concatenate(order)
+        codes = table['股票代码'].cast(pa.string()).to_numpy(
+            zero_copy_only=False)
+        latest = pd.Series(order).groupby(codes).transform('max').to_numpy()
+        table = table.filter(pa.array(order == latest))
+    if columns is not None:
+        table = table.select(list(columns))
+    return table
+
+
+def read_ticks(date, codes=None, columns=None, root=None):
+    """读取成交明细
+
+    Args:
+        date (date like): 交易日期
+        codes (list, optional): 股票代码. Defaults to None（全部）.
+        columns (list, optional): 字段. Defaults to None（全部）.
+        root (Path, optional): 存储根目录. Defaults to None.
+
+    Returns:
+        DataFrame: 按代码、时间排序，价格已还原为浮点数
+    """
+    path = tick_dir(date, root)
+    files = _part_files(path)
+    if not files:
+        return pd.DataFrame(columns=columns or SCHEMA.names)
+    expr = None
+    if codes is not None:
+        codes = [codes] if isinstance(codes, str) else list(codes)
+        expr = ds.field('股票代码').isin(codes)
+    table = _read_latest(files, columns, expr)
+    df = _decode_columns(table.to_pandas())
+    keys = [c for c in ('股票代码', '成交时间') if c in df.columns]
+    if keys:
+        df = df.sort_values(keys, kind='stable')
+    return df.reset_index(drop=True)
+
+
+def compact_ticks(date, root=None):
+    """合并当日文件为一个按（代码、时间）排序的文件（重复写入的股票只保留最后写入的数据）
+
+    Returns:
+        int: 合并的文件数量
+    """
+    path = tick_dir(date, root)
+    files = _part_files(path)
+    if len(files) < 2:
+        return 0
+    table = _read_latest(files)
+    # 字典编码列不能直接排序，以解码后的代码排序
+    keys = pa.table({
+        'code': table['股票代码'].cast(pa.string()),
+        'time': table['成交时间'],
+    })
+    indices = pc.sort_indices(keys, sort_keys=[('code', 'ascending'),
+                                               ('time', 'ascending')])
+    table = table.take(indices).unify_dictionaries().cast(SCHEMA)
+    name = f'part-{time.time_ns()}-{os.getpid()}.parquet'
+    tmp = path / f'{name}.tmp'
+    pq.write_table(table, str(tmp), compression=COMPRESSION,
+                   row_group_size=1024 * 1024)
+    os.replace(tmp, path / name)
+    for f in files:
+        f.unlink()
+    return len(files)
@@ -14,7 +14,7 @@ from selenium.webdriver.common.by import By
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.support.ui import WebDriverWait
 
-from cnswd._seleniumwire import make_headless_browser
+from cnswd._seleniumwire import lease_browser
 from cnswd.setting.config import POLL_FREQUENCY, TIMEOUT
 
 logbook.StreamHandler(sys.stdout).push_application()
@@ -30,15 +30,15 @@ class THS(object):
     def __init__(self):
         self.logger = logger
         self.logger.info("创建无头浏览器")
-        self.driver = make_headless_browser()
+        self._browser = lease_browser()
+        self.driver = self._browser.driver
         self.wait = WebDriverWait(self.driver, 60, POLL_FREQUENCY)
 
     def __enter__(self):
         return self
 
     def __exit__(self, *args):
-        self.driver.delete_all_cookies()
-        self.driver.quit()
+        self._browser.release(failed=args[0] is not None)
 
     def _parse_href_in_table(self, step=2):
         """解析表内a元素的网址"""
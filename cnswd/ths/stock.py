@@ -2,7 +2,7 @@
 个股资料
 """
 from cnswd.setting.config import POLL_FREQUENCY, TIMEOUT
-from cnswd._seleniumwire import make_headless_browser
+from cnswd._seleniumwire import lease_browser
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.common.by import By
@@ -30,15 +30,15 @@ class THSStock(object):
     def __init__(self):
         self.logger = logger
         self.logger.info("创建无头浏览器")
-        self.driver = make_headless_browser()
+        self._browser = lease_browser()
+        self.driver = self._browser.driver
         self.wait = WebDriverWait(self.driver, 60, POLL_FREQUENCY)
 
     def __enter__(self):
         return self
 
     def __exit__(self, *args):
-        self.driver.delete_all_cookies()
-        self.driver.quit()
+        self._browser.release(failed=args[0] is not None)
 
     def _load_page(self, code):
         """加载网页"""
@@ -1,6 +1,29 @@
 """
 当查询、计算耗时较长的数据时，使用缓存
+
+两级缓存：
+    1. 进程内LRU缓存
+    2. 磁盘缓存（HDF5），多进程共享
+
+过期规则：
+    1. 指定`hour`时，为日历规则：上次刷新时间加`delta`后的`hour:minute`
+    2. `hour`为None时，为固定时长：上次刷新时间加`delta`
+
+缓存过期后，以文件锁保证只有一个进程刷新数据，其余进程等待后读取。
+
+用法：
+    >>> @hot_cache(delta='1D', hour=9, minute=30)
+    ... def get_data(code):
+    ...     pass
+    >>> get_data('000001')
+    >>> get_data.cache_info()
 """
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from functools import wraps
 from hashlib import blake2b
 
 import pandas as pd
@@ -9,6 +32,240 @@ from .path_utils import data_root
 
 CACHE_DIR_NAME = 'hotdata'
 DIGEST_SIZE = 10
+# 进程内缓存最大项目数
+MAXSIZE = 128
+# 等待其他进程刷新的最长时间，超时视为锁失效，单位：秒
+LOCK_TIMEOUT = 300
+LOCK_POLL = 0.1
+
+CacheInfo = namedtuple('CacheInfo', 'hits, disk_hits, misses, currsize')
+
+
+def make_key(func, args, kwargs):
+    """以函数全名及参数计算缓存键
+
+    参数序列化后整体计算摘要，避免字符串拼接导致的键冲突。
+    """
+    h = blake2b(digest_size=DIGEST_SIZE)
+    h.update(f'{func.__module__}.{func.__qualname__}'.encode())
+    try:
+        payload = pickle.dumps((args, sorted(kwargs.items())), protocol=4)
+    except (pickle.PicklingError, TypeError, AttributeError):
+        payload = repr((args, sorted(kwargs.items()))).encode()
+    h.update(payload)
+    return h.hexdigest()
+
+
+def expire_time(refresh_time, delta='1D', hour=0, minute=0):
+    """过期时间
+
+    Args:
+        refresh_time (Timestamp): 刷新时间
+        delta (str, optional): 间隔. Defaults to '1D'.
+        hour (int, optional): 时，为None时按固定时长过期. Defaults to 0.
+        minute (int, optional): 分. Defaults to 0.
+
+    Returns:
+        Timestamp: 过期时间
+    """
+    next_time = pd.Timestamp(refresh_time) + pd.Timedelta(delta)
+    if hour is None:
+        return next_time
+    next_time = next_time.floor('min')
+    return next_time.replace(hour=hour, minute=minute)
+
+
+class FileLock(object):
+    """以独占方式创建文件实现的跨进程锁"""
+
+    def __init__(self, path, timeout=LOCK_TIMEOUT):
+        self.path = str(path)
+        self.timeout = timeout
+        self.locked = False
+
+    def _is_stale(self):
+        try:
+            return time.time() - os.path.getmtime(self.path) > self.timeout
+        except FileNotFoundError:
+            return False
+
+    def acquire(self):
+        """尝试加锁，不阻塞"""
+        try:
+            fd = os.open(self.path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            if self._is_stale():
+                # 持有锁的进程可能已退出
+                self.release(force=True)
+                return self.acquire()
+            return False
+        os.write(fd, str(os.getpid()).encode())
+        os.close(fd)
+        self.locked = True
+        return True
+
+    def wait(self):
+        """等待锁释放，超时返回False"""
+        deadline = time.time() + self.timeout
+        while os.path.exists(self.path):
+            if time.time() > deadline:
+                return False
+            time.sleep(LOCK_POLL)
+        return True
+
+    def release(self, force=False):
+        if self.locked or force:
+            try:
+                os.unlink(self.path)
+            except FileNotFoundError:
+                pass
+            self.locked = False
+
+
+def _copy(value):
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return value.copy()
+    return value
+
+
+class _Cache(object):
+    """单个函数的两级缓存"""
+
+    def __init__(self, func, delta, hour, minute, maxsize):
+        self.func = func
+        self.delta = delta
+        self.hour = hour
+        self.minute = minute
+        self.maxsize = maxsize
+        self._memory = OrderedDict()
+        self._lock = threading.RLock()
+        self.hits = self.disk_hits = self.misses = 0
+
+    def store_path(self, key):
+        return data_root(f"{CACHE_DIR_NAME}/{key}.h5")
+
+    def _get_memory(self, key, now):
+        with self._lock:
+            item = self._memory.get(key)
+            if item is None:
+                return None
+            if now >= item[0]:
+                del self._memory[key]
+                return None
+            self._memory.move_to_end(key)
+            return item
+
+    def _put_memory(self, key, expires, value):
+        with self._lock:
+            self._memory[key] = (expires, value)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.maxsize:
+                self._memory.popitem(last=False)
+
+    def read_disk(self, key):
+        """读取磁盘缓存
+
+        Returns:
+            tuple: (过期时间, 数据)，不存在时返回None
+        """
+        path = self.store_path(key)
+        if not path.exists():
+            return None
+        try:
+            with pd.HDFStore(str(path), mode='r') as store:
+                meta = store.select('meta')
+                return meta['expires'], store.select('records')
+        except Exception:
+            return None
+
+    def _write_disk(self, key, refresh_time, expires, value):
+        path = self.store_path(key)
+        tmp = path.with_name(f'{path.stem}.{os.getpid()}.tmp')
+        meta = pd.Series({'refresh_time': refresh_time, 'expires': expires})
+        with pd.HDFStore(str(tmp), mode='w') as store:
+            store.put('records', value)
+            store.put('meta', meta)
+        # 整体替换，其他进程不会读取到写入中的文件
+        os.replace(tmp, path)
+
+    def _refresh(self, key, args, kwargs):
+        refresh_time = pd.Timestamp.now()
+        value = self.func(*args, **kwargs)
+        expires = expire_time(refresh_time, self.delta, self.hour,
+                              self.minute)
+        self._write_disk(key, refresh_time, expires, value)
+        return expires, value
+
+    def get(self, args, kwargs):
+        key = make_key(self.func, args, kwargs)
+        now = pd.Timestamp.now()
+        item = self._get_memory(key, now)
+        if item is not None:
+            self.hits += 1
+            return _copy(item[1])
+        item = self.read_disk(key)
+        if item is None or now >= item[0]:
+            item = self._single_flight(key, args, kwargs)
+        else:
+            self.disk_hits += 1
+        self._put_memory(key, *item)
+        return _copy(item[1])
+
+    def _single_flight(self, key, args, kwargs):
+        """只有一个进程刷新过期数据"""
+        lock = FileLock(self.store_path(key).with_suffix('.lock'))
+        while True:
+            if lock.acquire():
+                try:
+                    self.misses += 1
+                    return self._refresh(key, args, kwargs)
+                finally:
+                    lock.release()
+            if not lock.wait():
+                # 等待超时，自行刷新
+                self.misses += 1
+                return self._refresh(key, args, kwargs)
+            item = self.read_disk(key)
+            if item is not None and pd.Timestamp.now() < item[0]:
+                self.disk_hits += 1
+                return item
+
+    def info(self):
+        return CacheInfo(self.hits, self.disk_hits, self.misses,
+                         len(self._memory))
+
+    def clear(self):
+        """清除进程内缓存"""
+        with self._lock:
+            self._memory.clear()
+        self.hits = self.disk_hits = self.misses = 0
+
+
+def hot_cache(delta='1D', hour=0, minute=0, maxsize=MAXSIZE):
+    """缓存函数返回的Series、DataFrame数据
+
+    Args:
+        delta (str, optional): 刷新间隔. Defaults to '1D'.
+        hour (int, optional): 刷新时点（时），为None时按固定时长过期. Defaults to 0.
+        minute (int, optional): 刷新时点（分）. Defaults to 0.
+        maxsize (int, optional): 进程内缓存最大项目数. Defaults to 128.
+
+    Returns:
+        callable: 装饰器。被装饰函数附加`cache_info`、`cache_clear`方法
+    """
+    def decorator(func):
+        cache = _Cache(func, delta, hour, minute, maxsize)
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            return cache.get(args, kwargs)
+
+        wrapper.cache_info = cache.info
+        wrapper.cache_clear = cache.clear
+        wrapper._cache = cache
+        return wrapper
+
+    return decorator
 
 
 class HotDataCache(object):
@@ -21,77 +278,33 @@ class HotDataCache(object):
         self.delta = delta
         self.hour = hour
         self.minute = minute
+        self._cached = hot_cache(delta, hour, minute)(func)
 
     def fetch_data(self):
         return self._func(*self._args, **self._kwargs)
 
     @property
     def table_name(self):
-        p1 = self._func.__name__
-        p2 = ''.join([str(x) for x in self._args])
-        p3 = ''.join([str(x) for x in self._kwargs.values()])
-        s = p1 + p2 + p3
-        h = blake2b(digest_size=DIGEST_SIZE)
-        h.update(s.encode())
-        return h.hexdigest()
-
-    def _gen_data(self):
-        data = self.fetch_data()
-        return {
-            'records': data,
-            'refresh_time': pd.Series({'refresh_time': pd.Timestamp.now()}),
-        }
-
-    @ property
-    def store_path(self):
-        return data_root(f"{CACHE_DIR_NAME}/{self.table_name}.h5")
-
-    def _insert(self):
-        with pd.HDFStore(str(self.store_path)) as store:
-            doc = self._gen_data()
-            for k, v in doc.items():
-                store.put(k, v)
-
-    def _update(self):
-        with pd.HDFStore(str(self.store_path)) as store:
-            try:
-                store.remove('records')
-                store.remove('refresh_time')
-            except KeyError:
-                pass
-        self._insert()
+        return make_key(self._func, self._args, self._kwargs)
 
-    @ property
-    def last_refresh_time(self):
-        with pd.HDFStore(str(self.store_path)) as store:
-            try:
-                dt = store.select('refresh_time')['refresh_time']
-                store.close()
-                return dt
-            except Exception:
-                return pd.Timestamp('1970-01-01')
+    @property
+    def store_path(self):
+        return self._cached._cache.store_path(self.table_name)
 
-    @ property
+    @property
     def next_refresh_time(self):
-        last = self.last_refresh_time
-        next_time = last + pd.Timedelta(self.delta)
-        next_time = pd.Timestamp(next_time)
-        next_time = next_time.floor('T')
-        return next_time.replace(hour=self.hour, minute=self.minute)
+        item = self._cached._cache.read_disk(self.table_name)
+        return item[0] if item else pd.Timestamp('1970-01-01')
 
-    @ property
+    @property
     def data(self):
-        now = pd.Timestamp.now()
-        if now >= self.next_refresh_time:
-            self._update()
-        with pd.HDFStore(str(self.store_path)) as store:
-            df = store.select('records')
-            return df
+        return self._cached(*self._args, **self._kwargs)
 
 
 def clean_cache():
     """清除缓存数据"""
     root = data_root(f"{CACHE_DIR_NAME}")
-    for path in root.glob('*.h5'):
-        if len(path.name.split('.')[0]) == 2 * DIGEST_SIZE:
-            path.unlink()
+    for pattern in ('*.h5', '*.lock', '*.tmp'):
+        for path in root.glob(pattern):
+            if len(path.name.split('.')[0]) == 2 * DIGEST_SIZE:
+                path.unlink()
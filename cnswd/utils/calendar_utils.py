@@ -0,0 +1,173 @@
+"""
+
+交易日历
+
+以升序`datetime64[D]`数组及按日位图保存交易日，
+`is_session`按位图直接定位，其余查询使用`searchsorted`，均支持数组输入。
+
+数据来源由`loader`提供，按`check_interval`节流检查版本（如mongodb文档的更新时间），
+版本变化后重新加载。
+
+"""
+import time
+
+import numpy as np
+import pandas as pd
+
+from ..setting.constants import TZ
+
+# 检查数据版本的最短间隔，单位：秒
+CHECK_INTERVAL = 60
+
+
+def to_days(dts):
+    """转换为`datetime64[D]`数组，带时区的时间先转换为本地时间"""
+    index = pd.DatetimeIndex(np.atleast_1d(pd.to_datetime(dts)))
+    if index.tz is not None:
+        index = index.tz_convert(TZ).tz_localize(None)
+    return index.values.astype('datetime64[D]')
+
+
+def _is_scalar(dts):
+    return np.ndim(dts) == 0
+
+
+def _wrap(days, scalar):
+    if scalar:
+        d = days[0]
+        return pd.NaT if np.isnat(d) else pd.Timestamp(d)
+    return days
+
+
+class TradingCalendar(object):
+    """交易日历
+
+    Args:
+        sessions (list-like, optional): 交易日。提供时为固定日历. Defaults to None.
+        loader (callable, optional): 无参函数，返回(版本, 交易日列表). Defaults to None.
+        version (callable, optional): 无参函数，返回当前版本，用于判断是否需要重新加载.
+            Defaults to None.
+        check_interval (int, optional): 检查版本间隔秒数. Defaults to 60.
+
+    用法：
+        >>> c = TradingCalendar(['2020-07-23', '2020-07-24', '2020-07-27'])
+        >>> c.next_session('2020-07-24')
+        Timestamp('2020-07-27 00:00:00')
+    """
+
+    def __init__(self,
+                 sessions=None,
+                 loader=None,
+                 version=None,
+                 check_interval=CHECK_INTERVAL):
+        assert sessions is not None or loader is not None, '交易日或加载函数不得全部为空'
+        self._loader = loader
+        self._version_func = version
+        self.check_interval = check_interval
+        self._version = None
+        self._checked = None
+        if sessions is not None:
+            self._set(sessions)
+
+    def _set(self, sessions):
+        days = np.unique(to_days(sessions))
+        self._sessions = days
+        if len(days):
+            self._first = days[0]
+            bitmap = np.zeros((days[-1] - days[0]).astype(int) + 1,
+                              dtype=bool)
+            bitmap[(days - days[0]).astype(int)] = True
+        else:
+            self._first = np.datetime64('1970-01-01', 'D')
+            bitmap = np.zeros(0, dtype=bool)
+        self._bitmap = bitmap
+
+    def _load(self):
+        self._version, sessions = self._loader()
+        self._set(sessions)
+
+    def _ensure(self):
+        """首次使用时加载；此后按间隔检查版本，变化后重新加载"""
+        if self._loader is None:
+            return
+        now = time.monotonic()
+        if self._checked is None:
+            self._load()
+        elif now - self._checked >= self.check_interval:
+            if self._version_func is None or self._version_func(
+            ) != self._version:
+                self._load()
+        self._checked = now
+
+    @property
+    def sessions(self):
+        """全部交易日（datetime64[D]数组）"""
+        self._ensure()
+        return self._sessions
+
+    def is_session(self, dts):
+        """是否为交易日
+
+        Args:
+            dts (date like or array-like): 日期或时间
+
+        Returns:
+            bool or ndarray: 是否为交易日
+        """
+        self._ensure()
+        offsets = (to_days(dts) - self._first).astype(np.int64)
+        valid = (offsets >= 0) & (offsets < len(self._bitmap))
+        res = np.zeros(len(offsets), dtype=bool)
+        res[valid] = self._bitmap[offsets[valid]]
+        return bool(res[0]) if _is_scalar(dts) else res
+
+    def _take(self, idx):
+        sessions = self._sessions
+        valid = (idx >= 0) & (idx < len(sessions))
+        res = np.full(len(idx), np.datetime64('NaT'), dtype='datetime64[D]')
+        res[valid] = sessions[idx[valid]]
+        return res
+
+    def next_session(self, dts):
+        """之后（不含当日）的第一个交易日，超出范围为NaT"""
+        self._ensure()
+        idx = np.searchsorted(self._sessions, to_days(dts), side='right')
+        return _wrap(self._take(idx), _is_scalar(dts))
+
+    def previous_session(self, dts):
+        """之前（不含当日）的最后一个交易日，超出范围为NaT"""
+        self._ensure()
+        idx = np.searchsorted(self._sessions, to_days(dts), side='left') - 1
+        return _wrap(self._take(idx), _is_scalar(dts))
+
+    def sessions_in_range(self, start, end):
+        """期间（含首尾）的交易日
+
+        Returns:
+            DatetimeIndex: 交易日
+        """
+        self._ensure()
+        left = np.searchsorted(self._sessions, to_days(start)[0], side='left')
+        right = np.searchsorted(self._sessions, to_days(end)[0], side='right')
+        return pd.DatetimeIndex(self._sessions[left:right])
+
+    def minute_to_session(self, minutes, direction='next'):
+        """时间所属的交易日
+
+        非交易日的时间按`direction`取之后或之前的交易日。
+
+        Args:
+            minutes (datetime like or array-like): 时间
+            direction (str, optional): 'next'或'previous'. Defaults to 'next'.
+
+        Returns:
+            Timestamp or ndarray: 交易日
+        """
+        assert direction in ('next', 'previous')
+        self._ensure()
+        days = to_days(minutes)
+        if direction == 'next':
+            idx = np.searchsorted(self._sessions, days, side='left')
+        else:
+            idx = np.searchsorted(self._sessions, days, side='right') - 1
+        return _wrap(self._take(idx), _is_scalar(minutes))
@@ -0,0 +1,101 @@
+"""
+cron表达式
+
+五个字段：分 时 日 月 星期，支持`*`、列表`1,3`、范围`9-11`及步长`*/5`、`8-20/2`。
+星期以0或7代表星期日。日与星期均有限定时，满足其一即可（与cron一致）。
+
+用法：
+    >>> cron = Cron('*/30 8-20 * * 1-5')
+    >>> cron.matches(pd.Timestamp('2020-07-24 09:30'))
+    True
+"""
+import pandas as pd
+
+# 字段取值范围
+_RANGES = (
+    (0, 59),  # 分
+    (0, 23),  # 时
+    (1, 31),  # 日
+    (1, 12),  # 月
+    (0, 7),  # 星期
+)
+
+
+def _parse_field(expr, low, high):
+    values = set()
+    for part in expr.split(','):
+        step = 1
+        if '/' in part:
+            part, step = part.split('/')
+            step = int(step)
+            if step < 1:
+                raise ValueError(f'无效步长：{expr}')
+        if part == '*':
+            start, end = low, high
+        elif '-' in part:
+            start, end = (int(x) for x in part.split('-'))
+        else:
+            start = int(part)
+            end = high if step > 1 else start
+        if not low <= start <= end <= high:
+            raise ValueError(f'超出范围[{low}, {high}]：{expr}')
+        values.update(range(start, end + 1, step))
+    return frozenset(values)
+
+
+class Cron(object):
+    """cron表达式
+
+    Args:
+        expr (str): 五个字段的cron表达式
+    """
+
+    def __init__(self, expr):
+        fields = expr.split()
+        if len(fields) != 5:
+            raise ValueError(f'cron表达式应包含5个字段：{expr}')
+        self.expr = expr
+        (self.minutes, self.hours, self.days, self.months,
+         weekdays) = (_parse_field(f, *r) for f, r in zip(fields, _RANGES))
+        # 7 与 0 均代表星期日
+        self.weekdays = frozenset(d % 7 for d in weekdays)
+        self._any_day = fields[2] == '*'
+        self._any_weekday = fields[4] == '*'
+
+    def __repr__(self):
+        return f"Cron('{self.expr}')"
+
+    def _day_matches(self, dt):
+        # pandas 星期一为0，cron 星期日为0
+        weekday = (dt.dayofweek + 1) % 7
+        in_days = dt.day in self.days
+        in_weekdays = weekday in self.weekdays
+        if self._any_day or self._any_weekday:
+            return in_days and in_weekdays
+        return in_days or in_weekdays
+
+    def matches(self, dt):
+        """时间（精确到分钟）是否满足表达式"""
+        dt = pd.Timestamp(dt)
+        return (dt.minute in self.minutes and dt.hour in self.hours
+                and dt.month in self.months and self._day_matches(dt))
+
+    def next_after(self, dt, limit_days=366):
+        """之后（不含）第一个满足表达式的时间
+
+        Returns:
+            Timestamp: 时间，`limit_days`天内不存在时为None
+        """
+        dt = pd.Timestamp(dt).floor('min')
+        day = dt.normalize()
+        for i in range(limit_days + 1):
+            current = day + pd.Timedelta(days=i)
+            if current.month not in self.months or not self._day_matches(
+                    current):
+                continue
+            for hour in sorted(self.hours):
+                for minute in sorted(self.minutes):
+                    t = current + pd.Timedelta(hours=hour, minutes=minute)
+                    if t > dt:
+                        return t
+        return None
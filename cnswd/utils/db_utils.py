@@ -1,4 +1,20 @@
+from collections import namedtuple
+
+import bson
+import numpy as np
 import pandas as pd
+from pandas.api.types import is_datetime64_any_dtype
+from pymongo.errors import BulkWriteError
+
+# 重复键错误代码
+DUPLICATE_KEY_CODES = (11000, 11001, 12582)
+# 单批次文档数量及字节数上限
+BATCH_SIZE = 1000
+BATCH_BYTES = 8 * 1024 * 1024
+# DataFrame转换文档时每块行数
+CHUNK_SIZE = 100000
+
+BulkResult = namedtuple('BulkResult', 'inserted, duplicated, failed')
 
 
 def ingnore_null_dict(d):
@@ -17,6 +33,61 @@ def ingnore_null_dict(d):
     return res
 
 
+def _column_values(s):
+    """列值转换为BSON原生类型列表，同时返回空值掩码
+
+    Args:
+        s (Series): 列
+
+    Returns:
+        tuple: (值列表, 空值掩码)
+    """
+    mask = np.asarray(pd.isna(s))
+    dtype = s.dtype
+    if is_datetime64_any_dtype(dtype):
+        if getattr(dtype, 'tz', None) is not None:
+            s = s.dt.tz_convert('UTC').dt.tz_localize(None)
+        # 微秒精度转换为datetime对象，NaT转换为None
+        values = s.values.astype('datetime64[us]').astype(object).tolist()
+    elif isinstance(dtype, np.dtype):
+        # 数值类型转换为python内置类型，对象类型保持不变
+        values = s.values.tolist()
+    else:
+        # 扩展类型（Int64、string、category等）
+        values = s.tolist()
+    return values, mask
+
+
+def iter_docs(df, chunksize=CHUNK_SIZE):
+    """分块将DataFrame转换为mongo文档，忽略空值
+
+    按列一次性生成空值掩码及转换数据类型，逐块生成文档列表。
+
+    Args:
+        df (DataFrame): 传入数据对象
+        chunksize (int, optional): 每块行数. Defaults to 100000.
+
+    Yields:
+        list: 文档列表
+    """
+    keys = list(df.columns)
+    for start in range(0, len(df), chunksize):
+        part = df.iloc[start:start + chunksize]
+        if not keys:
+            yield [{} for _ in range(len(part))]
+            continue
+        columns, masks = [], []
+        for i in range(len(keys)):
+            values, mask = _column_values(part.iloc[:, i])
+            columns.append(values)
+            masks.append(mask)
+        docs = [dict(zip(keys, row)) for row in zip(*columns)]
+        for key, mask in zip(keys, masks):
+            for i in np.flatnonzero(mask).tolist():
+                del docs[i][key]
+        yield docs
+
+
 def to_dict(df):
     """将DataFram转换为mongo格式 
 
@@ -24,7 +95,174 @@ def to_dict(df):
         df (DataFram): 传入数据对象
 
     Returns:
-        DataFram: 字典格式数据
+        list: 字典格式数据
+    """
+    return [doc for docs in iter_docs(df) for doc in docs]
+
+
+def _batches(docs, batch_size, batch_bytes):
+    """按数量及字节数划分批次"""
+    batch, size = [], 0
+    for doc in docs:
+        n = len(bson.encode(doc))
+        if batch and (len(batch) >= batch_size or size + n > batch_bytes):
+            yield batch
+            batch, size = [], 0
+        batch.append(doc)
+        size += n
+    if batch:
+        yield batch
+
+
+def _parse_bulk_error(e):
+    """解析批量写入异常
+
+    Returns:
+        tuple: (插入数量, 重复数量, 非重复键错误列表)
+    """
+    details = e.details
+    errors = [
+        err for err in details.get('writeErrors', [])
+        if err['code'] not in DUPLICATE_KEY_CODES
+    ]
+    duplicated = len(details.get('writeErrors', [])) - len(errors)
+    return details.get('nInserted', 0), duplicated, errors
+
+
+def bulk_insert(collection,
+                docs,
+                batch_size=BATCH_SIZE,
+                batch_bytes=BATCH_BYTES,
+                raise_on_failure=True):
+    """批量无序插入文档，忽略重复键
+
+    Args:
+        collection (Collection): 目标集合
+        docs (iterable): 文档
+        batch_size (int, optional): 单批次文档数量上限. Defaults to 1000.
+        batch_bytes (int, optional): 单批次字节上限. Defaults to 8M.
+        raise_on_failure (bool, optional): 存在重复键以外的写入错误时，写完全部批次后
+            引发`BulkWriteError`. Defaults to True.
+
+    Raises:
+        BulkWriteError: 存在重复键以外的写入错误
+
+    Returns:
+        BulkResult: 插入、重复、失败数量
     """
-    data = df.to_dict('records')
-    return list(map(ingnore_null_dict, data))
+    inserted = duplicated = 0
+    errors = []
+    for batch in _batches(docs, batch_size, batch_bytes):
+        try:
+            r = collection.insert_many(batch, ordered=False)
+            inserted += len(r.inserted_ids)
+        except BulkWriteError as e:
+            i, d, errs = _parse_bulk_error(e)
+            inserted += i
+            duplicated += d
+            errors.extend(errs)
+    if errors and raise_on_failure:
+        raise BulkWriteError({
+            'writeErrors': errors,
+            'nInserted': inserted,
+        })
+    return BulkResult(inserted, duplicated, len(errors))
+
+
+def max_by_code(collection, field, code_field='股票代码', match=None):
+    """单次聚合计算各代码指定字段最大值
+
+    替代逐个代码`$sort/$limit`查询。
+
+    Args:
+        collection (Collection): 集合
+        field (str): 字段名称，通常为日期字段
+        code_field (str, optional): 代码字段. Defaults to '股票代码'.
+        match (dict, optional): 附加过滤条件. Defaults to None.
+
+    Returns:
+        dict: 以代码为键，最大值为值的字典
+    """
+    pipe = [
+        {
+            '$group': {
+                '_id': f'${code_field}',
+                'value': {
+                    '$max': f'${field}'
+                }
+            }
+        },
+    ]
+    if match:
+        pipe.insert(0, {'$match': match})
+    return {
+        doc['_id']: doc['value']
+        for doc in collection.aggregate(pipe, allowDiskUse=True)
+        if doc['_id'] is not None and doc['value'] is not None
+    }
+
+
+def stale_codes(collection,
+                codes,
+                max_age=pd.Timedelta(days=1),
+                field='更新时间',
+                now=None):
+    """需要刷新的代码
+
+    以单次聚合取得各代码最后更新时间，替代逐个代码`find_one`查询。
+    不存在数据或最后更新时间已超过`max_age`的代码需要刷新。
+
+    Args:
+        collection (Collection): 集合
+        codes (iterable): 代码
+        max_age (Timedelta, optional): 最长间隔. Defaults to 1天.
+        field (str, optional): 更新时间字段. Defaults to '更新时间'.
+        now (Timestamp, optional): 当前时间. Defaults to None.
+
+    Returns:
+        set: 需要刷新的代码
+    """
+    now = pd.Timestamp('now') if now is None else pd.Timestamp(now)
+    updated = max_by_code(collection, field)
+    return {
+        code
+        for code in codes
+        if code not in updated or now - pd.Timestamp(updated[code]) >= max_age
+    }
+
+
+def get_watermarks(collection, name):
+    """读取数据水位
+
+    适用于按代码分集合存储的数据库，水位即各代码已存储数据的最后日期。
+
+    Args:
+        collection (Collection): 水位集合
+        name (str): 数据名称（如数据库名称）
+
+    Returns:
+        dict: 以代码为键，最后日期为值的字典
+    """
+    cursor = collection.find({'名称': name}, {'_id': 0, '代码': 1, '日期': 1})
+    return {doc['代码']: doc['日期'] for doc in cursor}
+
+
+def update_watermark(collection, name, code, dt):
+    """更新数据水位，只前移不后退
+
+    Args:
+        collection (Collection): 水位集合
+        name (str): 数据名称
+        code (str): 代码
+        dt (datetime): 最后日期
+    """
+    flt = {'名称': name, '代码': code}
+    update = {'$max': {'日期': pd.Timestamp(dt).to_pydatetime()}}
+    collection.update_one(flt, update, upsert=True)
+
+
+def create_watermark_index(collection):
+    """水位集合索引"""
+    collection.create_index([('名称', 1), ('代码', 1)],
+                            unique=True,
+                            name='watermark_index')
@@ -0,0 +1,579 @@
+"""
+任务账本
+
+多进程（或多台机器）共享的任务进度，保存在`config`数据库`任务账本`集合。
+每个任务一行：
+    {'job': 作业名称, 'key': 任务键, 'payload': 参数,
+     'status': 'pending' | 'running' | 'done' | 'failed',
+     'owner': 执行者, 'attempts': 尝试次数, 'lease_until': 租约到期时间,
+     'not_before': 失败后最早重试时间}
+
+执行者以`find_one_and_update`原子领取任务（或以`claim_batch`成批领取），
+同一任务不会被重复领取；执行者中断后，租约到期的任务可被其他执行者重新领取，从中断处继续。
+协调进程开始运行时以`requeue_running`收回上次中断遗留的执行中任务，不必等待租约到期。
+执行时间较长的任务以`keep_alive`在后台定期续约。
+
+失败任务按`BACKOFF_SECONDS`×2^(尝试次数-1)推迟重试，避免数据源暂时限流时短时间内用尽尝试次数。
+
+按代码逐项抓取的作业（如网易财务报告）以`run_tasks`多进程执行：
+每轮开始时以`renew`重新排队（保留上次成功时间，本轮无需执行的任务登记为已完成），
+中断后再次运行时只执行未完成的任务。
+
+用法：
+    >>> ledger = TaskLedger('cninfo_asr')
+    >>> ledger.add([('基本资料|2019', {'name': '基本资料'})])
+    >>> task = ledger.claim()
+    >>> ledger.complete(task)
+"""
+import os
+import socket
+import threading
+import time
+from contextlib import contextmanager
+from functools import partial
+from multiprocessing import Pool
+
+import pandas as pd
+from bson import ObjectId
+from pymongo import ASCENDING, ReturnDocument, UpdateOne
+
+from ..mongodb import get_db
+
+LEDGER_COLLECTION = '任务账本'
+# 租约时长，单位：秒。执行者应在到期前完成或续约
+LEASE_SECONDS = 3600
+MAX_ATTEMPTS = 3
+# 失败后首次重试等待秒数，此后每次加倍
+BACKOFF_SECONDS = 30
+
+PENDING = 'pending'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+
+def default_owner():
+    """执行者标识：主机名-进程号"""
+    return f'{socket.gethostname()}-{os.getpid()}'
+
+
+def _now():
+    return pd.Timestamp('now').to_pydatetime()
+
+
+class TaskLedger(object):
+    """任务账本
+
+    Args:
+        job (str): 作业名称
+        collection (Collection, optional): 账本集合. Defaults to None，使用`config`数据库`任务账本`.
+        lease_seconds (int, optional): 租约时长. Defaults to 3600.
+        max_attempts (int, optional): 最多尝试次数，超过后标记为失败. Defaults to 3.
+        backoff_seconds (int, optional): 失败后首次重试等待秒数. Defaults to 30.
+    """
+
+    def __init__(self,
+                 job,
+                 collection=None,
+                 lease_seconds=LEASE_SECONDS,
+                 max_attempts=MAX_ATTEMPTS,
+                 backoff_seconds=BACKOFF_SECONDS):
+        if collection is None:
+            collection = get_db('config')[LEDGER_COLLECTION]
+        self.job = job
+        self.collection = collection
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.backoff_seconds = backoff_seconds
+        self.collection.create_index([('job', ASCENDING), ('key', ASCENDING)],
+                                     unique=True,
+                                     name='job_key_index')
+        self.collection.create_index([('job', ASCENDING),
+                                      ('status', ASCENDING)],
+                                     name='job_status_index')
+
+    def _lease_until(self):
+        return _now() + pd.Timedelta(seconds=self.lease_seconds)
+
+    def add(self, tasks, status=PENDING):
+        """登记任务，已存在的任务保持原状态
+
+        Args:
+            tasks (iterable): (任务键, 参数字典)
+            status (str, optional): 新任务状态. Defaults to PENDING.
+
+        Returns:
+            int: 新增任务数量
+        """
+        ops = [
+            UpdateOne({'job': self.job, 'key': key}, {
+                '$setOnInsert': {
+                    'payload': payload,
+                    'status': status,
+                    'owner': None,
+                    'attempts': 0,
+                    'lease_until': None,
+                    'created': _now(),
+                }
+            }, upsert=True) for key, payload in tasks
+        ]
+        if not ops:
+            return 0
+        r = self.collection.bulk_write(ops, ordered=False)
+        return r.upserted_count
+
+    def renew(self, tasks, done=()):
+        """开始新一轮：登记任务，删除不再需要的任务，其余重新排队
+
+        `done`为本轮无需执行的任务（如数据仍在有效期内），登记为已完成。
+        全部任务的上次成功时间（`last_success`）保留。
+
+        Args:
+            tasks (iterable): 需要执行的任务，(任务键, 参数字典)
+            done (iterable, optional): 无需执行的任务，(任务键, 参数字典).
+                Defaults to ().
+
+        Returns:
+            int: 需要执行的任务数量
+        """
+        tasks, done = list(tasks), list(done)
+        keys = [key for key, _ in tasks]
+        done_keys = [key for key, _ in done]
+        self.collection.delete_many({
+            'job': self.job,
+            'key': {
+                '$nin': keys + done_keys
+            }
+        })
+        for status, ks in ((PENDING, keys), (DONE, done_keys)):
+            if not ks:
+                continue
+            self.collection.update_many({
+                'job': self.job,
+                'key': {
+                    '$in': ks
+                }
+            }, {
+                '$set': {
+                    'status': status,
+                    'owner': None,
+                    'attempts': 0,
+                    'lease_until': None,
+                },
+                # 本轮用时只统计本轮执行的任务
+                '$unset': {
+                    'error': '',
+                    'error_type': '',
+                    'not_before': '',
+                    'started': '',
+                    'finished': ''
+                }
+            })
+        self.add(tasks)
+        self.add(done, DONE)
+        return len(keys)
+
+    def _claimable(self, now):
+        return {
+            'job': self.job,
+            '$and': [{
+                '$or': [{
+                    'status': PENDING
+                }, {
+                    'status': RUNNING,
+                    'lease_until': {
+                        '$lt': now
+                    }
+                }]
+            }, {
+                '$or': [{
+                    'not_before': None
+                }, {
+                    'not_before': {
+                        '$lte': now
+                    }
+                }]
+            }]
+        }
+
+    def requeue_running(self):
+        """执行中任务重新排队
+
+        协调进程开始运行时调用（此时不应有其他执行者），收回上次中断遗留的任务，
+        不必等待租约到期。
+
+        Returns:
+            int: 重新排队的任务数量
+        """
+        r = self.collection.update_many({
+            'job': self.job,
+            'status': RUNNING
+        }, {'$set': {
+            'status': PENDING,
+            'owner': None,
+            'lease_until': None
+        }})
+        return r.modified_count
+
+    def next_retry(self):
+        """推迟重试的待执行任务中最早的重试时间
+
+        Returns:
+            datetime: 不存在推迟重试的任务时为None
+        """
+        doc = self.collection.find_one(
+            {
+                'job': self.job,
+                'status': PENDING,
+                'not_before': {
+                    '$ne': None
+                }
+            }, {'not_before': 1},
+            sort=[('not_before', ASCENDING)])
+        return None if doc is None else doc['not_before']
+
+    def wait_retry(self):
+        """等待至最早的推迟重试时间
+
+        Returns:
+            bool: 不存在推迟重试的任务时为False
+        """
+        when = self.next_retry()
+        if when is None:
+            return False
+        time.sleep(max((when - _now()).total_seconds(), 0) + 0.1)
+        return True
+
+    def _claim_update(self, owner, now):
+        return {
+            '$set': {
+                'status': RUNNING,
+                'owner': owner or default_owner(),
+                'lease_until': self._lease_until(),
+                'started': now,
+            },
+            '$inc': {
+                'attempts': 1
+            }
+        }
+
+    def claim(self, owner=None):
+        """领取一个待执行任务（含租约已过期的执行中任务）
+
+        Returns:
+            dict: 任务文档，无可领取任务时为None
+        """
+        now = _now()
+        return self.collection.find_one_and_update(
+            self._claimable(now),
+            self._claim_update(owner, now),
+            sort=[('_id', ASCENDING)],
+            return_document=ReturnDocument.AFTER)
+
+    def claim_batch(self, size, owner=None):
+        """成批领取待执行任务
+
+        Returns:
+            list: 任务文档列表，无可领取任务时为空
+        """
+        while True:
+            now = _now()
+            query = self._claimable(now)
+            ids = [
+                d['_id'] for d in self.collection.find(
+                    query, {'_id': 1}, sort=[('_id', ASCENDING)], limit=size)
+            ]
+            if not ids:
+                return []
+            # 以批次标识取回本次领取的任务。其他执行者同时领取时可能一个也未领到，重试
+            batch = ObjectId()
+            update = self._claim_update(owner, now)
+            update['$set']['batch'] = batch
+            self.collection.update_many(dict(query, _id={'$in': ids}), update)
+            tasks = list(
+                self.collection.find({
+                    'job': self.job,
+                    'batch': batch
+                }))
+            if tasks:
+                return tasks
+
+    def _update(self, task, update):
+        """只更新仍由该执行者持有的任务"""
+        r = self.collection.update_one(
+            {
+                '_id': task['_id'],
+                'owner': task['owner'],
+                'status': RUNNING
+            }, update)
+        return r.modified_count == 1
+
+    def heartbeat(self, task):
+        """续约
+
+        Returns:
+            bool: 任务已被他人接管时为False
+        """
+        return self._update(task, {'$set': {'lease_until': self._lease_until()}})
+
+    @contextmanager
+    def keep_alive(self, task, interval=None):
+        """执行期间在后台线程中定期续约
+
+        Args:
+            task (dict): 任务文档
+            interval (float, optional): 续约间隔秒数. Defaults to None（租约时长的1/3）.
+        """
+        interval = interval or self.lease_seconds / 3
+        stop = threading.Event()
+
+        def beat():
+            while not stop.wait(interval):
+                if not self.heartbeat(task):
+                    break
+
+        t = threading.Thread(target=beat, daemon=True)
+        t.start()
+        try:
+            yield task
+        finally:
+            stop.set()
+            t.join()
+
+    def _complete_update(self, info):
+        now = _now()
+        return {
+            '$set': {
+                'status': DONE,
+                'finished': now,
+                'last_success': now,
+                'result': info
+            }
+        }
+
+    def _fail_update(self, task, error):
+        attempts = task.get('attempts', 1)
+        status = FAILED if attempts >= self.max_attempts else PENDING
+        delay = self.backoff_seconds * 2**(max(attempts, 1) - 1)
+        return {
+            '$set': {
+                'status': status,
+                'error': str(error),
+                'error_type': type(error).__name__,
+                'lease_until': None,
+                'not_before': _now() + pd.Timedelta(seconds=delay)
+            }
+        }
+
+    def complete(self, task, **info):
+        """标记任务完成，`info`保存在任务的`result`字段"""
+        return self._update(task, self._complete_update(info))
+
+    def fail(self, task, error):
+        """任务失败。未超过最多尝试次数时重新排队，推迟至退避时间后才可领取"""
+        return self._update(task, self._fail_update(task, error))
+
+    def finish_batch(self, done, failed):
+        """一次写入一批任务的结果
+
+        Args:
+            done (list): 已完成的任务
+            failed (list): (任务, 异常)
+        """
+        updates = [(task, self._complete_update({})) for task in done]
+        updates += [(task, self._fail_update(task, e)) for task, e in failed]
+        if not updates:
+            return 0
+        ops = [
+            UpdateOne(
+                {
+                    '_id': task['_id'],
+                    'owner': task['owner'],
+                    'status': RUNNING
+                }, update) for task, update in updates
+        ]
+        r = self.collection.bulk_write(ops, ordered=False)
+        return r.modified_count
+
+    def progress(self):
+        """各状态任务数量
+
+        Returns:
+            dict: 状态 -> 数量
+        """
+        pipe = [{
+            '$match': {
+                'job': self.job
+            }
+        }, {
+            '$group': {
+                '_id': '$status',
+                'count': {
+                    '$sum': 1
+                }
+            }
+        }]
+        res = {s: 0 for s in (PENDING, RUNNING, DONE, FAILED)}
+        res.update({d['_id']: d['count'] for d in self.collection.aggregate(pipe)})
+        return res
+
+    def report(self):
+        """本轮执行情况
+
+        Returns:
+            dict: 各状态数量、用时（秒）、每秒完成任务数及失败任务按异常类型计数
+        """
+        res = {'progress': self.progress(), 'elapsed': 0, 'throughput': 0}
+        # 本轮登记为已完成的任务没有执行时间，不计入
+        pipe = [{
+            '$match': {
+                'job': self.job,
+                'status': DONE,
+                'finished': {
+                    '$exists': True
+                }
+            }
+        }, {
+            '$group': {
+                '_id': None,
+                'start': {
+                    '$min': '$started'
+                },
+                'end': {
+                    '$max': '$finished'
+                },
+                'count': {
+                    '$sum': 1
+                }
+            }
+        }]
+        for d in self.collection.aggregate(pipe):
+            if d['start'] is None:
+                continue
+            elapsed = (d['end'] - d['start']).total_seconds()
+            res['elapsed'] = elapsed
+            res['throughput'] = d['count'] / elapsed if elapsed > 0 else 0
+        pipe = [{
+            '$match': {
+                'job': self.job,
+                'status': FAILED
+            }
+        }, {
+            '$group': {
+                '_id': '$error_type',
+                'count': {
+                    '$sum': 1
+                }
+            }
+        }]
+        res['failures'] = {
+            d['_id']: d['count']
+            for d in self.collection.aggregate(pipe)
+        }
+        return res
+
+    def unfinished(self):
+        """尚未完成（待执行或执行中）的任务数量"""
+        return self.collection.count_documents({
+            'job': self.job,
+            'status': {
+                '$in': [PENDING, RUNNING]
+            }
+        })
+
+    def retry_failed(self):
+        """失败任务重新排队"""
+        r = self.collection.update_many({
+            'job': self.job,
+            'status': FAILED
+        }, {
+            '$set': {
+                'status': PENDING,
+                'attempts': 0
+            },
+            '$unset': {
+                'not_before': ''
+            }
+        })
+        return r.modified_count
+
+    def clear(self):
+        """删除作业全部任务"""
+        return self.collection.delete_many({'job': self.job}).deleted_count
+
+
+def _task_worker(job, func, batch_size, _=None):
+    """成批领取任务直至全部完成，`func`以任务参数调用
+
+    无可领取任务但存在推迟重试的任务时，等待至重试时间。
+    """
+    ledger = TaskLedger(job)
+    owner = default_owner()
+    count = 0
+    while True:
+        tasks = ledger.claim_batch(batch_size, owner)
+        if not tasks:
+            if ledger.wait_retry():
+                continue
+            break
+        done, failed = [], []
+        for task in tasks:
+            try:
+                func(**task['payload'])
+            except Exception as e:
+                failed.append((task, e))
+            else:
+                done.append(task)
+        ledger.finish_batch(done, failed)
+        count += len(done)
+    return count
+
+
+def run_tasks(job,
+              tasks,
+              func,
+              workers=1,
+              batch_size=50,
+              logger=None,
+              done=()):
+    """多进程执行作业
+
+    上次运行中断（存在未完成任务）时收回遗留的执行中任务并继续执行，否则以`tasks`开始新一轮。
+    `func`以任务参数（关键字）调用，抛出异常视为失败，失败任务重试至最多尝试次数。
+
+    Args:
+        job (str): 作业名称
+        tasks (iterable): (任务键, 参数字典)
+        func (callable): 可序列化的函数
+        workers (int, optional): 进程数. Defaults to 1.
+        batch_size (int, optional): 每次领取的任务数. Defaults to 50.
+        logger (Logger, optional): 日志. Defaults to None.
+        done (iterable, optional): 本轮无需执行的任务，登记为已完成（见`TaskLedger.renew`）.
+            Defaults to ().
+
+    Returns:
+        dict: 执行情况（见`TaskLedger.report`）
+    """
+    ledger = TaskLedger(job)
+    if ledger.unfinished():
+        ledger.requeue_running()
+        if logger:
+            logger.info(f"继续未完成的任务：{ledger.progress()}")
+    else:
+        num = ledger.renew(tasks, done)
+        if logger:
+            logger.info(f"登记任务{num}个")
+    t = time.time()
+    worker = partial(_task_worker, job, func, batch_size)
+    if workers <= 1:
+        worker()
+    else:
+        with Pool(workers) as pool:
+            pool.map(worker, range(workers))
+    res = ledger.report()
+    if logger:
+        logger.info(f"完成：{res['progress']}，用时{time.time() - t:.2f}秒，"
+                    f"每秒{res['throughput']:.2f}个任务")
+        if res['failures']:
+            logger.warning(f"失败任务：{res['failures']}")
+    return res
@@ -1,22 +1,304 @@
+"""
+日志
+
+`make_logger`返回的日志同时输出到控制台及mongodb`eventlog`数据库。
+
+写入mongodb不阻塞调用线程：记录先放入进程内队列，由后台线程（`QueueListener`）
+批量以`insert_many`写入，达到`LOG_BATCH_SIZE`条或间隔`LOG_FLUSH_INTERVAL`秒写入一次。
+队列及后台线程按进程创建，子进程首次写入时重新创建；进程退出前写入剩余记录。
+
+按股票输出的重复消息（数字不同、其余相同）每`LOG_RATE_PERIOD`秒最多写入
+`LOG_RATE_LIMIT`条，其余计数后附在下一条写入的消息后。警告及以上级别不受限制。
+"""
+import atexit
+import datetime as dt
 import logging
-from log4mongo.handlers import MongoHandler
-from ..setting.constants import DB_HOST
+import os
+import queue
+import re
+import threading
+import time
+from logging.handlers import QueueHandler, QueueListener
+
+from ..setting.config import (LOG_BATCH_SIZE, LOG_FLUSH_INTERVAL,
+                              LOG_RATE_LIMIT, LOG_RATE_PERIOD)
+
+LOG_DB = 'eventlog'
+# 固定集合，最多保留的记录数及字节数
+CAPPED_MAX = 10000
+CAPPED_SIZE = 1000000
+
+_DIGITS = re.compile(r'\d+')
+
+_lock = threading.Lock()
+_loggers = {}
+_handlers = {}
+_listener = None
+_listener_pid = None
+
+
+def to_document(record):
+    """日志记录转换为文档（与`log4mongo`格式一致，时间为记录产生时间）"""
+    doc = {
+        'timestamp': dt.datetime.fromtimestamp(
+            record.created, dt.timezone.utc).replace(tzinfo=None),
+        'level': record.levelname,
+        'thread': record.thread,
+        'threadName': record.threadName,
+        'message': record.getMessage(),
+        'loggerName': record.name,
+        'fileName': record.pathname,
+        'module': record.module,
+        'method': record.funcName,
+        'lineNumber': record.lineno,
+    }
+    if record.exc_info:
+        doc['exception'] = {
+            'message': str(record.exc_info[1]),
+            'code': 0,
+            'stackTrace': logging.Formatter().formatException(record.exc_info)
+        }
+    return doc
+
+
+class RateLimitFilter(logging.Filter):
+    """限制重复消息
+
+    消息中的数字替换为`#`后作为模板，同一日志同一模板每`period`秒最多通过`limit`条。
+
+    Args:
+        limit (int, optional): 每期最多通过的数量. Defaults to LOG_RATE_LIMIT.
+        period (int, optional): 期间秒数. Defaults to LOG_RATE_PERIOD.
+        max_level (int, optional): 达到该级别的消息不受限制. Defaults to logging.WARNING.
+    """
+
+    def __init__(self,
+                 limit=LOG_RATE_LIMIT,
+                 period=LOG_RATE_PERIOD,
+                 max_level=logging.WARNING):
+        super().__init__()
+        self.limit = limit
+        self.period = period
+        self.max_level = max_level
+        # 模板 -> [期间开始时间, 已通过数量, 已忽略数量]
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        if record.levelno >= self.max_level:
+            return True
+        key = (record.name, _DIGITS.sub('#', str(record.msg)))
+        now = time.monotonic()
+        with self._lock:
+            state = self._counts.get(key)
+            if state is None or now - state[0] >= self.period:
+                suppressed = state[2] if state else 0
+                self._counts[key] = [now, 1, 0]
+            elif state[1] < self.limit:
+                state[1] += 1
+                suppressed = 0
+            else:
+                state[2] += 1
+                return False
+        record.suppressed = suppressed
+        return True
+
+
+class MongoBatchHandler(logging.Handler):
+    """批量写入mongodb（由`QueueListener`线程调用）
+
+    Args:
+        collection (str): 集合名称
+        batch_size (int, optional): 缓存记录达到该数量时写入. Defaults to LOG_BATCH_SIZE.
+        db_name (str, optional): 数据库. Defaults to 'eventlog'.
+    """
+
+    def __init__(self,
+                 collection,
+                 batch_size=LOG_BATCH_SIZE,
+                 db_name=LOG_DB,
+                 level=logging.NOTSET):
+        super().__init__(level)
+        self.collection = collection
+        self.batch_size = batch_size
+        self.db_name = db_name
+        self._buffer = []
+        self._collection = None
+
+    def _get_collection(self):
+        if self._collection is None:
+            from pymongo.errors import CollectionInvalid
+            from ..mongodb import get_db
+            db = get_db(self.db_name)
+            try:
+                db.create_collection(self.collection,
+                                     capped=True,
+                                     size=CAPPED_SIZE,
+                                     max=CAPPED_MAX)
+            except CollectionInvalid:
+                # 已存在
+                pass
+            self._collection = db[self.collection]
+        return self._collection
+
+    def emit(self, record):
+        self._buffer.append(to_document(record))
+        if len(self._buffer) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self._buffer:
+            return
+        docs, self._buffer = self._buffer, []
+        try:
+            self._get_collection().insert_many(docs, ordered=False)
+        except Exception as e:
+            # 不因写入日志失败中断任务，丢弃本批记录
+            logging.lastResort.handle(
+                logging.makeLogRecord({
+                    'msg': f'写入日志失败，丢弃{len(docs)}条记录：{e!r}',
+                    'levelno': logging.WARNING,
+                    'levelname': 'WARNING',
+                }))
+
+
+class _BatchQueueListener(QueueListener):
+    """队列空闲`flush_interval`秒后写入缓存记录"""
+
+    def __init__(self, queue, flush_interval=LOG_FLUSH_INTERVAL):
+        super().__init__(queue)
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._last_flush = time.monotonic()
+
+    def add_handler(self, handler):
+        with self._lock:
+            self.handlers = self.handlers + (handler, )
+
+    def flush(self):
+        for handler in self.handlers:
+            handler.flush()
+        self._last_flush = time.monotonic()
+
+    def dequeue(self, block):
+        while True:
+            if time.monotonic() - self._last_flush >= self.flush_interval:
+                self.flush()
+            try:
+                return self.queue.get(block, timeout=self.flush_interval)
+            except queue.Empty:
+                if not block:
+                    raise
+                self.flush()
+
+    def handle(self, record):
+        # 按日志集合分发
+        for handler in self.handlers:
+            if handler.collection == record.collection:
+                handler.handle(record)
+
+    def stop(self):
+        super().stop()
+        self.flush()
+
+
+def _get_listener():
+    """当前进程的队列及后台写入线程"""
+    global _listener, _listener_pid
+    pid = os.getpid()
+    with _lock:
+        if _listener is None or _listener_pid != pid:
+            # 子进程中父进程的写入线程不存在，重新创建
+            _handlers.clear()
+            _listener = _BatchQueueListener(queue.SimpleQueue())
+            _listener_pid = pid
+            _listener.start()
+        return _listener
+
+
+def _get_handler(collection):
+    listener = _get_listener()
+    with _lock:
+        if collection not in _handlers:
+            _handlers[collection] = MongoBatchHandler(collection)
+            listener.add_handler(_handlers[collection])
+    return listener
+
+
+class MongoQueueHandler(QueueHandler):
+    """记录放入当前进程的日志队列，不等待写入数据库"""
+
+    def __init__(self, collection, level=logging.NOTSET):
+        # 队列在首次写入时按进程获取
+        super().__init__(None)
+        self.setLevel(level)
+        self.collection = collection
+
+    def prepare(self, record):
+        # 保留异常信息，由写入线程格式化
+        record = logging.makeLogRecord(record.__dict__)
+        record.msg = record.getMessage()
+        if getattr(record, 'suppressed', 0):
+            record.msg += f'（已忽略{record.suppressed}条相似消息）'
+        record.args = None
+        record.collection = self.collection
+        return record
+
+    def enqueue(self, record):
+        _get_handler(self.collection).queue.put_nowait(record)
+
+
+def flush_logs():
+    """停止当前进程写入线程，写入全部缓存记录"""
+    global _listener
+    with _lock:
+        listener, pid = _listener, _listener_pid
+        _listener = None
+    if listener is not None and pid == os.getpid():
+        listener.stop()
+
+
+def _reset_after_fork():
+    # 子进程不得使用父进程的锁及写入线程
+    global _lock, _listener, _listener_pid
+    _lock = threading.Lock()
+    _listener = None
+    _listener_pid = None
+    _handlers.clear()
+
+
+atexit.register(flush_logs)
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
 
 
 def make_logger(name, collection='cnswd', level=logging.NOTSET):
-    formatter = logging.Formatter(
-        '%(asctime)s %(levelname)s %(name)s %(message)s')
-    logger = logging.Logger(name)
-    logger.addHandler(
-        MongoHandler(level=level,
-                     host=DB_HOST,
-                     database_name='eventlog',
-                     collection=collection if collection else name,
-                     fail_silently=False,
-                     capped_max=10000,
-                     capped=True))
-    ch = logging.StreamHandler()
-    ch.setLevel(level)
-    ch.setFormatter(formatter)
-    logger.addHandler(ch)
-    return logger
+    """日志（同名同集合的日志只创建一次）
+
+    Args:
+        name (str): 日志名称
+        collection (str, optional): `eventlog`数据库集合. Defaults to 'cnswd'，
+            为空时使用日志名称.
+        level (int, optional): 级别. Defaults to logging.NOTSET.
+
+    Returns:
+        Logger: 日志
+    """
+    collection = collection if collection else name
+    key = (name, collection)
+    with _lock:
+        logger = _loggers.get(key)
+        if logger is not None:
+            return logger
+        formatter = logging.Formatter(
+            '%(asctime)s %(levelname)s %(name)s %(message)s')
+        logger = logging.Logger(name)
+        mh = MongoQueueHandler(collection, level)
+        mh.addFilter(RateLimitFilter())
+        logger.addHandler(mh)
+        ch = logging.StreamHandler()
+        ch.setLevel(level)
+        ch.setFormatter(formatter)
+        logger.addHandler(ch)
+        _loggers[key] = logger
+        return logger
@@ -5,10 +5,6 @@ from io import StringIO
 from urllib.parse import urlparse
 
 import pandas as pd
-from pdfminer.converter import TextConverter
-from pdfminer.layout import LAParams
-from pdfminer.pdfinterp import PDFPageInterpreter, PDFResourceManager
-from pdfminer.pdfpage import PDFPage
 
 
 def ensure_list(x):
@@ -98,6 +94,11 @@ def is_connectivity(server):
 
 def get_pdf_text(fname, pages=None):
     """读取pdf文件内容"""
+    from pdfminer.converter import TextConverter
+    from pdfminer.layout import LAParams
+    from pdfminer.pdfinterp import PDFPageInterpreter, PDFResourceManager
+    from pdfminer.pdfpage import PDFPage
+
     if not pages:
         pagenums = set()
     else:
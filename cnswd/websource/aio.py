@@ -0,0 +1,202 @@
+"""
+异步下载引擎
+
+适用于同一主机大量小文件（如逐个股票的日线CSV）的下载：
+    1. 按主机限制并发连接数
+    2. 按主机令牌桶限速，避免被服务器拒绝
+    3. 逐项记录尝试次数，只重试失败项目
+    4. 在进程池中解析数据，不阻塞事件循环
+    5. 可逐项回调处理结果（如写入数据库），不在内存中保留全部结果
+
+用法：
+    >>> fetcher = AsyncFetcher(parser=parse_history)
+    >>> results, failed = fetcher.run({'000001': url1, '000002': url2})
+    >>> results, failed = fetcher.run(urls, on_result=save)
+"""
+import asyncio
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import aiohttp
+from logbook import Logger
+
+from ..setting.config import (ASYNC_CONCURRENCY, ASYNC_HOST_LIMITS,
+                              ASYNC_PARSE_WORKERS, ASYNC_RATE, HTTP_MAX_TRIES)
+from ..utils.tools import get_server_name
+from .base import backoff_time, get_timeout
+
+logger = Logger('异步下载')
+
+
+class TokenBucket(object):
+    """令牌桶
+
+    以固定速率补充令牌，每次请求消耗一个令牌，允许`capacity`次突发请求。
+    """
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or rate
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity,
+                          self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self):
+        """取得一个令牌，不足时等待"""
+        async with self._lock:
+            self._refill()
+            while self.tokens < 1:
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+                self._refill()
+            self.tokens -= 1
+
+
+class FetchState(object):
+    """单个项目下载状态"""
+    __slots__ = ('key', 'url', 'attempts', 'error')
+
+    def __init__(self, key, url):
+        self.key = key
+        self.url = url
+        self.attempts = 0
+        self.error = None
+
+
+def fetch_states(errors):
+    """以(项目标识 -> 异常)构造失败项目字典，与`AsyncFetcher.run`返回的失败项目一致"""
+    res = {}
+    for key, error in errors.items():
+        state = FetchState(key, None)
+        state.error = error
+        res[key] = state
+    return res
+
+
+class AsyncFetcher(object):
+    """异步下载器
+
+    Args:
+        parser (callable, optional): 解析函数，接收响应内容（bytes）。
+            使用进程池时必须为模块级函数. Defaults to None（返回原始内容）.
+        max_tries (int, optional): 每个项目最多尝试次数. Defaults to HTTP_MAX_TRIES.
+        parse_workers (int, optional): 解析进程数，0表示在事件循环中直接解析.
+            Defaults to ASYNC_PARSE_WORKERS.
+    """
+
+    def __init__(self,
+                 parser=None,
+                 max_tries=HTTP_MAX_TRIES,
+                 parse_workers=ASYNC_PARSE_WORKERS):
+        self.parser = parser
+        self.max_tries = max_tries
+        self.parse_workers = parse_workers
+        self._limits = {}
+        self._executor = None
+        self._callback_executor = None
+
+    def _host_limit(self, host):
+        """主机信号量及令牌桶"""
+        limit = self._limits.get(host)
+        if limit is None:
+            concurrency, rate = ASYNC_HOST_LIMITS.get(
+                host, (ASYNC_CONCURRENCY, ASYNC_RATE))
+            limit = (asyncio.Semaphore(concurrency), TokenBucket(rate))
+            self._limits[host] = limit
+        return limit
+
+    async def _parse(self, content):
+        if self.parser is None:
+            return content
+        if self._executor is None:
+            return self.parser(content)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self.parser,
+                                          content)
+
+    async def _download(self, session, url):
+        host = get_server_name(url)
+        sem, bucket = self._host_limit(host)
+        connect, read = get_timeout(url)
+        timeout = aiohttp.ClientTimeout(sock_connect=connect, sock_read=read)
+        await bucket.acquire()
+        async with sem:
+            async with session.get(url, timeout=timeout) as r:
+                r.raise_for_status()
+                return await r.read()
+
+    async def _fetch(self, session, state, on_result=None):
+        while state.attempts < self.max_tries:
+            state.attempts += 1
+            try:
+                content = await self._download(session, state.url)
+                res = await self._parse(content)
+            except Exception as e:
+                state.error = e
+                logger.info('{} 第{}次尝试失败 {!r}'.format(
+                    state.key, state.attempts, e))
+                await asyncio.sleep(backoff_time(state.attempts - 1))
+            else:
+                break
+        else:
+            raise state.error
+        if on_result is None:
+            return res
+        try:
+            # 在单独线程中依次执行（如写入数据库），不阻塞事件循环中的下载
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._callback_executor,
+                                              on_result, state.key, res)
+        except Exception as e:
+            # 处理失败的项目视同下载失败，可重试
+            state.error = e
+            raise
+
+    async def _run(self, states, on_result=None):
+        results, failed = {}, {}
+        async with aiohttp.ClientSession() as session:
+            tasks = [
+                self._fetch(session, state, on_result) for state in states
+            ]
+            data = await asyncio.gather(*tasks, return_exceptions=True)
+        for state, res in zip(states, data):
+            if isinstance(res, BaseException):
+                failed[state.key] = state
+            else:
+                results[state.key] = res
+        return results, failed
+
+    def run(self, urls, on_result=None):
+        """下载全部网址
+
+        Args:
+            urls (dict): 键为项目标识（如股票代码），值为网址
+            on_result (callable, optional): 以(项目标识, 解析结果)逐项调用（在同一后台线程中
+                依次执行），结果字典保存其返回值，引发异常的项目计入失败项目.
+                Defaults to None.
+
+        Returns:
+            tuple: (结果字典, 失败项目字典)，失败项目值为`FetchState`
+        """
+        states = [FetchState(key, url) for key, url in urls.items()]
+        if not states:
+            return {}, {}
+        self._limits = {}
+        if self.parser is not None and self.parse_workers > 0:
+            self._executor = ProcessPoolExecutor(self.parse_workers)
+        if on_result is not None:
+            self._callback_executor = ThreadPoolExecutor(1)
+        try:
+            return asyncio.run(self._run(states, on_result))
+        finally:
+            if self._executor is not None:
+                self._executor.shutdown()
+                self._executor = None
+            if self._callback_executor is not None:
+                self._callback_executor.shutdown()
+                self._callback_executor = None
@@ -1,15 +1,26 @@
-import requests
+import os
+import random
 import time
 from functools import wraps
+from io import BytesIO
+
 import numpy as np
+import pandas as pd
+import requests
 from logbook import Logger
+from requests.adapters import HTTPAdapter
 
 from .._exceptions import ConnectFailed
+from ..setting.config import (HTTP_BACKOFF, HTTP_HOST_TIMEOUTS,
+                              HTTP_MAX_BACKOFF, HTTP_MAX_TRIES,
+                              HTTP_POOL_SIZE, HTTP_TIMEOUT)
 from ..utils.tools import get_server_name
 
 # 可能会遇到服务器定期重启，导致网络中断。休眠时长应大于重启完成时间
 MAX_SLEEP = 2
 logger = Logger('休眠')
+# 键：(进程号, 主机)
+_SESSIONS = {}
 
 
 class DownloadRecord(object):
@@ -64,43 +75,137 @@ def friendly_download(times=20, duration=None, max_sleep=1, show=False):
 	return decorator
 
 
-def _get(url, params, timeout):
-    """超时不能设置太短，否则经常出错"""
-    for i in range(3):
-        try:
-            r = requests.get(url, params=params, timeout=timeout)
-            if r.status_code == 200:
-                return r
-        except requests.exceptions.ConnectionError:
-            logger.info('第{}次尝试。无法连接服务器：{}'.format(
-            	i + 1, get_server_name(url)))
-            time.sleep(MAX_SLEEP)
-            continue
-        except Exception as e:
-            logger.info('第{}次尝试。错误：{}'.format(i + 1, e.args))
-        time.sleep(0.1)
-    raise ConnectFailed('三次尝试失败。服务器：{}'.format(get_server_name(url)))
+def _make_session():
+    """创建带连接池的会话"""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1,
+                          pool_maxsize=HTTP_POOL_SIZE,
+                          pool_block=False)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+def get_session(url):
+    """进程内按主机共享的会话
+
+    会话保持长连接，同一主机的请求复用连接池，避免每次请求重新建立连接。
+    子进程不继承父进程会话，以进程号区分。
+    """
+    key = (os.getpid(), get_server_name(url))
+    session = _SESSIONS.get(key)
+    if session is None:
+        session = _make_session()
+        _SESSIONS[key] = session
+    return session
+
+
+def close_sessions():
+    """关闭当前进程的全部会话"""
+    pid = os.getpid()
+    for key in [k for k in _SESSIONS.keys() if k[0] == pid]:
+        _SESSIONS.pop(key).close()
+
+
+def get_timeout(url):
+    """主机超时设置（连接, 读取）"""
+    return HTTP_HOST_TIMEOUTS.get(get_server_name(url), HTTP_TIMEOUT)
 
 
-def _post(url, params, timeout):
-    for i in range(3):
+def backoff_time(i):
+    """第`i`次失败后的休眠时长（指数退避加随机抖动）"""
+    t = min(HTTP_MAX_BACKOFF, HTTP_BACKOFF * 2 ** i)
+    return random.uniform(t / 2, t)
+
+
+def _retryable(status_code):
+    """服务器错误及限流（429）可以重试，其他客户端错误（如404）重试无益"""
+    return status_code >= 500 or status_code == 429
+
+
+def _request(method, url, params, timeout, data=None, headers=None):
+    """超时不能设置太短，否则经常出错
+
+    只重试服务器错误、限流及网络错误，其他4xx状态码立即以`ConnectFailed`失败。
+    """
+    session = get_session(url)
+    for i in range(HTTP_MAX_TRIES):
         try:
-            r = requests.post(url, params=params, timeout=timeout)
-            if r.status_code == 200:
-                return r
+            r = session.request(method,
+                                url,
+                                params=params,
+                                data=data,
+                                headers=headers,
+                                timeout=timeout)
         except requests.exceptions.ConnectionError:
             logger.info('第{}次尝试。无法连接服务器：{}'.format(
-            	i + 1, get_server_name(url)))
-            time.sleep(MAX_SLEEP)
+                i + 1, get_server_name(url)))
+            time.sleep(MAX_SLEEP + backoff_time(i))
             continue
-        except Exception as e:
+        except (requests.exceptions.Timeout,
+                requests.exceptions.ChunkedEncodingError) as e:
             logger.info('第{}次尝试。错误：{}'.format(i + 1, e.args))
-        time.sleep(0.1)
-    raise ConnectFailed('三次尝试均失败。服务器：{}'.format(get_server_name(url)))
-
-
-def get_page_response(url, method='get', params=None, timeout=(6, 3)):
+        else:
+            if r.status_code == 200:
+                return r
+            if not _retryable(r.status_code):
+                raise ConnectFailed('服务器：{} 状态码：{}'.format(
+                    get_server_name(url), r.status_code))
+            logger.info('第{}次尝试。服务器：{} 状态码：{}'.format(
+                i + 1, get_server_name(url), r.status_code))
+        time.sleep(backoff_time(i))
+    raise ConnectFailed('{}次尝试均失败。服务器：{}'.format(
+        HTTP_MAX_TRIES, get_server_name(url)))
+
+
+def _get(url, params, timeout, **kwds):
+    return _request('GET', url, params, timeout, **kwds)
+
+
+def _post(url, params, timeout, **kwds):
+    return _request('POST', url, params, timeout, **kwds)
+
+
+def get_page_response(url,
+                      method='get',
+                      params=None,
+                      timeout=None,
+                      data=None,
+                      headers=None):
+    """网页响应
+
+    Args:
+        url (str): 网址
+        method (str, optional): 请求方法. Defaults to 'get'.
+        params (dict, optional): 请求参数. Defaults to None.
+        timeout (tuple, optional): 超时（连接, 读取）. Defaults to None，使用主机设置.
+        data (dict, optional): 表单数据. Defaults to None.
+        headers (dict, optional): 附加请求头. Defaults to None.
+
+    Returns:
+        Response: 状态码为200的响应
+    """
+    if timeout is None:
+        timeout = get_timeout(url)
     if method == 'get':
-        return _get(url, params, timeout)
+        return _get(url, params, timeout, data=data, headers=headers)
     else:
-        return _post(url, params, timeout)
+        return _post(url, params, timeout, data=data, headers=headers)
+
+
+def read_csv(url, method='get', params=None, **kwds):
+    """经由共享会话读取网页csv数据"""
+    r = get_page_response(url, method, params)
+    return pd.read_csv(BytesIO(r.content), **kwds)
+
+
+def read_html(url, method='get', params=None, **kwds):
+    """经由共享会话读取网页表格"""
+    r = get_page_response(url, method, params)
+    return pd.read_html(BytesIO(r.content), **kwds)
+
+
+def read_excel(url, method='get', params=None, **kwds):
+    """经由共享会话读取网页excel数据"""
+    r = get_page_response(url, method, params)
+    return pd.read_excel(BytesIO(r.content), **kwds)
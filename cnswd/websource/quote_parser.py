@@ -0,0 +1,112 @@
+"""
+新浪实时报价解析
+
+报价格式（每只股票一行）：
+    var hq_str_sz000001="平安银行,11.040,11.050,...,2020-07-24,15:00:03,00";
+
+字段顺序固定（见`QUOTE_COLS`）：简称、29个数值字段、日期、时间。
+一次遍历切分全部行，数值字段汇总后整体转换为NumPy数组，避免逐列转换字符串。
+"""
+import warnings
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+from ..setting.constants import QUOTE_COLS
+
+# 简称之后、日期之前的数值字段
+NUM_COLS = QUOTE_COLS[2:31]
+N_NUMS = len(NUM_COLS)
+# 数量字段，转换为整数
+INT_COLS = tuple(c for c in NUM_COLS if c.endswith('量'))
+_INT_LOC = [NUM_COLS.index(c) for c in INT_COLS]
+_PREFIX = 'hq_str_'
+
+ParsedQuotes = namedtuple('ParsedQuotes', 'codes, names, values, dates, times')
+
+
+def _to_float(flat):
+    """字符串列表整体转换为浮点数组"""
+    with warnings.catch_warnings():
+        # 无法完整解析时，新版本抛出异常，旧版本仅发出警告
+        warnings.simplefilter('error', DeprecationWarning)
+        try:
+            values = np.fromstring(','.join(flat), dtype=np.float64, sep=',')
+        except (ValueError, DeprecationWarning):
+            values = None
+    if values is None or len(values) != len(flat):
+        # 存在空白或非数值字符串
+        values = pd.to_numeric(pd.Series(flat),
+                               errors='coerce').to_numpy(np.float64)
+    return values
+
+
+def parse_quotes(content):
+    """解析报价文本
+
+    无数据（停牌、代码无效）的行被忽略。
+
+    Args:
+        content (str): 报价文本
+
+    Returns:
+        ParsedQuotes: 代码、简称、数值（二维float64数组）、日期及时间数组
+    """
+    n = content.count(_PREFIX)
+    codes = np.empty(n, dtype=object)
+    names = np.empty(n, dtype=object)
+    dates = np.empty(n, dtype=object)
+    times = np.empty(n, dtype=object)
+    flat = []
+    i = 0
+    for line in content.split(';'):
+        p = line.find(_PREFIX)
+        if p < 0:
+            continue
+        q = line.find('"', p)
+        fields = line[q + 1:line.rfind('"')].split(',')
+        if len(fields) < N_NUMS + 3:
+            continue
+        # 去掉市场前缀 sh、sz
+        codes[i] = line[p + len(_PREFIX) + 2:q - 1]
+        names[i] = fields[0]
+        dates[i] = fields[N_NUMS + 1]
+        times[i] = fields[N_NUMS + 2]
+        flat.extend(fields[1:N_NUMS + 1])
+        i += 1
+    values = _to_float(flat).reshape(i, N_NUMS)
+    return ParsedQuotes(codes[:i], names[:i], values, dates[:i], times[:i])
+
+
+def _to_datetime(dates, times):
+    stamps = np.char.add(np.char.add(dates.astype(str), 'T'),
+                         times.astype(str))
+    try:
+        return stamps.astype('datetime64[s]').astype('datetime64[ns]')
+    except ValueError:
+        return pd.to_datetime(pd.Series(stamps), errors='coerce').to_numpy()
+
+
+def quotes_to_frame(parsed, combine_time=False):
+    """转换为DataFrame
+
+    Args:
+        parsed (ParsedQuotes): 解析结果
+        combine_time (bool, optional): 是否合并日期及时间为`时间`列. Defaults to False.
+
+    Returns:
+        DataFrame: 列为`QUOTE_COLS`，合并时无`日期`列
+    """
+    data = {'股票代码': parsed.codes, '股票简称': parsed.names}
+    for j, col in enumerate(NUM_COLS):
+        data[col] = parsed.values[:, j]
+    for j in _INT_LOC:
+        col = NUM_COLS[j]
+        data[col] = np.nan_to_num(data[col]).astype(np.int64)
+    if combine_time:
+        data['时间'] = _to_datetime(parsed.dates, parsed.times)
+    else:
+        data['日期'] = parsed.dates
+        data['时间'] = parsed.times
+    return pd.DataFrame(data)
@@ -12,19 +12,18 @@ from __future__ import print_function
 
 import re
 from datetime import date
-from urllib.error import HTTPError
+from io import StringIO
 
 import pandas as pd
-import requests
 from bs4 import BeautifulSoup
 import logbook
 from toolz.itertoolz import partition_all
 
-from ..setting.constants import QUOTE_COLS
 from cnswd.utils import ensure_list
 # from cnswd.data_proxy import DataProxy
-from cnswd.websource.base import friendly_download, get_page_response
+from cnswd.websource.base import friendly_download, get_page_response, read_html
 from .._exceptions import NoWebData, FrequentAccess
+from .quote_parser import parse_quotes, quotes_to_frame
 
 QUOTE_PATTERN = re.compile('"(.*)"')
 NEWS_PATTERN = re.compile(r'\W+')
@@ -48,7 +47,7 @@ def fetch_company_info(stock_code):
     """获取公司基础信息"""
     url_fmt = 'http://vip.stock.finance.sina.com.cn/corp/go.php/vCI_CorpInfo/stockid/{}.phtml'
     url = url_fmt.format(stock_code)
-    df = pd.read_html(url, attrs={'id': 'comInfo1'})[0]
+    df = read_html(url, attrs={'id': 'comInfo1'})[0]
     return df
 
 
@@ -56,7 +55,7 @@ def fetch_issue_new_stock_info(stock_code):
     """获取发行新股信息"""
     url_fmt = 'http://vip.stock.finance.sina.com.cn/corp/go.php/vISSUE_NewStock/stockid/{}.phtml'
     url = url_fmt.format(stock_code)
-    df = pd.read_html(url, attrs={'id': 'comInfo1'})[0]
+    df = read_html(url, attrs={'id': 'comInfo1'})[0]
     return df
 
 
@@ -68,17 +67,6 @@ def _add_prefix(stock_code):
         return 'sz{}'.format(stock_code)
 
 
-def _to_dataframe(content, p_codes):
-    """解析网页数据，返回DataFrame对象"""
-    res = [x.split(',') for x in re.findall(QUOTE_PATTERN, content)]
-    df = pd.DataFrame(res).iloc[:, :32]
-    df.columns = QUOTE_COLS[1:]
-    df.insert(0, '股票代码', p_codes)
-    # df['股票代码'] = p_codes
-    df.dropna(inplace=True)
-    return df
-
-
 def fetch_quotes(stock_codes):
     """
     获取股票列表的分时报价
@@ -111,7 +99,7 @@ def fetch_quotes(stock_codes):
         # p_codes = stock_codes[i * length:(i + 1) * length]
         url = url_fmt.format(','.join(map(_add_prefix, p_codes)))
         content = get_page_response(url).text
-        dfs.append(_to_dataframe(content, p_codes))
+        dfs.append(quotes_to_frame(parse_quotes(content)))
     return pd.concat(dfs).sort_values('股票代码')
 
 
@@ -174,7 +162,7 @@ def fetch_index_quotes(codes):
 def fetch_globalnews():
     """获取24*7全球财经新闻"""
     url = 'http://live.sina.com.cn/zt/f/v/finance/globalnews1'
-    response = requests.get(url)
+    response = get_page_response(url)
     today = date.today()
     soup = BeautifulSoup(response.content, "lxml")
 
@@ -232,9 +220,10 @@ def fetch_cjmx(stock_code, date_):
     # 单日交易数据不可能超过1000页
     for i in range(1, 1000):
         params['page'] = i
-        r = requests.get(url, params=params)
+        r = get_page_response(url, params=params)
         r.encoding = 'gb18030'
-        df = pd.read_html(r.text, attrs={'id': 'datatbl'}, na_values=['--'])[0]
+        df = pd.read_html(StringIO(r.text), attrs={'id': 'datatbl'},
+                          na_values=['--'])[0]
         if '没有交易数据' in df.iat[0, 0]:
             df = pd.DataFrame()
             break
@@ -252,7 +241,7 @@ def _common_fun(url, pages, header=0, verbose=False):
     dfs = []
 
     def sina_read_fun(x):
-        return pd.read_html(
+        return read_html(
             x,
             header=header,
             na_values=['--'],
@@ -284,7 +273,7 @@ def fetch_rating(page=1):
     res ： pd.DataFrame
     """
     url = DATA_BASE_URL + f'vIR_RatingNewest/index.phtml?p={page}'
-    df = pd.read_html(
+    df = read_html(
         url,
         header=0,
         na_values=['--'],
@@ -527,8 +516,8 @@ def fetch_margin(tdate):
     """指定日期融资融券数据"""
     tdate = "2020-09-14"
     url = f"http://vip.stock.finance.sina.com.cn/q/go.php/vInvestConsult/kind/rzrq/index.phtml?tradedate={tdate}"
-    r = requests.get(url)
-    df = pd.read_html(r.text, skiprows=[0, 1, 2])[1]
+    r = get_page_response(url)
+    df = pd.read_html(StringIO(r.text), skiprows=[0, 1, 2])[1]
     df.drop(columns=[0], inplace=True)
     df.columns = MARGIN_COL_NAMES
     df['股票代码'] = df['股票代码'].map(lambda x: str(x).zfill(6))
@@ -9,7 +9,7 @@ from selenium.webdriver.common.by import By
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.support.ui import WebDriverWait
 
-from .._seleniumwire import make_headless_browser
+from .._seleniumwire import lease_browser
 from ..setting.config import POLL_FREQUENCY, TIMEOUT
 from ..setting.constants import MAX_WORKER
 from ..utils import make_logger
@@ -36,14 +36,15 @@ class Sina247News(object):
     def __init__(self):
         logger.info("生成无头浏览器")
         self.base_url = 'http://finance.sina.com.cn/7x24/'
-        self.driver = make_headless_browser()
+        self._browser = lease_browser()
+        self.driver = self._browser.driver
         self.wait = WebDriverWait(self.driver, 5, POLL_FREQUENCY)
 
     def __enter__(self):
         return self
 
     def __exit__(self, *args):
-        self.driver.quit()
+        self._browser.release(failed=args[0] is not None)
 
     def scrolling(self):
         # 每次递增大约20条
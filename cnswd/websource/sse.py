@@ -26,7 +26,7 @@ from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.support.ui import Select, WebDriverWait
 
 from cnswd.utils import data_root, most_recent_path
-from cnswd._seleniumwire import make_headless_browser
+from cnswd._seleniumwire import lease_browser
 
 
 logger = logbook.Logger('上交所')
@@ -45,14 +45,15 @@ class SSEPage(object):
     def __init__(self, download_path=data_root('download')):
         self.host_url = 'http://www.sse.com.cn'
         logger.info('初始化无头浏览器......')
-        self.driver = make_headless_browser()
+        self._browser = lease_browser()
+        self.driver = self._browser.driver
         self.wait = WebDriverWait(self.driver, MAX_WAIT_SECOND)
 
     def __enter__(self):
         return self
 
     def __exit__(self, *args):
-        self.driver.quit()
+        self._browser.release(failed=args[0] is not None)
 
     def _goto_page(self, num, input_id, btn_id):
         """跳转到指定页数的页面
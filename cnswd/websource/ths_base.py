@@ -7,7 +7,7 @@ from selenium.webdriver.common.by import By
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.support.ui import WebDriverWait
 
-from .._seleniumwire import make_headless_browser
+from .._seleniumwire import lease_browser
 from ..setting.config import POLL_FREQUENCY, TIMEOUT
 from ..utils import make_logger
 
@@ -29,14 +29,15 @@ class THS(object):
     def __init__(self):
         self.logger = logger
         self.logger.info("创建无头浏览器")
-        self.browser = make_headless_browser()
+        self._browser = lease_browser()
+        self.browser = self._browser.driver
         self.wait = WebDriverWait(self.browser, 60, POLL_FREQUENCY)
 
     def __enter__(self):
         return self
 
     def __exit__(self, *args):
-        self.browser.quit()
+        self._browser.release(failed=args[0] is not None)
 
     def _get_page_num(self):
         """当前页数"""
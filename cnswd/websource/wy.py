@@ -5,6 +5,7 @@
     指数代码名称           get_index_base
     主要指数列表           get_main_index
     股票指数交易数据       fetch_history
+    批量股票指数交易数据   fetch_histories
     股票指数OHLCV数据      fetch_ohlcv
     财务指标               fetch_financial_indicator
     财务报表               fetch_financial_report 
@@ -20,18 +21,19 @@ import re
 from concurrent.futures import ThreadPoolExecutor
 from functools import lru_cache, partial
 from io import BytesIO, StringIO
-from urllib.error import HTTPError
 
+import numpy as np
 import pandas as pd
-import requests
+import xlrd
 from bs4 import BeautifulSoup
 from cnswd.utils.tools import ensure_list
 from toolz.itertoolz import partition_all, concat
 
-from .._exceptions import NoWebData
+from .._exceptions import ConnectFailed, NoWebData
 from ..setting.constants import MAX_WORKER
 from ..utils import sanitize_dates
-from .base import friendly_download, get_page_response
+from .aio import AsyncFetcher
+from .base import friendly_download, get_page_response, read_csv, read_html
 
 _WY_STOCK_HISTORY_NAMES = [
     'name', 'close', 'high', 'low', 'open', 'prev_close', 'change',
@@ -121,7 +123,7 @@ def _to_code(d):
 
 
 def _fetch_quote(url):
-    r = requests.get(url)
+    r = get_page_response(url)
     docs = json.loads(QUOTE_PAT.match(r.text).groups(1)[0]).values()
     return [_to_code(doc) for doc in docs]
 
@@ -147,20 +149,18 @@ def fetch_quote(codes, is_index=False, n=800):
         return concat(docs)
 
 
-def fetch_history(code, start, end=None, is_index=False):
-    """获取股票或者指数的历史交易数据（不复权）
-    备注：
-        提供的数据延迟一日
-
-    记录：
-        `2018-12-12 16：00`时下载 002622 历史数据，数据截至日为2018-12-10 延迟2日
-    """
+def history_url(code, start, end=None, is_index=False):
+    """历史交易数据网址"""
     start, end = sanitize_dates(start, end)
     url_fmt = 'http://quotes.money.163.com/service/chddata.html?code={}&start={}&end={}'
     code = _query_code(code, is_index)
     start_str = start.strftime('%Y%m%d')
     end_str = end.strftime('%Y%m%d')
-    url = url_fmt.format(code, start_str, end_str) + '#01b07'
+    return url_fmt.format(code, start_str, end_str) + '#01b07'
+
+
+def parse_history(content):
+    """解析历史交易数据CSV"""
     na_values = ['None', '--', 'none']
     kwds = {
         'index_col': 0,
@@ -168,9 +168,47 @@ def fetch_history(code, start, end=None, is_index=False):
         'parse_dates': True,
         'na_values': na_values,
     }
+    return pd.read_csv(BytesIO(content), **kwds)
+
+
+def fetch_history(code, start, end=None, is_index=False):
+    """获取股票或者指数的历史交易数据（不复权）
+    备注：
+        提供的数据延迟一日
+
+    记录：
+        `2018-12-12 16：00`时下载 002622 历史数据，数据截至日为2018-12-10 延迟2日
+    """
+    url = history_url(code, start, end, is_index)
     page_response = get_page_response(url, 'get')
-    df = pd.read_csv(BytesIO(page_response.content), **kwds)
-    return df
+    return parse_history(page_response.content)
+
+
+def fetch_histories(starts,
+                    end=None,
+                    is_index=False,
+                    parse_workers=None,
+                    on_result=None):
+    """异步批量获取股票或者指数的历史交易数据（不复权）
+
+    Args:
+        starts (dict): 键为代码，值为开始日期
+        end (date like, optional): 结束日期. Defaults to None.
+        is_index (bool, optional): 是否为指数. Defaults to False.
+        parse_workers (int, optional): 解析进程数. Defaults to None（使用设置）.
+        on_result (callable, optional): 以(代码, 数据)逐个调用，用于边下载边保存.
+            Defaults to None（返回全部数据）.
+
+    Returns:
+        tuple: (以代码为键的数据字典（使用`on_result`时为其返回值）, 失败项目字典)
+    """
+    urls = {
+        code: history_url(code, start, end, is_index)
+        for code, start in starts.items()
+    }
+    kwds = {} if parse_workers is None else {'parse_workers': parse_workers}
+    fetcher = AsyncFetcher(parser=parse_history, **kwds)
+    return fetcher.run(urls, on_result)
 
 
 def fetch_ohlcv(code, start, end, is_index=False):
@@ -190,12 +228,26 @@ def fetch_last_history():
     url += "page=0&query=STYPE:EQA&fields=SYMBOL,NAME,PRICE,PERCENT,OPEN,YESTCLOSE,"
     url += "HIGH,LOW,VOLUME,TURNOVER,PE,MCAP,TCAP&sort=PERCENT&"
     url += "order=desc&count=5000&type=query"
-    r = requests.get(url)
+    r = get_page_response(url)
     df = pd.DataFrame.from_records(r.json()['list'])
     return df
 
 
 @friendly_download(10, None, 1)
+def fetch_cjmx_content(code, tdate):
+    """下载成交明细xls文件内容"""
+    tdate = pd.Timestamp(tdate)
+    url_fmt = 'http://quotes.money.163.com/cjmx/{qyear}/{qdate}/{qcode}.xls'
+    qyear = tdate.year
+    qdate = tdate.strftime(r'%Y%m%d')
+    qcode = _query_code(code, False)
+    url = url_fmt.format_map({'qyear': qyear, 'qdate': qdate, 'qcode': qcode})
+    try:
+        return get_page_response(url).content
+    except ConnectFailed:
+        raise NoWebData('不存在网页数据。股票：{}，日期：{}'.format(code, tdate.date()))
+
+
 def fetch_cjmx(code, tdate):
     """
     提取股票历史交易明细
@@ -205,23 +257,61 @@ def fetch_cjmx(code, tdate):
         当前滞后2日
     """
     tdate = pd.Timestamp(tdate)
-    url_fmt = 'http://quotes.money.163.com/cjmx/{qyear}/{qdate}/{qcode}.xls'
-    qyear = tdate.year
-    qdate = tdate.strftime(r'%Y%m%d')
-    qcode = _query_code(code, False)
-    url = url_fmt.format_map({'qyear': qyear, 'qdate': qdate, 'qcode': qcode})
+    content = fetch_cjmx_content(code, tdate)
     na_values = ['None', '--', 'none']
-    kwds = {'na_values': na_values}
-    try:
-        df = pd.read_excel(url, **kwds)
-    except HTTPError:
-        raise NoWebData('不存在网页数据。股票：{}，日期：{}'.format(code, tdate.date()))
+    df = pd.read_excel(BytesIO(content), na_values=na_values)
     df.columns = _CJMX_COLS
     df.insert(0, '日期', tdate)
     df.insert(0, '股票代码', code)
     return df
 
 
+def _cjmx_time(values, tdate):
+    """成交时间。单元格为文本（时:分:秒）或者excel时间（日的小数）"""
+    if values and isinstance(values[0], float):
+        secs = np.round(np.asarray(values, dtype=np.float64) * 86400)
+        delta = pd.to_timedelta(secs, unit='s')
+    else:
+        delta = pd.to_timedelta(pd.Series(values, dtype=object))
+    return pd.Timestamp(tdate).normalize() + pd.TimedeltaIndex(delta)
+
+
+def parse_cjmx(content, code, tdate):
+    """解析成交明细xls
+
+    直接读取单元格，不经由`read_excel`构造中间DataFrame，
+    输出字段：股票代码、成交时间、成交价、价格变动、成交量、成交额、性质
+    """
+    book = xlrd.open_workbook(file_contents=content, on_demand=True)
+    try:
+        sheet = book.sheet_by_index(0)
+        cols = [sheet.col_values(j, 1) for j in range(len(_CJMX_COLS))]
+    finally:
+        book.release_resources()
+    data = dict(zip(_CJMX_COLS, cols))
+
+    def num(col):
+        return pd.to_numeric(pd.Series(data[col], dtype=object),
+                             errors='coerce').to_numpy(np.float64)
+
+    df = pd.DataFrame({
+        '股票代码': code,
+        '成交时间': _cjmx_time(data['时间'], tdate),
+        '成交价': num('价格').round(2),
+        '价格变动': np.nan_to_num(num('涨跌额')).round(2),
+        '成交量': np.nan_to_num(num('成交量')).astype(np.int64),
+        '成交额': np.nan_to_num(num('成交额')).round(2),
+        '性质': pd.Categorical(data['方向']),
+    })
+    return df
+
+
+def fetch_ticks(code, tdate):
+    """提取股票成交明细（逐笔），用于列式存储"""
+    content = fetch_cjmx_content(code, tdate)
+    return parse_cjmx(content, code, tdate)
+
+
 def fetch_fhpg(code):
     """股票分红配股数据
 
@@ -233,9 +323,10 @@ def fetch_fhpg(code):
         3： 历年融资计划
     """
     url = f'http://quotes.money.163.com/f10/fhpg_{code}.html#01d05'
-    r = requests.get(url)
+    r = get_page_response(url)
     attrs = {'class': 'table_bg001 border_box limit_sale'}
-    dfs = pd.read_html(r.text, attrs=attrs, na_values=['--', '暂无数据'])
+    dfs = pd.read_html(StringIO(r.text), attrs=attrs,
+                       na_values=['--', '暂无数据'])
     dfs[0].columns = _WY_FH_COLS
     return dfs
 
@@ -272,9 +363,9 @@ def fetch_financial_indicator(code, type_, part):
     else:
         url = f'http://quotes.money.163.com/service/zycwzb_{code}.html?type={type_}&part={part}'
     date_key = '报告日期'
-    df = pd.read_csv(url,
-                     na_values=['--', ' --', '-- '],
-                     encoding='gbk').iloc[:, :-1]
+    df = read_csv(url,
+                  na_values=['--', ' --', '-- '],
+                  encoding='gbk').iloc[:, :-1]
     df.columns = [str(c).strip() for c in df.columns]
     df.set_index(date_key, inplace=True)
     return df.T.reset_index().rename(columns={'index': date_key})
@@ -295,8 +386,8 @@ def fetch_financial_report(code, report_item):
     assert report_item in ('lrb', 'zcfzb', 'xjllb')
     date_key = '报告日期'
     url = f'http://quotes.money.163.com/service/{report_item}_{code}.html'
-    df = pd.read_csv(url, na_values=['--', ' --', '-- '],
-                     encoding='gbk').iloc[:, :-1]
+    df = read_csv(url, na_values=['--', ' --', '-- '],
+                  encoding='gbk').iloc[:, :-1]
     columns = df.iloc[:, 0].values
     data = df.iloc[:, 1:].T
     # 转换后，科目为列名称
@@ -321,7 +412,7 @@ def _parse_performance_notice(raw_df):
 def fetch_yjyg(stock_code):
     """业绩预告docs【返回 list of dict】"""
     url = f"http://quotes.money.163.com/f10/yjyg_{stock_code}.html#01c03"
-    r = requests.get(url)
+    r = get_page_response(url)
     table_css = ".inner_box table"
     soup = BeautifulSoup(r.text, 'lxml')
     tables = soup.select(table_css)
@@ -339,7 +430,7 @@ def fetch_company_info(stock_code):
     """获取公司简介、IPO信息字典"""
     url_fmt = 'http://quotes.money.163.com/f10/gszl_{}.html#11b01'
     url = url_fmt.format(stock_code)
-    r = requests.get(url)
+    r = get_page_response(url)
     tb_1_td_css = '.col_l_01 > table:nth-child(3) td'
     tb_2_td_css = '.col_r_01 > table:nth-child(3) td'
     soup = BeautifulSoup(r.text, 'lxml')
@@ -454,7 +545,7 @@ def fetch_top10_stockholder(stock_code, query_date, type_='c'):
     # df = pd.read_html(url, encoding='utf-8', header=0, skiprows=range(1))[0]
     attrs = {'class': 'table_bg001 border_box limit_sale'}
     # 必须使用html5lib解析
-    df = pd.read_html(url, encoding='utf-8', attrs=attrs, flavor='html5lib')[0]
+    df = read_html(url, encoding='utf-8', attrs=attrs, flavor='html5lib')[0]
     return df
 
 
@@ -539,7 +630,7 @@ def fetch_margin_data(query_date):
     url_fmt = "http://quotes.money.163.com/data/margintrade,{}.html"
     date_str = query_date.strftime('%Y%m%d')
     url = url_fmt.format(date_str)
-    df = pd.read_html(url)[2].iloc[:, _WY_MARGIN_DATA_USE_COLS]
+    df = read_html(url)[2].iloc[:, _WY_MARGIN_DATA_USE_COLS]
     df.columns = _WY_MARGIN_DATA_COL_NAMES
     df.insert(1, '日期', query_date.date())
     return df
@@ -0,0 +1,109 @@
+import pytest
+
+from cnswd._seleniumwire import BrowserPool
+
+
+class FakeDriver(object):
+    def __init__(self, options):
+        self.options = options
+        self.cleared = 0
+        self.scopes = []
+        self.cookies = True
+        self.url = None
+        self.alive = True
+        self.quitted = False
+
+    @property
+    def requests(self):
+        return []
+
+    @requests.deleter
+    def requests(self):
+        self.cleared += 1
+
+    def execute_script(self, script):
+        if not self.alive:
+            raise RuntimeError('dead')
+        return 1
+
+    def delete_all_cookies(self):
+        self.cookies = False
+
+    def get(self, url):
+        self.url = url
+
+    def quit(self):
+        self.quitted = True
+
+
+@pytest.fixture
+def pool():
+    created = []
+
+    def factory(options):
+        d = FakeDriver(options)
+        created.append(d)
+        return d
+
+    p = BrowserPool(size=2, max_uses=3, max_memory=1e9, factory=factory)
+    p.created = created
+    yield p
+    p.close()
+
+
+def test_reuse_and_reset(pool):
+    with pool.lease() as b:
+        first = b.driver
+        first.url = 'http://a'
+    assert first.url == 'about:blank'
+    assert not first.cookies
+    assert first.cleared == 1
+    with pool.lease() as b:
+        assert b.driver is first
+    assert len(pool.created) == 1
+
+
+def test_tag_keeps_state(pool):
+    with pool.lease(tag='x') as b:
+        b.driver.url = 'http://x'
+        b.state['meta'] = 1
+    with pool.lease(tag='x') as b:
+        assert b.driver.url == 'http://x'
+        assert b.state['meta'] == 1
+    # 尚可新建时，不占用其他标签的浏览器
+    with pool.lease(tag='y') as b:
+        assert b.state == {}
+        assert b.driver.url is None
+    with pool.lease(tag='x') as b:
+        assert b.state['meta'] == 1
+    # 出现异常时重置
+    with pytest.raises(ValueError):
+        with pool.lease(tag='y') as b:
+            raise ValueError()
+    assert b.tag is None and b.state == {}
+
+
+def test_recycle(pool):
+    for _ in range(3):
+        with pool.lease() as b:
+            pass
+    assert b.driver.quitted
+    with pool.lease() as b:
+        b.driver.alive = False
+    with pool.lease() as b2:
+        assert b2.driver is not b.driver
+    assert b.driver.quitted
+    assert len(pool.created) == 3
+
+
+def test_size_and_options(pool):
+    a = pool.acquire()
+    b = pool.acquire()
+    with pytest.raises(TimeoutError):
+        pool.acquire(timeout=0.05)
+    a.release()
+    c = pool.acquire({'verify_ssl': False})
+    assert c.driver.options == {'verify_ssl': False}
+    assert a.driver.quitted
+    b.release()
+    c.release()
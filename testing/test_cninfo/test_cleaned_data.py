@@ -0,0 +1,43 @@
+import pandas as pd
+import pytest
+
+from cnswd.cninfo.utils import cleaned_data, compile_plan
+
+FIELD_MAPS = [
+    {'fieldName': 'SECCODE', 'fieldChineseName': '证券代码', 'fieldType': 'varchar(10)'},
+    {'fieldName': 'F001D', 'fieldChineseName': '报告年度', 'fieldType': 'DATE'},
+    {'fieldName': 'F002N', 'fieldChineseName': '营业收入', 'fieldType': 'decimal(18,2)'},
+    {'fieldName': 'F003N', 'fieldChineseName': '员工人数', 'fieldType': 'bigint'},
+    {'fieldName': 'F004V', 'fieldChineseName': 'Ａ股简称', 'fieldType': 'varchar(40)'},
+]
+
+DATA = [
+    {'SECCODE': '000001', 'F001D': '2019-12-31', 'F002N': 10.5, 'F003N': '120', 'F004V': 'x'},
+    {'SECCODE': '000002', 'F001D': '2019-12-31 00:00:00', 'F002N': 0, 'F003N': 3.0},
+    {'SECCODE': '000003', 'F001D': '20190630', 'F002N': 7, 'F003N': None, 'OTHER': 1},
+    {'SECCODE': '000004', 'F001D': 'bad', 'F002N': '', 'F004V': None},
+]
+
+
+def test_cleaned_data():
+    res = cleaned_data(DATA, FIELD_MAPS)
+    assert res == [
+        {'股票代码': '000001', '报告年度': pd.Timestamp('2019-12-31'),
+         '营业收入': 10.5, '员工人数': 120, 'A股简称': 'x'},
+        {'股票代码': '000002', '报告年度': pd.Timestamp('2019-12-31'),
+         '员工人数': 3},
+        {'股票代码': '000003', '报告年度': pd.Timestamp('2019-06-30'),
+         '营业收入': 7, 'OTHER': 1},
+        {'股票代码': '000004', '报告年度': pd.NaT},
+    ]
+    assert type(res[0]['员工人数']) is int
+    assert type(res[2]['营业收入']) is int
+    assert cleaned_data([], FIELD_MAPS) == []
+
+
+def test_plan_cached():
+    plan = compile_plan(FIELD_MAPS)
+    assert compile_plan([dict(d) for d in FIELD_MAPS]) is plan
+    assert plan['F001D'] == ('报告年度', 'datetime')
+    with pytest.raises(ValueError):
+        compile_plan([{'fieldName': 'X', 'fieldChineseName': 'x', 'fieldType': 'blob'}])
@@ -0,0 +1,97 @@
+import json
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+from cnswd._exceptions import ConnectFailed
+from cnswd.cninfo.webapi import WebApi, period_params
+
+FIXTURE = Path(__file__).parents[1] / 'data' / 'cninfo' / 'webapi.json'
+
+
+def _key(url, params):
+    return url, tuple(sorted(params.items()))
+
+
+@pytest.fixture
+def api():
+    with open(FIXTURE, encoding='utf-8') as f:
+        recorded = json.load(f)
+    responses = {
+        _key(r['url'], r['params']): r['body']
+        for r in recorded['responses']
+    }
+
+    def fetch(url, params):
+        try:
+            return responses[_key(url, params)]
+        except KeyError:
+            raise ConnectFailed('无记录')
+
+    return WebApi(recorded['meta'], max_workers=2, fetch=fetch)
+
+
+def test_get_data(api):
+    data = api.get_data('分红指标', '000333', '2018-01-01', '2019-12-31')
+    assert len(data) == 4
+    assert data[1] == {
+        '股票代码': '000333',
+        '股票简称': '美的集团',
+        '分红年度': pd.Timestamp('2018-12-31'),
+        '分红方案': '10派13元(含税)',
+        '派息比例': 43.09,
+    }
+    # 空值字段不保留
+    assert '分红方案' not in data[0]
+
+
+def test_date_range_single_request(api):
+    # 按层级查询，未记录期间类型时由输入参数推断
+    data = api.get_data('4_1', '000333', '2020-01-02', '2020-01-03')
+    assert [d['交易日期'] for d in data] == [
+        pd.Timestamp('2020-01-02'), pd.Timestamp('2020-01-03')]
+    assert data[0]['成交量'] == 48516127
+    assert '成交量' not in data[1]
+
+
+def test_fetch_all(api):
+    data, failed = api.fetch_all('分红指标', ['000333', '000001', '600000'],
+                                 '2018-01-01', '2019-12-31')
+    assert len(data) == 5
+    assert sorted(set(d['股票代码'] for d in data)) == ['000001', '000333']
+    assert [code for code, _ in failed] == ['600000', '600000']
+    with pytest.raises(ConnectFailed):
+        api.get_data('分红指标', '600000', '2019-01-01', '2019-12-31')
+
+
+def test_fetch_all_bad_response(api):
+    """非json响应只记为该请求失败"""
+    fetch = api.fetch
+
+    def bad_json(url, params):
+        if params['scode'] == '000001':
+            raise ValueError('Expecting value: line 1 column 1 (char 0)')
+        return fetch(url, params)
+
+    api.fetch = bad_json
+    data, failed = api.fetch_all('分红指标', ['000333', '000001'],
+                                 '2018-01-01', '2019-12-31')
+    assert sorted(set(d['股票代码'] for d in data)) == ['000333']
+    assert {code for code, _ in failed} == {'000001'}
+
+
+def test_period_params():
+    start, end = pd.Timestamp('2018-02-01'), pd.Timestamp('2019-05-31')
+    assert period_params(None, start, end) == [{}]
+    assert period_params('', start, end) == [{}]
+    assert period_params('QD', start, end) == [{
+        'sdate': '2018-02-01', 'edate': '2019-05-31'}]
+    assert len(period_params('QD', start, end, single_code=False)) == 6
+    assert period_params('YY', start, end) == [{'syear': '2018'},
+                                               {'syear': '2019'}]
+    # 末年取结束日期所在季度
+    assert period_params('YQ', start, end) == [
+        {'sdate': '20181231', 'edate': '20181231'},
+        {'sdate': '20190630', 'edate': '20190630'},
+    ]
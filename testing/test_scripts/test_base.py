@@ -0,0 +1,26 @@
+from cnswd.scripts.base import ChunkSaver
+
+
+def test_chunk_saver():
+    """达到批量时保存，退出时保存剩余数据"""
+    chunks = []
+    with ChunkSaver(lambda data: chunks.append(sorted(data)), 2) as saver:
+        for code in ['000001', '000002', '000003']:
+            saver.add(code, [code])
+        assert chunks == [['000001', '000002']]
+    assert chunks == [['000001', '000002'], ['000003']]
+    assert saver.saved == 3
+
+
+def test_chunk_saver_failed():
+    """保存失败时整批代码计入失败项目"""
+    def save(data):
+        if '000002' in data:
+            raise IOError('磁盘已满')
+
+    with ChunkSaver(save, 2) as saver:
+        for code in ['000001', '000002', '000003']:
+            saver.add(code, [code])
+    assert sorted(saver.failed) == ['000001', '000002']
+    assert isinstance(saver.failed['000001'], IOError)
+    assert saver.saved == 1
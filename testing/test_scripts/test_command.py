@@ -0,0 +1,26 @@
+import subprocess
+import sys
+
+from click.testing import CliRunner
+
+from cnswd.scripts.command import stock
+
+HEAVY_MODULES = ('akshare', 'selenium', 'seleniumwire', 'pdfminer',
+                 'log4mongo', 'pymongo', 'yahooquery')
+
+
+def test_import_is_light():
+    # 新进程中检查，避免受其他测试已导入模块的影响
+    code = ('import sys, cnswd.scripts.command; '
+            f'print(",".join(m for m in {HEAVY_MODULES!r} if m in sys.modules))')
+    r = subprocess.run([sys.executable, '-c', code],
+                       capture_output=True,
+                       text=True,
+                       check=True)
+    assert r.stdout.strip() == ''
+
+
+def test_help():
+    r = CliRunner().invoke(stock, ['--help'])
+    assert r.exit_code == 0
+    assert 'quote' in r.output
@@ -0,0 +1,127 @@
+import threading
+import time
+from types import SimpleNamespace
+
+import pandas as pd
+import pytest
+
+from cnswd.scripts.daemon import JOBS, Job, Scheduler
+from cnswd.utils.calendar_utils import TradingCalendar
+
+CALENDAR = TradingCalendar(['2020-07-23', '2020-07-24', '2020-07-27'])
+
+
+def make_scheduler(jobs, **kwds):
+    return Scheduler(jobs, max_workers=4, calendar=CALENDAR, **kwds)
+
+
+def test_calendar_conditions():
+    calls = []
+    jobs = [
+        Job('any', lambda: calls.append('any'), '* * * * *', 'a'),
+        Job('trading', lambda: calls.append('trading'), '* * * * *', 'b', 'trading'),
+        Job('session', lambda: calls.append('session'), '* * * * *', 'c', 'session'),
+    ]
+    cases = [
+        ('2020-07-24 11:30:30', ['any', 'trading', 'session']),
+        ('2020-07-24 12:00', ['any', 'trading']),
+        # 星期六
+        ('2020-07-25 10:00', ['any']),
+    ]
+    for now, expected in cases:
+        s = make_scheduler(jobs)
+        assert s.tick(pd.Timestamp(now)) == expected
+        # 同一分钟只调度一次
+        assert s.tick(pd.Timestamp(now) + pd.Timedelta(seconds=10)) == []
+        s.stop()
+    assert sorted(calls) == ['any', 'any', 'any', 'session', 'trading', 'trading']
+
+
+def test_catch_up_and_no_overlap():
+    release = threading.Event()
+    started = []
+
+    def slow():
+        started.append(1)
+        release.wait(5)
+
+    async def coro():
+        started.append(2)
+
+    s = make_scheduler([Job('slow', slow, '* * * * *', 'a'),
+                        Job('coro', coro, '*/2 * * * *', 'b')])
+    assert s.tick(pd.Timestamp('2020-07-24 10:00')) == ['slow', 'coro']
+    while 'coro' in s._running:
+        time.sleep(0.01)
+    # 暂停3分钟后补运行，仍在运行的任务不重复提交
+    assert s.tick(pd.Timestamp('2020-07-24 10:03')) == ['coro']
+    release.set()
+    s.stop()
+    assert started.count(1) == 1
+    assert started.count(2) == 2
+
+
+def test_source_limit():
+    lock = threading.Lock()
+    state = {'now': 0, 'max': 0}
+    gate = threading.Event()
+
+    def work():
+        with lock:
+            state['now'] += 1
+            state['max'] = max(state['max'], state['now'])
+        gate.wait(0.2)
+        with lock:
+            state['now'] -= 1
+
+    jobs = [Job(f'j{i}', work, '* * * * *', 'wy') for i in range(4)]
+    s = make_scheduler(jobs, source_limits={'wy': 2})
+    s.tick(pd.Timestamp('2020-07-24 10:00'))
+    s.stop()
+    assert state['max'] == 2
+
+
+def test_jobs_cover_command_names():
+    """任务表包含README所列计划任务，名称与`stock`子命令一致"""
+    from cnswd.scripts.command import stock
+    names = [job.name for job in JOBS]
+    assert len(names) == len(set(names))
+    assert {'snrzrq', 'clean'} <= set(names)
+    assert set(names) <= set(stock.commands)
+
+
+def test_run_in_subprocess(tmp_path):
+    """子进程任务以spawn方式运行，失败时引发异常"""
+    path = tmp_path / 'made'
+    s = make_scheduler([])
+    # `store_path`创建目录
+    s._run_process(Job('ok', 'cnswd.store.base:store_path', '* * * * *', 'a',
+                       args=('made', str(tmp_path)), process=True))
+    assert path.is_dir()
+    # 缺少参数，子进程异常退出
+    with pytest.raises(RuntimeError):
+        s._run_process(Job('bad', 'cnswd.scripts.daemon:in_session',
+                           '* * * * *', 'a', process=True))
+    s.stop()
+
+
+def test_interval_within_minute(monkeypatch):
+    """分钟内按间隔重复运行，下一分钟调度前结束"""
+    from cnswd.scripts import daemon
+    clock = [1595554800.0]  # 整分钟
+    monkeypatch.setattr(daemon, 'time', SimpleNamespace(time=lambda: clock[0]))
+    calls = []
+    s = make_scheduler([])
+
+    def wait(seconds):
+        clock[0] += seconds
+        return False
+
+    monkeypatch.setattr(s._stopped, 'wait', wait)
+    job = Job('fast', lambda: calls.append(clock[0]), '* * * * *', 'a',
+              interval=20)
+    s._running.add(job.name)
+    s._run(job)
+    assert [c - 1595554800.0 for c in calls] == [0, 20, 40]
+    assert job.name not in s._running
+    s.stop()
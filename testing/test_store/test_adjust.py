@@ -0,0 +1,52 @@
+import numpy as np
+import pandas as pd
+
+from cnswd.store.adjust import adjust, read_factors, update_factors
+
+DATES = pd.to_datetime(
+    ['2020-06-01', '2020-06-02', '2020-06-03', '2020-06-04', '2020-06-05'])
+
+
+def _prices(codes, start, end, fields):
+    df = pd.DataFrame({
+        '日期': list(DATES) * 2,
+        '股票代码': ['000001'] * 5 + ['000002'] * 5,
+        '收盘价': [10.0, 10.0, 8.0, 8.0, 8.0, 20.0, 20.0, 20.0, 19.0, 19.0],
+    })
+    return df[df['股票代码'].isin(codes)]
+
+
+def _dividends(rows):
+    return pd.DataFrame(rows,
+                        columns=['股票代码', '除权除息日', '送股(每10股)',
+                                 '转增(每10股)', '派息(每10股)'])
+
+
+def test_update_factors(tmp_path):
+    # 000001 每10股转增2股、派息4元；000002 每10股派息10元
+    dividends = _dividends([
+        ('000001', '2020-06-03', None, 2, 4),
+        ('000002', '2020-06-04', None, None, 10),
+        # 未到除权除息日
+        ('000002', '2099-01-01', 10, None, None),
+    ])
+    assert update_factors(dividends, _prices, root=tmp_path) == 2
+    df = read_factors(root=tmp_path)
+    np.testing.assert_allclose(df['因子'], [(10 - 0.4) / 12, 19 / 20])
+
+    bars = _prices(['000001', '000002'], None, None, None)
+    res = adjust(bars, 'backward', root=tmp_path)
+    p1 = res[res['股票代码'] == '000001']['收盘价'].to_numpy()
+    np.testing.assert_allclose(p1, [10, 10, 10, 10, 10])
+    res = adjust(bars, 'forward', root=tmp_path)
+    p2 = res[res['股票代码'] == '000002']['收盘价'].to_numpy()
+    np.testing.assert_allclose(p2, [19, 19, 19, 19, 19])
+
+    # 增量更新：已保存的记录不再计算，累计因子接续
+    dividends = _dividends([
+        ('000001', '2020-06-03', None, 2, 4),
+        ('000001', '2020-06-05', 10, None, None),
+    ])
+    assert update_factors(dividends, _prices, root=tmp_path) == 1
+    df = read_factors('000001', root=tmp_path)
+    np.testing.assert_allclose(df['累计因子'], [9.6 / 12, 9.6 / 12 / 2])
@@ -0,0 +1,71 @@
+import numpy as np
+import pandas as pd
+
+from cnswd.store.asof import AsofEngine, asof_index, statutory_deadline
+
+DATES = pd.to_datetime(
+    ['2020-04-27', '2020-04-28', '2020-04-29', '2020-04-30', '2020-05-06'])
+
+
+def _bars(codes, start, end, fields):
+    df = pd.DataFrame([(d, c) for c in codes for d in DATES],
+                      columns=['日期', '股票代码'])
+    return df[(df['日期'] >= start) & (df['日期'] <= end)]
+
+
+def _statements(codes, items, report='zcfzb'):
+    df = pd.DataFrame({
+        '股票代码': ['000001', '000001', '000001', '000002'],
+        '报告日期': pd.to_datetime(
+            ['2019-09-30', '2019-12-31', '2020-03-31', '2019-12-31']),
+        '货币资金(万元)': [1.0, 2.0, 3.0, 10.0],
+        '存货(万元)': [5.0, np.nan, np.nan, 20.0],
+    })
+    return df[df['股票代码'].isin(codes)][['股票代码', '报告日期'] + items]
+
+
+def _disclosures(codes):
+    # 000001 一季报早于年报披露；000002 无实际披露日期，使用法定期限
+    return pd.DataFrame({
+        '股票代码': ['000001', '000001', '000001'],
+        '报告日期': pd.to_datetime(['2019-09-30', '2019-12-31', '2020-03-31']),
+        '披露日期': pd.to_datetime(['2019-10-25', '2020-04-28', '2020-04-27']),
+    })
+
+
+def test_statutory_deadline():
+    res = statutory_deadline(
+        ['2020-03-31', '2020-06-30', '2020-09-30', '2020-12-31'])
+    assert res.tolist() == list(
+        pd.to_datetime(['2020-04-30', '2020-08-31', '2020-10-31', '2021-04-30']))
+
+
+def test_asof_index():
+    idx = asof_index(['a', 'a', 'b', 'c'],
+                     pd.to_datetime(['2020-01-02', '2020-01-03', '2020-01-03',
+                                     '2020-01-03']),
+                     ['b', 'a', 'a'],
+                     pd.to_datetime(['2020-01-01', '2020-01-02', '2020-01-01']))
+    # 不含当日
+    assert idx.tolist() == [2, 1, 0, -1]
+
+
+def test_get_panel():
+    engine = AsofEngine(_bars, _statements, _disclosures)
+    items = ['货币资金(万元)', '存货(万元)']
+    panel = engine.get_panel(['000002', '000001'], '2020-04-27', '2020-05-06',
+                             items)
+    p1 = panel[panel['股票代码'] == '000001']
+    # 4月27日披露一季报，次日可用；4月28日披露的年报不覆盖一季报
+    assert p1['货币资金(万元)'].tolist() == [1.0, 3.0, 3.0, 3.0, 3.0]
+    # 一季报、年报该科目为空，取最近非空值
+    assert p1['存货(万元)'].tolist() == [5.0] * 5
+    p2 = panel[panel['股票代码'] == '000002']
+    # 法定期限4月30日后可用
+    assert p2['货币资金(万元)'].isna().tolist() == [True] * 4 + [False]
+    # 重复调用使用缓存
+    assert engine.misses == 2
+    again = engine.get_panel(['000001', '000002'], '2020-04-27',
+                             '2020-05-06', ['存货(万元)'])
+    assert engine.hits == 1
+    pd.testing.assert_series_equal(again['存货(万元)'], panel['存货(万元)'])
@@ -0,0 +1,55 @@
+import pandas as pd
+import pytest
+
+from cnswd.store.bars import compact_bars, read_bars, write_bars
+
+
+def _bars(codes, dates, close=1.0):
+    rows = []
+    for code in codes:
+        for d in pd.to_datetime(dates):
+            rows.append({
+                '日期': d,
+                '股票代码': code,
+                '名称': f'股票{code}',
+                '收盘价': close,
+                '成交量': 100,
+            })
+    return pd.DataFrame(rows)
+
+
+@pytest.fixture
+def root(tmp_path):
+    write_bars(_bars(['000001', '600000'], ['2019-12-30', '2019-12-31']),
+               root=tmp_path)
+    write_bars(_bars(['000001', '600000', '300001'],
+                     ['2020-01-02', '2020-01-03']),
+               root=tmp_path)
+    return tmp_path
+
+
+def test_read_bars(root):
+    """按代码、日期及字段读取"""
+    df = read_bars(['000001'], '2019-12-31', '2020-01-02', ['收盘价'],
+                   root=root)
+    assert df.columns.tolist() == ['日期', '股票代码', '收盘价']
+    assert df['股票代码'].unique().tolist() == ['000001']
+    assert df['日期'].tolist() == list(pd.to_datetime(['2019-12-31',
+                                                     '2020-01-02']))
+    assert len(read_bars(root=root)) == 10
+
+
+def test_overwrite_and_compact(root):
+    """重复写入保留最后记录，合并后结果不变"""
+    write_bars(_bars(['000001'], ['2020-01-03'], close=2.0), root=root)
+    df = read_bars('000001', '2020-01-03', root=root)
+    assert df['收盘价'].tolist() == [2.0]
+    assert compact_bars(root=root) > 0
+    df = read_bars('000001', '2020-01-03', root=root)
+    assert df['收盘价'].tolist() == [2.0]
+    assert len(read_bars(root=root)) == 10
+
+
+def test_empty_store(tmp_path):
+    df = read_bars(['000001'], fields=['收盘价'], root=tmp_path)
+    assert df.empty
@@ -0,0 +1,65 @@
+import numpy as np
+import pandas as pd
+
+from cnswd.store import snapshots
+from cnswd.store.snapshots import list_batches, read_snapshot, write_snapshot
+
+T0 = pd.Timestamp('2020-07-24 09:30:00')
+
+
+def _quotes(prices):
+    return pd.DataFrame({
+        '股票代码': [f'{i:06d}' for i in range(len(prices))],
+        '现价': prices,
+        '成交量': np.arange(len(prices)) * 100,
+    })
+
+
+def test_delta_and_rebuild(tmp_path):
+    """只写入变化行，任意时点重建完整截面"""
+    prices = [10.0, 11.0, np.nan]
+    assert write_snapshot('quotes', _quotes(prices), T0, root=tmp_path) == 3
+    prices[1] = 11.5
+    t1 = T0 + pd.Timedelta(seconds=3)
+    assert write_snapshot('quotes', _quotes(prices), t1, root=tmp_path) == 1
+    # 无变化时不写入
+    t2 = T0 + pd.Timedelta(seconds=6)
+    assert write_snapshot('quotes', _quotes(prices), t2, root=tmp_path) == 0
+    assert list_batches('quotes', T0, root=tmp_path) == [T0, t1]
+
+    df = read_snapshot('quotes', T0 + pd.Timedelta(seconds=1), root=tmp_path)
+    assert df['现价'].tolist()[:2] == [10.0, 11.0]
+    df = read_snapshot('quotes', t2, root=tmp_path)
+    assert df['现价'].tolist()[:2] == [10.0, 11.5]
+    assert df['批次'].tolist() == [T0, t1, T0]
+
+
+def test_keyframe(tmp_path, monkeypatch):
+    """定期写入关键帧"""
+    monkeypatch.setattr(snapshots, 'KEYFRAME_EVERY', 3)
+    for i in range(5):
+        write_snapshot('quotes', _quotes([float(i), 1.0]),
+                       T0 + pd.Timedelta(seconds=i), root=tmp_path)
+    day_dir = tmp_path / 'snapshots' / 'quotes' / '2020-07-24'
+    kinds = [is_key for _, is_key, _ in snapshots._frames(day_dir)]
+    assert kinds == [True, False, False, True, False]
+    df = read_snapshot('quotes', T0 + pd.Timedelta(seconds=4), root=tmp_path)
+    assert df['现价'].tolist() == [4.0, 1.0]
+
+
+def test_ignore_cols_and_removed_rows(tmp_path):
+    """忽略批次时间戳列；行消失时写入关键帧"""
+    df = _quotes([10.0, 11.0, 12.0])
+    for i in range(2):
+        t = T0 + pd.Timedelta(minutes=i)
+        n = write_snapshot('minutely', df.assign(时间=t), t,
+                           ignore_cols=('时间', ), root=tmp_path)
+        assert n == (3 if i == 0 else 0)
+    t2 = T0 + pd.Timedelta(minutes=2)
+    assert write_snapshot('minutely', df.iloc[:2].assign(时间=t2), t2,
+                          ignore_cols=('时间', ), root=tmp_path) == 2
+    day_dir = tmp_path / 'snapshots' / 'minutely' / '2020-07-24'
+    kinds = [is_key for _, is_key, _ in snapshots._frames(day_dir)]
+    assert kinds == [True, True]
+    res = read_snapshot('minutely', t2, root=tmp_path)
+    assert res['股票代码'].tolist() == ['000000', '000001']
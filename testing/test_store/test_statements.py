@@ -0,0 +1,65 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from cnswd.store.statements import (compact_statements, get_accounts,
+                                    get_statement, write_statement)
+
+
+def _report(code, dates, cash=1.0):
+    """与`fetch_financial_report`一致的宽表"""
+    df = pd.DataFrame({
+        '报告日期': dates,
+        '货币资金(万元)': [cash] * len(dates),
+        '应收票据(万元)': [np.nan] * len(dates),
+        '存货(万元)': [2.0] * len(dates),
+    })
+    df['股票代码'] = code
+    df['更新时间'] = pd.Timestamp('now')
+    return df
+
+
+@pytest.fixture
+def root(tmp_path):
+    write_statement(_report('000001', ['2019-12-31', '2020-03-31']),
+                    'zcfzb',
+                    root=tmp_path)
+    write_statement(_report('600000', ['2019-12-31']), '资产负债表', root=tmp_path)
+    return tmp_path
+
+
+def test_accounts(root):
+    """科目编号在报表内唯一，重复写入不重新编号"""
+    accounts = get_accounts('zcfzb', root)
+    assert sorted(accounts) == ['存货(万元)', '应收票据(万元)', '货币资金(万元)']
+    write_statement(_report('000002', ['2019-12-31']), 'zcfzb', root=root)
+    assert get_accounts('zcfzb', root) == accounts
+    df = pd.DataFrame({'报告日期': ['2019-12-31'], '营业收入(万元)': [3.0],
+                       '股票代码': ['000001']})
+    write_statement(df, 'lrb', root=root)
+    assert get_accounts('lrb', root)['营业收入(万元)'] not in accounts.values()
+
+
+def test_get_statement(root):
+    df = get_statement(['000001'], ['货币资金(万元)', '应收票据(万元)'],
+                       ['2020-03-31'], root=root)
+    assert df.columns.tolist() == ['股票代码', '报告日期', '货币资金(万元)', '应收票据(万元)']
+    assert df['报告日期'].tolist() == [pd.Timestamp('2020-03-31')]
+    assert df['货币资金(万元)'].tolist() == [1.0]
+    # 空值不存储
+    assert df['应收票据(万元)'].isna().all()
+    df = get_statement(periods='2019-12-31', root=root)
+    assert df['股票代码'].tolist() == ['000001', '600000']
+    assert df['存货(万元)'].tolist() == [2.0, 2.0]
+
+
+def test_overwrite_and_compact(root):
+    """重复写入保留最后记录，合并后结果不变"""
+    write_statement(_report('000001', ['2020-03-31'], cash=5.0),
+                    'zcfzb',
+                    root=root)
+    df = get_statement('000001', '货币资金(万元)', '2020-03-31', root=root)
+    assert df['货币资金(万元)'].tolist() == [5.0]
+    assert compact_statements(root=root) > 0
+    df = get_statement('000001', '货币资金(万元)', root=root)
+    assert df['货币资金(万元)'].tolist() == [1.0, 5.0]
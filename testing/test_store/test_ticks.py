@@ -0,0 +1,60 @@
+import pandas as pd
+
+from cnswd.store.ticks import (TickWriter, compact_ticks, completed_codes,
+                               read_ticks)
+
+DATE = '2020-07-24'
+
+
+def _ticks(code, n, price=10.0):
+    times = pd.date_range(f'{DATE} 09:30', periods=n, freq='3s')
+    return pd.DataFrame({
+        '股票代码': code,
+        '成交时间': times[::-1],
+        '成交价': [price + i * 0.01 for i in range(n)],
+        '价格变动': 0.01,
+        '成交量': range(n),
+        '成交额': 100.5,
+        '性质': ['买盘', '卖盘', '中性盘'] * (n // 3) + ['买盘'] * (n % 3),
+    })
+
+
+def test_write_read(tmp_path):
+    """写入、读取及登记完成代码"""
+    with TickWriter(DATE, flush_codes=2, root=tmp_path) as writer:
+        writer.add('600000', _ticks('600000', 5))
+        writer.add('000001', _ticks('000001', 4, 11.0))
+        writer.add('000002', _ticks('000002', 0))
+        writer.add('300001', _ticks('300001', 3))
+    assert completed_codes(DATE, root=tmp_path) == {
+        '600000', '000001', '000002', '300001'}
+    df = read_ticks(DATE, ['000001'], root=tmp_path)
+    assert len(df) == 4
+    assert df['成交时间'].is_monotonic_increasing
+    assert df['成交价'].iloc[0] == 11.03
+    assert len(read_ticks(DATE, root=tmp_path)) == 12
+    assert compact_ticks(DATE, root=tmp_path) == 2
+    df = read_ticks(DATE, root=tmp_path)
+    assert len(df) == 12
+    assert df['股票代码'].tolist() == sorted(df['股票代码'].tolist())
+    assert set(df['性质']) == {'买盘', '卖盘', '中性盘'}
+
+
+def test_rewrite_after_crash(tmp_path):
+    """写入数据后未登记即中断，重新写入的股票读取及合并时不重复"""
+    with TickWriter(DATE, root=tmp_path) as writer:
+        writer.add('000001', _ticks('000001', 3))
+        writer.add('000002', _ticks('000002', 2))
+    # 模拟登记前中断
+    for marker in (tmp_path / 'ticks' / DATE / '_completed').glob('*.txt'):
+        marker.unlink()
+    assert completed_codes(DATE, root=tmp_path) == set()
+    with TickWriter(DATE, root=tmp_path) as writer:
+        writer.add('000001', _ticks('000001', 4, 11.0))
+    assert completed_codes(DATE, root=tmp_path) == {'000001'}
+    df = read_ticks(DATE, root=tmp_path)
+    assert (df['股票代码'] == '000001').sum() == 4
+    assert (df['股票代码'] == '000002').sum() == 2
+    assert len(read_ticks(DATE, ['000001'], ['成交价'], root=tmp_path)) == 4
+    assert compact_ticks(DATE, root=tmp_path) == 2
+    assert len(read_ticks(DATE, root=tmp_path)) == 6
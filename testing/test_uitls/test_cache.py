@@ -0,0 +1,75 @@
+import multiprocessing as mp
+import time
+
+import pandas as pd
+import pytest
+
+from cnswd.setting.config import DEFAULT_CONFIG
+from cnswd.utils.cache import expire_time, hot_cache, make_key
+
+
+@pytest.fixture(autouse=True)
+def cache_root(tmp_path, monkeypatch):
+    monkeypatch.setitem(DEFAULT_CONFIG, 'data_root', tmp_path)
+    return tmp_path
+
+
+def _counter_path():
+    return DEFAULT_CONFIG['data_root'] / 'calls.txt'
+
+
+@hot_cache(delta='1D', hour=None)
+def slow_data(n, col='a'):
+    with open(_counter_path(), 'a') as f:
+        f.write('x')
+    time.sleep(0.3)
+    return pd.DataFrame({col: range(n)})
+
+
+def _calls():
+    p = _counter_path()
+    return len(p.read_text()) if p.exists() else 0
+
+
+def test_key():
+    """参数不同则键不同"""
+    assert make_key(slow_data, ('1', '2'), {}) != make_key(
+        slow_data, ('12', ), {})
+    assert make_key(slow_data, (1, ), {'col': 'a'}) == make_key(
+        slow_data, (1, ), {'col': 'a'})
+
+
+def test_expire_time():
+    t = pd.Timestamp('2020-01-02 15:31:20')
+    assert expire_time(t, '1D', 9, 30) == pd.Timestamp('2020-01-03 09:30')
+    assert expire_time(t, '1h', None) == pd.Timestamp('2020-01-02 16:31:20')
+
+
+def test_tiers():
+    """进程内及磁盘缓存命中"""
+    slow_data.cache_clear()
+    df = slow_data(3)
+    df['a'] = 0
+    assert slow_data(3)['a'].tolist() == [0, 1, 2]
+    slow_data.cache_clear()
+    assert slow_data(3)['a'].tolist() == [0, 1, 2]
+    slow_data(3)
+    assert _calls() == 1
+    info = slow_data.cache_info()
+    assert (info.hits, info.disk_hits, info.misses) == (1, 1, 0)
+
+
+def _worker(root):
+    DEFAULT_CONFIG['data_root'] = root
+    slow_data(5)
+
+
+def test_single_flight(cache_root):
+    """多进程同时请求，只计算一次"""
+    ctx = mp.get_context('fork')
+    procs = [ctx.Process(target=_worker, args=(cache_root, )) for _ in range(4)]
+    for p in procs:
+        p.start()
+    for p in procs:
+        p.join()
+    assert _calls() == 1
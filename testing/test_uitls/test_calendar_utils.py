@@ -0,0 +1,57 @@
+import numpy as np
+import pandas as pd
+
+from cnswd.utils.calendar_utils import TradingCalendar
+
+SESSIONS = ['2020-07-22', '2020-07-23', '2020-07-24', '2020-07-27']
+
+
+def test_is_session():
+    c = TradingCalendar(SESSIONS)
+    assert c.is_session('2020-07-24')
+    assert not c.is_session(pd.Timestamp('2020-07-25 10:00'))
+    assert not c.is_session('2019-01-01')
+    assert not c.is_session('2021-01-01')
+    res = c.is_session(['2020-07-24', '2020-07-26', '2020-07-27'])
+    assert res.tolist() == [True, False, True]
+
+
+def test_next_previous():
+    c = TradingCalendar(SESSIONS)
+    assert c.next_session('2020-07-24') == pd.Timestamp('2020-07-27')
+    assert c.next_session('2020-07-25') == pd.Timestamp('2020-07-27')
+    assert c.next_session('2020-07-27') is pd.NaT
+    assert c.previous_session('2020-07-27') == pd.Timestamp('2020-07-24')
+    assert c.previous_session('2020-07-22') is pd.NaT
+    res = c.next_session(['2020-07-22', '2020-07-26'])
+    assert res.tolist() == list(np.array(['2020-07-23', '2020-07-27'],
+                                         dtype='datetime64[D]'))
+
+
+def test_range_and_minute():
+    c = TradingCalendar(SESSIONS)
+    assert len(c.sessions_in_range('2020-07-23', '2020-07-27')) == 3
+    # 带时区的时间先转换为本地时间
+    t = pd.Timestamp('2020-07-25 17:00', tz='UTC')
+    assert c.minute_to_session(t) == pd.Timestamp('2020-07-27')
+    assert c.minute_to_session(t, 'previous') == pd.Timestamp('2020-07-24')
+    assert c.minute_to_session('2020-07-24 10:31') == pd.Timestamp('2020-07-24')
+
+
+def test_reload_on_version_change():
+    state = {'version': 1, 'loads': 0}
+
+    def loader():
+        state['loads'] += 1
+        sessions = SESSIONS if state['version'] == 1 else SESSIONS + ['2020-07-28']
+        return state['version'], sessions
+
+    c = TradingCalendar(loader=loader,
+                        version=lambda: state['version'],
+                        check_interval=0)
+    assert not c.is_session('2020-07-28')
+    assert not c.is_session('2020-07-28')
+    assert state['loads'] == 1
+    state['version'] = 2
+    assert c.is_session('2020-07-28')
+    assert state['loads'] == 2
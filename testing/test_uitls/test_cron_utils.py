@@ -0,0 +1,34 @@
+import pandas as pd
+import pytest
+
+from cnswd.utils.cron_utils import Cron
+
+
+def test_matches():
+    cron = Cron('*/30 8-20 * * 1-5')
+    assert cron.matches('2020-07-24 09:30')
+    assert not cron.matches('2020-07-24 09:31')
+    assert not cron.matches('2020-07-24 21:00')
+    # 星期六
+    assert not cron.matches('2020-07-25 09:30')
+    # 星期日以0或7表示
+    assert Cron('0 2 * * 7').matches('2020-07-26 02:00')
+    assert Cron('0 2 * * 0').matches('2020-07-26 02:00')
+    # 日与星期均限定时满足其一即可
+    both = Cron('0 0 1 * 1')
+    assert both.matches('2020-07-01 00:00')
+    assert both.matches('2020-07-06 00:00')
+    assert not both.matches('2020-07-07 00:00')
+
+
+def test_next_after():
+    cron = Cron('0 8,16,18 * * *')
+    assert cron.next_after('2020-07-24 08:00') == pd.Timestamp('2020-07-24 16:00')
+    assert cron.next_after('2020-07-24 18:30') == pd.Timestamp('2020-07-25 08:00')
+    assert Cron('0 1 * * 2-6').next_after('2020-07-25 02:00') == pd.Timestamp('2020-07-28 01:00')
+
+
+@pytest.mark.parametrize('expr', ['* * * *', '61 * * * *', '*/0 * * * *', '5-1 * * * *'])
+def test_invalid(expr):
+    with pytest.raises(ValueError):
+        Cron(expr)
@@ -0,0 +1,139 @@
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+from pymongo.errors import BulkWriteError
+
+from cnswd.utils.db_utils import (bulk_insert, ingnore_null_dict, iter_docs,
+                                  max_by_code, stale_codes, to_dict)
+
+
+class FakeCollection(object):
+    """模拟唯一索引为`id`的集合"""
+
+    def __init__(self):
+        self.ids = set()
+        self.calls = 0
+
+    def insert_many(self, docs, ordered=True):
+        assert not ordered
+        self.calls += 1
+        errors = []
+        inserted = 0
+        for i, doc in enumerate(docs):
+            if doc['id'] in self.ids:
+                errors.append({'index': i, 'code': 11000, 'errmsg': 'E11000'})
+            elif doc['id'] < 0:
+                errors.append({'index': i, 'code': 121, 'errmsg': '验证失败'})
+            else:
+                self.ids.add(doc['id'])
+                inserted += 1
+        if errors:
+            raise BulkWriteError({'writeErrors': errors, 'nInserted': inserted})
+
+        class Result:
+            inserted_ids = list(range(inserted))
+        return Result()
+
+
+def test_bulk_insert_counts():
+    """区分插入、重复及失败数量"""
+    collection = FakeCollection()
+    docs = [{'id': i} for i in range(10)]
+    r = bulk_insert(collection, docs, batch_size=3)
+    assert r == (10, 0, 0)
+    assert collection.calls == 4
+    docs = [{'id': i} for i in range(5, 15)] + [{'id': -1}]
+    r = bulk_insert(collection, docs, batch_size=3, raise_on_failure=False)
+    assert r.inserted == 5
+    assert r.duplicated == 5
+    assert r.failed == 1
+
+
+def test_bulk_insert_raises_on_failure():
+    """重复键以外的错误在写完全部批次后引发异常"""
+    collection = FakeCollection()
+    docs = [{'id': -1}] + [{'id': i} for i in range(5)]
+    with pytest.raises(BulkWriteError) as e:
+        bulk_insert(collection, docs, batch_size=3)
+    assert e.value.details['nInserted'] == 5
+    assert len(e.value.details['writeErrors']) == 1
+
+
+def test_bulk_insert_by_bytes():
+    """按字节划分批次"""
+    collection = FakeCollection()
+    docs = [{'id': i, 'text': 'x' * 100} for i in range(10)]
+    r = bulk_insert(collection, docs, batch_size=100, batch_bytes=300)
+    assert r.inserted == 10
+    assert collection.calls == 5
+
+
+def test_to_dict_ignore_null():
+    """忽略空值，转换为内置类型"""
+    df = pd.DataFrame({
+        '整数': [1, 2, 3],
+        '浮点': [1.5, np.nan, 2.0],
+        '日期': pd.to_datetime(['2020-01-01', None, '2020-01-03']),
+        '字符': ['x', None, 'z'],
+    })
+    expected = list(map(ingnore_null_dict, df.to_dict('records')))
+    actual = to_dict(df)
+    assert actual == expected
+    assert actual[1] == {'整数': 2}
+    assert type(actual[0]['整数']) is int
+    assert type(actual[0]['日期']) is datetime
+
+
+def test_iter_docs_chunks():
+    """分块生成文档"""
+    df = pd.DataFrame({'a': range(10)})
+    chunks = list(iter_docs(df, chunksize=4))
+    assert [len(c) for c in chunks] == [4, 4, 2]
+    assert chunks[-1][-1] == {'a': 9}
+
+
+class FakeAggregate(object):
+    """模拟`$group`聚合"""
+
+    def __init__(self, docs):
+        self.docs = docs
+        self.calls = 0
+
+    def aggregate(self, pipe, **kwargs):
+        self.calls += 1
+        stage = pipe[-1]['$group']
+        key = stage['_id'][1:]
+        field = stage['value']['$max'][1:]
+        res = {}
+        for doc in self.docs:
+            v = doc.get(field)
+            if v is not None:
+                res[doc[key]] = max(res.get(doc[key], v), v)
+        return [{'_id': k, 'value': v} for k, v in res.items()]
+
+
+def test_max_by_code():
+    """单次聚合计算各代码最大值"""
+    docs = [{'股票代码': '000001', '日期': datetime(2020, 1, i)} for i in (1, 3, 2)]
+    docs.append({'股票代码': '000002', '日期': datetime(2020, 2, 1)})
+    docs.append({'股票代码': '000003'})
+    collection = FakeAggregate(docs)
+    res = max_by_code(collection, '日期')
+    assert collection.calls == 1
+    assert res == {'000001': datetime(2020, 1, 3), '000002': datetime(2020, 2, 1)}
+
+
+def test_stale_codes():
+    """单次聚合判断需要刷新的代码"""
+    docs = [
+        {'股票代码': '000001', '更新时间': datetime(2020, 1, 1, 8)},
+        {'股票代码': '000001', '更新时间': datetime(2020, 1, 2, 8)},
+        {'股票代码': '000002', '更新时间': datetime(2020, 1, 1, 8)},
+    ]
+    collection = FakeAggregate(docs)
+    codes = ['000001', '000002', '000003']
+    res = stale_codes(collection, codes, now=datetime(2020, 1, 2, 9))
+    assert collection.calls == 1
+    assert res == {'000002', '000003'}
@@ -0,0 +1,189 @@
+import time
+
+import pandas as pd
+import pytest
+
+from cnswd.utils import ledger as ledger_module
+from cnswd.utils.ledger import (DONE, FAILED, PENDING, RUNNING, TaskLedger,
+                                run_tasks)
+
+mongomock = pytest.importorskip('mongomock')
+
+
+class FakeCollection(object):
+    """mongomock集合，`bulk_write`逐个执行（mongomock不兼容新版pymongo的批量操作）"""
+
+    def __init__(self):
+        self._coll = mongomock.MongoClient().db['任务账本']
+
+    def __getattr__(self, name):
+        return getattr(self._coll, name)
+
+    def bulk_write(self, ops, ordered=True):
+        upserted = modified = 0
+        for op in ops:
+            r = self._coll.update_one(op._filter, op._doc, upsert=op._upsert)
+            upserted += r.upserted_id is not None
+            modified += r.modified_count
+
+        class Result:
+            upserted_count = upserted
+            modified_count = modified
+        return Result()
+
+
+def _tasks(n):
+    return [(f'{i:06d}', {'code': f'{i:06d}'}) for i in range(n)]
+
+
+def test_fail_backoff():
+    """失败任务推迟至退避时间后才可领取"""
+    ledger = TaskLedger('job', FakeCollection(), backoff_seconds=60)
+    ledger.add(_tasks(1))
+    task = ledger.claim('a')
+    assert ledger.fail(task, ConnectionError('限流'))
+    assert ledger.claim('a') is None
+    doc = ledger.collection.find_one({'key': task['key']})
+    assert doc['status'] == PENDING
+    delay = (doc['not_before'] - pd.Timestamp('now')).total_seconds()
+    assert 50 < delay <= 60
+    # 退避时间已过
+    ledger.collection.update_one({'key': task['key']}, {
+        '$set': {
+            'not_before': (pd.Timestamp('now') -
+                           pd.Timedelta(seconds=1)).to_pydatetime()
+        }
+    })
+    task = ledger.claim('a')
+    assert task['attempts'] == 2
+    # 第二次失败等待加倍
+    ledger.fail(task, ConnectionError('限流'))
+    doc = ledger.collection.find_one({'key': task['key']})
+    delay = (doc['not_before'] - pd.Timestamp('now')).total_seconds()
+    assert 110 < delay <= 120
+
+
+def _expire(ledger, key):
+    ledger.collection.update_one({'key': key}, {
+        '$set': {
+            'lease_until': (pd.Timestamp('now') -
+                            pd.Timedelta(seconds=1)).to_pydatetime()
+        }
+    })
+
+
+def test_reclaim_after_lease_expires():
+    """租约到期的任务可被其他执行者领取，原执行者不能再更新"""
+    ledger = TaskLedger('job', FakeCollection())
+    ledger.add(_tasks(1))
+    task = ledger.claim('a')
+    assert task['status'] == RUNNING
+    assert ledger.claim('b') is None
+    _expire(ledger, task['key'])
+    taken = ledger.claim('b')
+    assert taken['owner'] == 'b'
+    assert taken['attempts'] == 2
+    # 已被他人接管
+    assert not ledger.complete(task)
+    assert not ledger.heartbeat(task)
+    assert ledger.complete(taken)
+    assert ledger.progress()[DONE] == 1
+
+
+def test_max_attempts():
+    """超过最多尝试次数后标记为失败"""
+    ledger = TaskLedger('job', FakeCollection(), max_attempts=2,
+                        backoff_seconds=0)
+    ledger.add(_tasks(1))
+    for _ in range(2):
+        task = ledger.claim('a')
+        ledger.fail(task, ValueError('x'))
+    assert ledger.claim('a') is None
+    assert ledger.progress()[FAILED] == 1
+    assert ledger.retry_failed() == 1
+    assert ledger.claim('a')['attempts'] == 1
+
+
+def test_renew():
+    """新一轮保留上次成功时间，删除不再需要的任务"""
+    ledger = TaskLedger('job', FakeCollection())
+    ledger.add(_tasks(2))
+    task = ledger.claim('a')
+    ledger.complete(task)
+    last = ledger.collection.find_one({'key': task['key']})['last_success']
+    assert ledger.renew(_tasks(1)) == 1
+    docs = list(ledger.collection.find({'job': 'job'}))
+    assert [d['key'] for d in docs] == [task['key']]
+    assert docs[0]['status'] == PENDING
+    assert docs[0]['last_success'] == last
+
+
+def test_renew_done():
+    """无需执行的任务登记为已完成，保留上次成功时间"""
+    ledger = TaskLedger('job', FakeCollection())
+    ledger.add(_tasks(2))
+    task = ledger.claim('a')
+    ledger.complete(task)
+    last = ledger.collection.find_one({'key': task['key']})['last_success']
+    tasks = dict(_tasks(3))
+    fresh = [(task['key'], tasks.pop(task['key']))]
+    assert ledger.renew(tasks.items(), fresh) == 2
+    doc = ledger.collection.find_one({'key': task['key']})
+    assert doc['status'] == DONE
+    assert doc['last_success'] == last
+    assert ledger.progress() == {PENDING: 2, RUNNING: 0, DONE: 1, FAILED: 0}
+    assert ledger.report()['elapsed'] == 0
+
+
+def test_claim_batch():
+    """成批领取不会将同一任务交给两个执行者"""
+    ledger = TaskLedger('job', FakeCollection())
+    ledger.add(_tasks(5))
+    a = ledger.claim_batch(3, 'a')
+    b = ledger.claim_batch(3, 'b')
+    assert len(a) == 3 and len(b) == 2
+    assert not {t['key'] for t in a} & {t['key'] for t in b}
+    assert ledger.claim_batch(3, 'c') == []
+    assert ledger.finish_batch(a, [(b[0], ValueError('x'))]) == 4
+
+
+def test_requeue_running():
+    """协调进程收回上次中断遗留的执行中任务"""
+    ledger = TaskLedger('job', FakeCollection())
+    ledger.add(_tasks(2))
+    ledger.claim('a')
+    assert ledger.unfinished() == 2
+    assert ledger.requeue_running() == 1
+    assert ledger.claim('b')['owner'] == 'b'
+
+
+def test_keep_alive():
+    """执行期间后台续约"""
+    ledger = TaskLedger('job', FakeCollection(), lease_seconds=60)
+    ledger.add(_tasks(1))
+    task = ledger.claim('a')
+    _expire(ledger, task['key'])
+    with ledger.keep_alive(task, interval=0.01):
+        time.sleep(0.1)
+    doc = ledger.collection.find_one({'key': task['key']})
+    assert doc['lease_until'] > pd.Timestamp('now').to_pydatetime()
+
+
+def _work(code):
+    if code == '000001':
+        raise ValueError(code)
+
+
+def test_run_tasks_report(monkeypatch):
+    """执行作业并统计各状态数量"""
+    collection = FakeCollection()
+
+    class Ledger(TaskLedger):
+        def __init__(self, job):
+            super().__init__(job, collection, max_attempts=1)
+
+    monkeypatch.setattr(ledger_module, 'TaskLedger', Ledger)
+    res = run_tasks('job', _tasks(3), _work, batch_size=2)
+    assert res['progress'] == {PENDING: 0, RUNNING: 0, DONE: 2, FAILED: 1}
+    assert res['failures'] == {'ValueError': 1}
+    assert res['elapsed'] >= 0
@@ -0,0 +1,79 @@
+import logging
+import time
+
+from cnswd.utils import log_utils
+from cnswd.utils.log_utils import (MongoBatchHandler, MongoQueueHandler,
+                                   RateLimitFilter, make_logger)
+
+
+class FakeCollection(object):
+    def __init__(self):
+        self.batches = []
+
+    def insert_many(self, docs, ordered=True):
+        self.batches.append(docs)
+
+    @property
+    def docs(self):
+        return [d for batch in self.batches for d in batch]
+
+
+def _record(msg, level=logging.INFO, name='test'):
+    return logging.makeLogRecord({
+        'name': name,
+        'msg': msg,
+        'levelno': level,
+        'levelname': logging.getLevelName(level)
+    })
+
+
+def test_rate_limit():
+    f = RateLimitFilter(limit=2, period=60)
+    passed = [f.filter(_record(f'股票代码 {code:06d} 数据为空')) for code in range(5)]
+    assert passed == [True, True, False, False, False]
+    # 不同模板、警告级别不受限制
+    assert f.filter(_record('股票代码 000001 插入 5 行'))
+    assert all(
+        f.filter(_record(f'股票代码 {i} 失败', logging.WARNING)) for i in range(5))
+    # 新期间第一条附带已忽略数量
+    f.period = 0
+    r = _record('股票代码 000009 数据为空')
+    assert f.filter(r)
+    assert r.suppressed == 3
+    assert MongoQueueHandler('test').prepare(r).msg.endswith('（已忽略3条相似消息）')
+
+
+def test_batch_handler():
+    h = MongoBatchHandler('test', batch_size=3)
+    h._collection = FakeCollection()
+    for i in range(7):
+        h.handle(_record(f'消息{i}'))
+    assert [len(b) for b in h._collection.batches] == [3, 3]
+    h.flush()
+    docs = h._collection.docs
+    assert [d['message'] for d in docs] == [f'消息{i}' for i in range(7)]
+    assert docs[0]['level'] == 'INFO'
+
+
+def test_make_logger(monkeypatch):
+    coll = FakeCollection()
+    monkeypatch.setattr(MongoBatchHandler, '_get_collection',
+                        lambda self: coll)
+    logger = make_logger('测试日志', 'test_log_utils')
+    assert make_logger('测试日志', 'test_log_utils') is logger
+    assert len(logger.handlers) == 2
+    try:
+        raise ValueError('错误')
+    except ValueError:
+        logger.exception('失败')
+    logger.info('完成')
+    log_utils.flush_logs()
+    assert [d['message'] for d in coll.docs] == ['失败', '完成']
+    assert coll.docs[0]['exception']['message'] == '错误'
+    # 写入线程停止后再次写入时重新启动
+    logger.info('再次')
+    deadline = time.time() + 5
+    while len(coll.docs) < 3 and time.time() < deadline:
+        time.sleep(0.1)
+    log_utils.flush_logs()
+    assert coll.docs[-1]['message'] == '再次'
@@ -0,0 +1,104 @@
+import asyncio
+import socket
+import threading
+import time
+
+import pytest
+from aiohttp import web
+
+from cnswd.websource.aio import AsyncFetcher, TokenBucket
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+@pytest.fixture(scope='module')
+def server():
+    """本地测试服务器"""
+    calls = {}
+
+    async def handler(request):
+        name = request.match_info['name']
+        calls[name] = calls.get(name, 0) + 1
+        if name == 'fail':
+            raise web.HTTPInternalServerError()
+        if name == 'flaky' and calls[name] == 1:
+            raise web.HTTPServiceUnavailable()
+        return web.Response(body=name.encode())
+
+    app = web.Application()
+    app.router.add_get('/{name}', handler)
+    port = _free_port()
+    loop = asyncio.new_event_loop()
+    runner = web.AppRunner(app)
+    loop.run_until_complete(runner.setup())
+    loop.run_until_complete(web.TCPSite(runner, '127.0.0.1', port).start())
+    t = threading.Thread(target=loop.run_forever, daemon=True)
+    t.start()
+    yield f'http://127.0.0.1:{port}', calls
+    loop.call_soon_threadsafe(loop.stop)
+    t.join()
+
+
+def test_fetch_retry_failed_only(server):
+    """只重试失败项目"""
+    base, calls = server
+    urls = {i: f'{base}/item{i}' for i in range(20)}
+    urls['flaky'] = f'{base}/flaky'
+    urls['fail'] = f'{base}/fail'
+    fetcher = AsyncFetcher(max_tries=2, parse_workers=0)
+    results, failed = fetcher.run(urls)
+    assert len(results) == 21
+    assert results[3] == b'item3'
+    assert results['flaky'] == b'flaky'
+    assert list(failed) == ['fail']
+    assert failed['fail'].attempts == 2
+    assert calls['item3'] == 1
+    assert calls['flaky'] == 2
+
+
+def test_fetch_parse_in_process(server):
+    """进程池解析"""
+    base, _ = server
+    urls = {i: f'{base}/item{i}' for i in range(5)}
+    fetcher = AsyncFetcher(parser=len, parse_workers=1)
+    results, failed = fetcher.run(urls)
+    assert not failed
+    assert results == {i: len(f'item{i}') for i in range(5)}
+
+
+def test_fetch_on_result(server):
+    """逐项回调处理结果，处理失败的项目计入失败项目"""
+    base, _ = server
+    urls = {i: f'{base}/cb{i}' for i in range(5)}
+    urls['bad'] = f'{base}/cbbad'
+    received = []
+
+    def on_result(key, content):
+        if key == 'bad':
+            raise ValueError(key)
+        received.append(key)
+        return len(content)
+
+    fetcher = AsyncFetcher(max_tries=1, parse_workers=0)
+    results, failed = fetcher.run(urls, on_result=on_result)
+    assert sorted(received) == list(range(5))
+    assert results == {i: len(f'cb{i}') for i in range(5)}
+    assert list(failed) == ['bad']
+    assert isinstance(failed['bad'].error, ValueError)
+
+
+def test_token_bucket():
+    """令牌桶限速"""
+    async def run():
+        bucket = TokenBucket(rate=20, capacity=5)
+        t = time.monotonic()
+        for _ in range(15):
+            await bucket.acquire()
+        return time.monotonic() - t
+
+    # 5个突发令牌，其余10个按每秒20个补充
+    assert 0.4 < asyncio.run(run()) < 1.0
@@ -0,0 +1,86 @@
+import pytest
+import requests
+
+from cnswd._exceptions import ConnectFailed
+from cnswd.setting.config import (HTTP_HOST_TIMEOUTS, HTTP_MAX_BACKOFF,
+                                  HTTP_MAX_TRIES, HTTP_TIMEOUT)
+from cnswd.websource import base
+from cnswd.websource.base import (backoff_time, close_sessions, get_session,
+                                  get_timeout)
+
+
+def test_session_shared_by_host():
+    """同一主机共享会话"""
+    s1 = get_session('http://quotes.money.163.com/service/chddata.html')
+    s2 = get_session('http://quotes.money.163.com/f10/fhpg_000001.html')
+    s3 = get_session('http://hq.sinajs.cn/list=sz000001')
+    assert s1 is s2
+    assert s1 is not s3
+    close_sessions()
+    s4 = get_session('http://quotes.money.163.com/service/chddata.html')
+    assert s4 is not s1
+
+
+def test_host_timeout():
+    """主机超时设置"""
+    host = 'quotes.money.163.com'
+    assert get_timeout(f'http://{host}/a.html') == HTTP_HOST_TIMEOUTS[host]
+    assert get_timeout('http://www.example.com/') == HTTP_TIMEOUT
+
+
+@pytest.mark.parametrize("i", range(10))
+def test_backoff(i):
+    """退避时长不超过上限"""
+    t = backoff_time(i)
+    assert 0 < t <= HTTP_MAX_BACKOFF
+
+
+class FakeSession(object):
+    """依次返回给定状态码（或抛出异常）"""
+
+    def __init__(self, *results):
+        self.results = list(results)
+        self.calls = 0
+
+    def request(self, *args, **kwargs):
+        self.calls += 1
+        res = self.results[min(self.calls, len(self.results)) - 1]
+        if isinstance(res, Exception):
+            raise res
+        r = requests.Response()
+        r.status_code = res
+        return r
+
+
+@pytest.fixture
+def no_sleep(monkeypatch):
+    monkeypatch.setattr(base.time, 'sleep', lambda t: None)
+
+
+@pytest.mark.parametrize("results", [
+    (500, 200),
+    (429, 200),
+    (requests.exceptions.ConnectionError(), 200),
+    (requests.exceptions.ReadTimeout(), 200),
+])
+def test_request_retry(monkeypatch, no_sleep, results):
+    """服务器错误、限流及网络错误重试"""
+    session = FakeSession(*results)
+    monkeypatch.setattr(base, 'get_session', lambda url: session)
+    r = base._request('GET', 'http://www.example.com/', None, 1)
+    assert r.status_code == 200
+    assert session.calls == 2
+
+
+def test_request_fail_fast(monkeypatch, no_sleep):
+    """其他客户端错误不重试"""
+    session = FakeSession(404)
+    monkeypatch.setattr(base, 'get_session', lambda url: session)
+    with pytest.raises(ConnectFailed):
+        base._request('GET', 'http://www.example.com/', None, 1)
+    assert session.calls == 1
+    session = FakeSession(503)
+    monkeypatch.setattr(base, 'get_session', lambda url: session)
+    with pytest.raises(ConnectFailed):
+        base._request('GET', 'http://www.example.com/', None, 1)
+    assert session.calls == HTTP_MAX_TRIES
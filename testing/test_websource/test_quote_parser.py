@@ -0,0 +1,33 @@
+import numpy as np
+
+from cnswd.setting.constants import QUOTE_COLS
+from cnswd.websource.quote_parser import parse_quotes, quotes_to_frame
+
+BOOK = ','.join(['100,10.890'] * 10)
+CONTENT = (
+    f'var hq_str_sz000001="平安银行,11.040,11.050,10.900,11.050,10.880,10.900,'
+    f'10.910,123456,1345678.5,{BOOK},2020-07-24,15:00:03,00";\n'
+    'var hq_str_sh600001="";\n'
+    f'var hq_str_sh600000="浦发银行,10.000,10.100,,10.200,9.900,10.000,'
+    f'10.010,2000,20000.0,{BOOK},2020-07-24,14:59:57,00";\n')
+
+
+def test_parse_quotes():
+    """解析报价，忽略无数据行"""
+    parsed = parse_quotes(CONTENT)
+    assert parsed.codes.tolist() == ['000001', '600000']
+    assert parsed.names.tolist() == ['平安银行', '浦发银行']
+    assert parsed.values.shape == (2, 29)
+    assert parsed.values[0, 0] == 11.04
+    # 空白值转换为nan
+    assert np.isnan(parsed.values[1, 2])
+
+
+def test_quotes_to_frame():
+    df = quotes_to_frame(parse_quotes(CONTENT))
+    assert tuple(df.columns) == QUOTE_COLS
+    assert df['成交量'].dtype == np.int64
+    assert df['日期'].tolist() == ['2020-07-24', '2020-07-24']
+    df = quotes_to_frame(parse_quotes(CONTENT), combine_time=True)
+    assert '日期' not in df.columns
+    assert str(df['时间'].iloc[0]) == '2020-07-24 15:00:03'